@@ -0,0 +1,57 @@
+# admission.py
+
+import asyncio
+import os
+import re
+
+from database import DB_POOL_SIZE, DB_MAX_OVERFLOW
+
+# =====================================================
+# CONFIG
+# =====================================================
+'''Admission control for API requests.
+
+Sync endpoints and dependencies run in the threadpool, one hop per
+dependency, and a request keeps its pooled connection between hops. With
+more requests in flight than the pool has connections, every thread can
+end up blocked waiting for a connection while the requests holding them
+wait for a thread: nothing moves until the pool timeout fails them all.
+A registration window opening does exactly that.
+
+At most MAX_CONCURRENT_REQUESTS requests (default: the pool's size plus
+overflow) run at once per worker; the rest wait their turn on the event
+loop, which costs nothing but latency. Paths under ADMISSION_EXEMPT skip
+the queue: the static frontend doesn't touch the database, and the
+dashboard event streams (dashboards.py) stay open for hours holding no
+connection, so they would only sit on a slot. So do submission uploads
+and downloads (STREAMING_PATHS): they release their connection before
+the body streams, and a few slow clients must not hold every slot.'''
+
+MAX_CONCURRENT_REQUESTS = int(os.getenv(
+    "MAX_CONCURRENT_REQUESTS", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)
+))
+ADMISSION_EXEMPT = ("/app", "/faculty/dashboard/stream", "/students/dashboard/stream")
+STREAMING_PATHS = re.compile(
+    r"^/students/assignments/\d+/submission(/body)?$|^/faculty/submissions/\d+/body$"
+)
+
+
+# =====================================================
+# MIDDLEWARE
+# =====================================================
+
+class AdmissionMiddleware:
+    def __init__(self, app, limit: int = MAX_CONCURRENT_REQUESTS):
+        self.app = app
+        self.slots = asyncio.Semaphore(limit)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["path"].startswith(ADMISSION_EXEMPT)
+            or STREAMING_PATHS.match(scope["path"])
+        ):
+            return await self.app(scope, receive, send)
+
+        async with self.slots:
+            await self.app(scope, receive, send)
@@ -0,0 +1,52 @@
+"""submission similarity signatures and lsh buckets
+
+Revision ID: 3b8e6f0c2a17
+Revises: e7b3a5c91d40
+Create Date: 2026-10-19 18:02:47.116503
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8e6f0c2a17'
+down_revision: Union[str, Sequence[str], None] = 'e7b3a5c91d40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # existing submissions are signed lazily by similarity.similar_pairs()
+    op.create_table(
+        "submission_signatures",
+        sa.Column("submission_id", sa.Integer(), nullable=False),
+        sa.Column("assignment_id", sa.Integer(), nullable=False),
+        sa.Column("signature", sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(["assignment_id"], ["assignments.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["submission_id"], ["assignment_submissions.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("submission_id"),
+    )
+    op.create_table(
+        "submission_lsh_buckets",
+        sa.Column("assignment_id", sa.Integer(), nullable=False),
+        sa.Column("band", sa.SmallInteger(), nullable=False),
+        sa.Column("bucket", sa.BigInteger(), nullable=False),
+        sa.Column("submission_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["assignment_id"], ["assignments.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["submission_id"], ["assignment_submissions.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("assignment_id", "band", "bucket", "submission_id"),
+    )
+    op.create_index(
+        "ix_submission_lsh_buckets_submission_id", "submission_lsh_buckets", ["submission_id"]
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_submission_lsh_buckets_submission_id", table_name="submission_lsh_buckets")
+    op.drop_table("submission_lsh_buckets")
+    op.drop_table("submission_signatures")
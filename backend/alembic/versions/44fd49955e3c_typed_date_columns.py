@@ -0,0 +1,134 @@
+"""typed date columns
+
+Revision ID: 44fd49955e3c
+Revises: 4fe7a59440ef
+Create Date: 2026-10-19 10:12:41.302118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '44fd49955e3c'
+down_revision: Union[str, Sequence[str], None] = '4fe7a59440ef'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 10_000
+
+# (table, column, new type, postgres cast, value for blank legacy strings)
+# The typed columns are NOT NULL. A blank due date, exam date or
+# submission time becomes the epoch, which sorts first and reads as long
+# past; attendance sessions without a date can't be placed on any day
+# (nor, later, in a term partition) and are deleted with their records.
+EPOCH = "1970-01-01"
+COLUMNS = [
+    ("attendance_sessions", "date", sa.Date(), "date", None),
+    ("assignments", "due_date", sa.Date(), "date", EPOCH),
+    ("exams", "exam_date", sa.Date(), "date", EPOCH),
+    ("assignment_submissions", "submitted_at", sa.DateTime(), "timestamp", EPOCH),
+]
+
+# shapes the legacy strings may take; anything else stops the migration
+PATTERNS = {
+    "date": r"^\d{4}-\d{2}-\d{2}$",
+    "timestamp": r"^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$",
+}
+
+INDEXES = [
+    ("ix_attendance_sessions_course_date", "attendance_sessions", ["course_id", "date"]),
+    ("ix_attendance_records_student_session", "attendance_records", ["student_id", "session_id"]),
+    ("ix_assignments_course_due_date", "assignments", ["course_id", "due_date"]),
+    ("ix_exams_course_exam_date", "exams", ["course_id", "exam_date"]),
+]
+
+
+def _backfill(table: str, target: str, expression: str) -> None:
+    """Copy values into the new column in id ranges, one commit per batch."""
+    bind = op.get_bind()
+    lo, hi = bind.execute(sa.text(f"SELECT min(id), max(id) FROM {table}")).one()
+    if lo is None:
+        return
+
+    for start in range(lo, hi + 1, BATCH_SIZE):
+        bind.execute(
+            sa.text(
+                f"UPDATE {table} SET {target} = {expression} "
+                f"WHERE id >= :start AND id < :stop"
+            ),
+            {"start": start, "stop": start + BATCH_SIZE},
+        )
+
+
+def _validate() -> None:
+    """
+    Fail before anything is written if a legacy value won't cast: the
+    backfill commits batch by batch and would stop halfway otherwise
+    """
+    bind = op.get_bind()
+    for table, column, _, cast, _ in COLUMNS:
+        bad = bind.execute(
+            sa.text(
+                f"SELECT id, {column} FROM {table} "
+                f"WHERE trim({column}) <> '' AND trim({column}) !~ :pattern "
+                f"ORDER BY id LIMIT 5"
+            ),
+            {"pattern": PATTERNS[cast]},
+        ).all()
+        if bad:
+            raise RuntimeError(
+                f"{table}.{column} has values that are not a {cast}, e.g. "
+                + ", ".join(f"id {r[0]}: {r[1]!r}" for r in bad)
+                + "; fix or blank them and rerun"
+            )
+        # well-formed but impossible values (2026-02-30) fail the cast here
+        bind.execute(sa.text(f"SELECT count(NULLIF(trim({column}), '')::{cast}) FROM {table}"))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _validate()
+
+    op.execute(
+        "DELETE FROM attendance_records WHERE session_id IN "
+        "(SELECT id FROM attendance_sessions WHERE coalesce(trim(date), '') = '')"
+    )
+    op.execute("DELETE FROM attendance_sessions WHERE coalesce(trim(date), '') = ''")
+
+    for table, column, new_type, _, _ in COLUMNS:
+        op.add_column(table, sa.Column(f"{column}_typed", new_type, nullable=True))
+
+    # short transactions so the backfill never holds long row locks
+    with op.get_context().autocommit_block():
+        for table, column, _, cast, blank in COLUMNS:
+            value = f"NULLIF(trim({column}), '')::{cast}"
+            if blank is not None:
+                value = f"coalesce({value}, '{blank}'::{cast})"
+            _backfill(table, f"{column}_typed", value)
+
+    for table, column, _, _, _ in COLUMNS:
+        op.drop_column(table, column)
+        op.alter_column(table, f"{column}_typed", new_column_name=column, nullable=False)
+
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+    for table, column, _, cast, _ in COLUMNS:
+        fmt = "YYYY-MM-DD" if cast == "date" else "YYYY-MM-DD\"T\"HH24:MI:SS"
+        op.add_column(table, sa.Column(f"{column}_text", sa.String(), nullable=True))
+        with op.get_context().autocommit_block():
+            _backfill(table, f"{column}_text", f"to_char({column}, '{fmt}')")
+        op.drop_column(table, column)
+        op.alter_column(table, f"{column}_text", new_column_name=column, nullable=False)
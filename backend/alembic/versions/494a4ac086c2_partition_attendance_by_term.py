@@ -0,0 +1,167 @@
+"""partition attendance by term
+
+Revision ID: 494a4ac086c2
+Revises: 44fd49955e3c
+Create Date: 2026-10-19 11:40:03.518224
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from partitions import terms_between, next_term, term_for
+
+
+# revision identifiers, used by Alembic.
+revision: str = '494a4ac086c2'
+down_revision: Union[str, Sequence[str], None] = '44fd49955e3c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_partitioned_tables() -> None:
+    op.execute("""
+        CREATE TABLE attendance_sessions (
+            id integer NOT NULL DEFAULT nextval('attendance_sessions_id_seq'),
+            course_id integer NOT NULL REFERENCES courses (id),
+            faculty_id integer NOT NULL REFERENCES faculty (id),
+            date date NOT NULL,
+            PRIMARY KEY (id, date)
+        ) PARTITION BY RANGE (date)
+    """)
+    op.execute("""
+        CREATE TABLE attendance_records (
+            id integer NOT NULL DEFAULT nextval('attendance_records_id_seq'),
+            session_id integer NOT NULL,
+            session_date date NOT NULL,
+            student_id integer NOT NULL REFERENCES students (id),
+            present boolean,
+            PRIMARY KEY (id, session_date),
+            CONSTRAINT uq_session_student UNIQUE (session_id, student_id, session_date),
+            CONSTRAINT fk_attendance_records_session
+                FOREIGN KEY (session_id, session_date)
+                REFERENCES attendance_sessions (id, date)
+        ) PARTITION BY RANGE (session_date)
+    """)
+    op.execute("CREATE INDEX ix_attendance_sessions_id ON attendance_sessions (id)")
+    op.execute("CREATE INDEX ix_attendance_sessions_course_date ON attendance_sessions (course_id, date)")
+    op.execute("CREATE INDEX ix_attendance_records_id ON attendance_records (id)")
+    op.execute("CREATE INDEX ix_attendance_records_student_session ON attendance_records (student_id, session_id)")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+
+    # 1. move the plain tables out of the way, freeing their index names
+    for table in ("attendance_sessions", "attendance_records"):
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned")
+        op.execute(f"ALTER INDEX {table}_pkey RENAME TO {table}_unpartitioned_pkey")
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+    op.execute("DROP INDEX ix_attendance_sessions_id")
+    op.execute("DROP INDEX ix_attendance_sessions_course_date")
+    op.execute("DROP INDEX ix_attendance_records_id")
+    op.execute("DROP INDEX ix_attendance_records_student_session")
+    op.execute("ALTER TABLE attendance_records_unpartitioned DROP CONSTRAINT uq_session_student")
+
+    # 2. partitioned parents plus one partition per term that has data
+    _create_partitioned_tables()
+
+    first = bind.execute(sa.text("SELECT min(date) FROM attendance_sessions_unpartitioned")).scalar()
+    current = term_for(date.today())
+    terms = terms_between(first, current.start) if first else [current]
+    terms.append(next_term(terms[-1]))
+
+    for term in terms:
+        for parent in ("attendance_sessions", "attendance_records"):
+            op.execute(
+                f"CREATE TABLE {parent}_{term.suffix} PARTITION OF {parent} "
+                f"FOR VALUES FROM ('{term.start.isoformat()}') TO ('{term.end.isoformat()}')"
+            )
+    for parent in ("attendance_sessions", "attendance_records"):
+        op.execute(f"CREATE TABLE {parent}_default PARTITION OF {parent} DEFAULT")
+
+    # 3. copy rows; records pick up their session's date as partition key
+    op.execute("""
+        INSERT INTO attendance_sessions (id, course_id, faculty_id, date)
+        SELECT id, course_id, faculty_id, date FROM attendance_sessions_unpartitioned
+    """)
+    op.execute("""
+        INSERT INTO attendance_records (id, session_id, session_date, student_id, present)
+        SELECT r.id, r.session_id, s.date, r.student_id, r.present
+        FROM attendance_records_unpartitioned r
+        JOIN attendance_sessions_unpartitioned s ON s.id = r.session_id
+    """)
+
+    op.execute("DROP TABLE attendance_records_unpartitioned")
+    op.execute("DROP TABLE attendance_sessions_unpartitioned")
+    op.execute("ALTER SEQUENCE attendance_sessions_id_seq OWNED BY attendance_sessions.id")
+    op.execute("ALTER SEQUENCE attendance_records_id_seq OWNED BY attendance_records.id")
+
+    # 4. archive of closed terms
+    op.create_table(
+        "attendance_term_summaries",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("term_code", sa.String(), nullable=False),
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("students.id"), nullable=False),
+        sa.Column("course_id", sa.Integer(), sa.ForeignKey("courses.id"), nullable=False),
+        sa.Column("attended", sa.Integer(), nullable=False),
+        sa.Column("total", sa.Integer(), nullable=False),
+        sa.UniqueConstraint("term_code", "student_id", "course_id", name="uq_term_student_course"),
+    )
+    op.create_index("ix_attendance_term_summaries_id", "attendance_term_summaries", ["id"])
+    op.create_index("ix_attendance_term_summaries_student", "attendance_term_summaries", ["student_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("attendance_term_summaries")
+
+    # detached (archived) partitions are not folded back in
+    for table in ("attendance_sessions", "attendance_records"):
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_partitioned")
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+    op.execute("DROP INDEX ix_attendance_sessions_id")
+    op.execute("DROP INDEX ix_attendance_sessions_course_date")
+    op.execute("DROP INDEX ix_attendance_records_id")
+    op.execute("DROP INDEX ix_attendance_records_student_session")
+    op.execute("ALTER TABLE attendance_records_partitioned DROP CONSTRAINT uq_session_student")
+    op.execute("ALTER TABLE attendance_records_partitioned RENAME CONSTRAINT attendance_records_pkey TO attendance_records_partitioned_pkey")
+    op.execute("ALTER TABLE attendance_sessions_partitioned RENAME CONSTRAINT attendance_sessions_pkey TO attendance_sessions_partitioned_pkey")
+
+    op.execute("""
+        CREATE TABLE attendance_sessions (
+            id integer PRIMARY KEY DEFAULT nextval('attendance_sessions_id_seq'),
+            course_id integer NOT NULL REFERENCES courses (id),
+            faculty_id integer NOT NULL REFERENCES faculty (id),
+            date date NOT NULL
+        )
+    """)
+    op.execute("""
+        CREATE TABLE attendance_records (
+            id integer PRIMARY KEY DEFAULT nextval('attendance_records_id_seq'),
+            session_id integer NOT NULL REFERENCES attendance_sessions (id),
+            student_id integer NOT NULL REFERENCES students (id),
+            present boolean,
+            CONSTRAINT uq_session_student UNIQUE (session_id, student_id)
+        )
+    """)
+    op.execute("""
+        INSERT INTO attendance_sessions (id, course_id, faculty_id, date)
+        SELECT id, course_id, faculty_id, date FROM attendance_sessions_partitioned
+    """)
+    op.execute("""
+        INSERT INTO attendance_records (id, session_id, student_id, present)
+        SELECT id, session_id, student_id, present FROM attendance_records_partitioned
+    """)
+    op.execute("DROP TABLE attendance_records_partitioned")
+    op.execute("DROP TABLE attendance_sessions_partitioned")
+
+    op.execute("CREATE INDEX ix_attendance_sessions_id ON attendance_sessions (id)")
+    op.execute("CREATE INDEX ix_attendance_sessions_course_date ON attendance_sessions (course_id, date)")
+    op.execute("CREATE INDEX ix_attendance_records_id ON attendance_records (id)")
+    op.execute("CREATE INDEX ix_attendance_records_student_session ON attendance_records (student_id, session_id)")
+    op.execute("ALTER SEQUENCE attendance_sessions_id_seq OWNED BY attendance_sessions.id")
+    op.execute("ALTER SEQUENCE attendance_records_id_seq OWNED BY attendance_records.id")
@@ -0,0 +1,38 @@
+"""partial indexes for the pending-first submissions listing
+
+Revision ID: 5e1a9c3d7b28
+Revises: 8d2c4e6a1f93
+Create Date: 2026-10-19 20:03:41.559210
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e1a9c3d7b28'
+down_revision: Union[str, Sequence[str], None] = '8d2c4e6a1f93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_assignment_submissions_pending", "assignment_submissions",
+        ["assignment_id", "submitted_at", "id"],
+        postgresql_where=sa.text("marks IS NULL")
+    )
+    op.create_index(
+        "ix_assignment_submissions_graded", "assignment_submissions",
+        ["assignment_id", "submitted_at", "id"],
+        postgresql_where=sa.text("marks IS NOT NULL")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_assignment_submissions_graded", table_name="assignment_submissions")
+    op.drop_index("ix_assignment_submissions_pending", table_name="assignment_submissions")
@@ -0,0 +1,49 @@
+"""submission bodies in a content-addressed blob store
+
+Revision ID: 8d2c4e6a1f93
+Revises: 3b8e6f0c2a17
+Create Date: 2026-10-19 19:11:05.402188
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2c4e6a1f93'
+down_revision: Union[str, Sequence[str], None] = '3b8e6f0c2a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # existing bodies stay in submission_text until the
+    # move_submission_bodies job (jobs.py) moves them to the blob store
+    op.create_table(
+        "blobs",
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("sha256"),
+    )
+    op.add_column("assignment_submissions", sa.Column("blob_sha256", sa.String(length=64), nullable=True))
+    op.add_column("assignment_submissions", sa.Column("content_type", sa.String(), nullable=True))
+    op.add_column("assignment_submissions", sa.Column("filename", sa.String(), nullable=True))
+    op.add_column("assignment_submissions", sa.Column("size", sa.BigInteger(), nullable=True))
+    op.create_foreign_key(
+        "assignment_submissions_blob_sha256_fkey", "assignment_submissions", "blobs",
+        ["blob_sha256"], ["sha256"]
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint("assignment_submissions_blob_sha256_fkey", "assignment_submissions", type_="foreignkey")
+    op.drop_column("assignment_submissions", "size")
+    op.drop_column("assignment_submissions", "filename")
+    op.drop_column("assignment_submissions", "content_type")
+    op.drop_column("assignment_submissions", "blob_sha256")
+    op.drop_table("blobs")
@@ -0,0 +1,31 @@
+"""submission version for optimistic concurrency in batch grading
+
+Revision ID: a4f7d2b9e051
+Revises: 5e1a9c3d7b28
+Create Date: 2026-10-19 20:41:16.083347
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4f7d2b9e051'
+down_revision: Union[str, Sequence[str], None] = '5e1a9c3d7b28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "assignment_submissions",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("assignment_submissions", "version")
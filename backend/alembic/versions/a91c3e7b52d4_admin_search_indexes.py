@@ -0,0 +1,64 @@
+"""admin search indexes
+
+Revision ID: a91c3e7b52d4
+Revises: fd9a8e09284c
+Create Date: 2026-10-19 15:48:12.306115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a91c3e7b52d4'
+down_revision: Union[str, Sequence[str], None] = 'fd9a8e09284c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+PREFIX_INDEXES = [
+    ("ix_students_name_prefix", "students", "name"),
+    ("ix_students_reg_no_prefix", "students", "reg_no"),
+    ("ix_faculty_name_prefix", "faculty", "name"),
+    ("ix_faculty_employee_id_prefix", "faculty", "employee_id"),
+    ("ix_users_email_prefix", "users", "email"),
+]
+
+TRIGRAM_INDEXES = [
+    ("ix_students_name_trgm", "students", "name"),
+    ("ix_students_reg_no_trgm", "students", "reg_no"),
+    ("ix_faculty_name_trgm", "faculty", "name"),
+    ("ix_faculty_employee_id_trgm", "faculty", "employee_id"),
+    ("ix_users_email_trgm", "users", "email"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    for table in ("students", "faculty"):
+        op.create_index(f"ix_{table}_name_id", table, ["name", "id"])
+        op.create_index(f"ix_{table}_department_name_id", table, ["department_id", "name", "id"])
+
+    for name, table, column in PREFIX_INDEXES:
+        op.create_index(name, table, [sa.text(f"lower({column}) text_pattern_ops")])
+
+    for name, table, column in TRIGRAM_INDEXES:
+        op.create_index(
+            name, table, [column],
+            postgresql_using="gin",
+            postgresql_ops={column: "gin_trgm_ops"}
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in TRIGRAM_INDEXES + PREFIX_INDEXES:
+        op.drop_index(name, table_name=table)
+
+    for table in ("students", "faculty"):
+        op.drop_index(f"ix_{table}_department_name_id", table_name=table)
+        op.drop_index(f"ix_{table}_name_id", table_name=table)
@@ -0,0 +1,53 @@
+"""course seats and waitlist
+
+Revision ID: c4f08d2b19e6
+Revises: a91c3e7b52d4
+Create Date: 2026-10-19 16:20:41.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f08d2b19e6'
+down_revision: Union[str, Sequence[str], None] = 'a91c3e7b52d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("courses", sa.Column("capacity", sa.Integer(), nullable=True))
+    op.add_column(
+        "courses",
+        sa.Column("seats_taken", sa.Integer(), nullable=False, server_default="0")
+    )
+    op.execute("""
+        UPDATE courses c SET seats_taken = e.n
+        FROM (SELECT course_id, count(*) AS n FROM enrollments GROUP BY course_id) e
+        WHERE e.course_id = c.id
+    """)
+
+    op.create_table(
+        "waitlist_entries",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("course_id", sa.Integer(), nullable=False),
+        sa.Column("student_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.ForeignKeyConstraint(["course_id"], ["courses.id"]),
+        sa.ForeignKeyConstraint(["student_id"], ["students.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("course_id", "student_id", name="uq_waitlist_course_student"),
+    )
+    op.create_index("ix_waitlist_entries_course_id_id", "waitlist_entries", ["course_id", "id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_waitlist_entries_course_id_id", table_name="waitlist_entries")
+    op.drop_table("waitlist_entries")
+    op.drop_column("courses", "seats_taken")
+    op.drop_column("courses", "capacity")
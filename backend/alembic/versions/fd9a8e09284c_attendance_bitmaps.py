@@ -0,0 +1,53 @@
+"""attendance bitmaps
+
+Revision ID: fd9a8e09284c
+Revises: 494a4ac086c2
+Create Date: 2026-10-19 13:05:27.884310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fd9a8e09284c'
+down_revision: Union[str, Sequence[str], None] = '494a4ac086c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("attendance_sessions", sa.Column("roster", postgresql.ARRAY(sa.Integer()), nullable=True))
+    op.add_column("attendance_sessions", sa.Column("presence", sa.LargeBinary(), nullable=True))
+    op.create_index(
+        "ix_attendance_sessions_roster", "attendance_sessions", ["roster"],
+        postgresql_using="gin"
+    )
+    # rows and bitmaps as one row per student per session
+    # (attendance_bitmap.attendance_rows)
+    op.execute("""
+        CREATE VIEW attendance_records_all AS
+        SELECT r.session_id, r.session_date, s.course_id, r.student_id,
+               coalesce(r.present, false) AS present
+        FROM attendance_records r
+        JOIN attendance_sessions s
+          ON s.id = r.session_id AND s.date = r.session_date
+        UNION ALL
+        SELECT s.id, s.date, s.course_id, e.student_id,
+               get_bit(s.presence, (e.ord - 1)::int) = 1
+        FROM attendance_sessions s
+        CROSS JOIN LATERAL unnest(s.roster) WITH ORDINALITY AS e(student_id, ord)
+        WHERE s.presence IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP VIEW IF EXISTS attendance_records_all")
+    op.drop_index("ix_attendance_sessions_roster", table_name="attendance_sessions")
+    op.drop_column("attendance_sessions", "presence")
+    op.drop_column("attendance_sessions", "roster")
@@ -0,0 +1,186 @@
+# attendance_bitmap.py
+
+import os
+from bisect import bisect_left
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+try:
+    import numpy as np
+except ImportError:     # numpy only speeds up the roster-wide reports
+    np = None
+
+# =====================================================
+# CONFIG
+# =====================================================
+'''Compact attendance storage.
+
+In "bitmap" mode a new AttendanceSession snapshots the course roster
+(enrolled student ids, ascending) and keeps one presence bit per roster
+position instead of one attendance_records row per student.
+
+Bit i lives in byte i // 8 at position i % 8, least significant bit
+first. That is the same layout postgres get_bit() uses, so SQL can
+expand bitmaps back into rows: attendance_rows() is that query, the
+attendance_records_all view and partitions.archive_term read it.
+
+"rows" mode (the default) keeps writing attendance_records. Reads always
+combine both, so switching modes never loses history.'''
+
+ATTENDANCE_STORAGE = os.getenv("ATTENDANCE_STORAGE", "rows")   # "rows" | "bitmap"
+
+
+def bitmap_mode() -> bool:
+    return ATTENDANCE_STORAGE == "bitmap"
+
+
+# =====================================================
+# ENCODING
+# =====================================================
+
+def empty(size: int) -> bytes:
+    return bytes((size + 7) // 8)
+
+
+def to_int(presence: bytes) -> int:
+    return int.from_bytes(presence, "little")
+
+
+def from_int(bits: int, size: int) -> bytes:
+    return bits.to_bytes((size + 7) // 8, "little")
+
+
+def encode(flags: list[bool]) -> bytes:
+    bits = 0
+    for i, flag in enumerate(flags):
+        if flag:
+            bits |= 1 << i
+    return from_int(bits, len(flags))
+
+
+def decode(presence: bytes, size: int) -> list[bool]:
+    bits = to_int(presence)
+    return [bool(bits >> i & 1) for i in range(size)]
+
+
+def popcount(presence: bytes) -> int:
+    return to_int(presence).bit_count()
+
+
+def position(roster: list[int], student_id: int) -> int | None:
+    """
+    Index of the student in a (sorted) roster snapshot
+    """
+    i = bisect_left(roster, student_id)
+    if i < len(roster) and roster[i] == student_id:
+        return i
+    return None
+
+
+def is_present(presence: bytes, index: int) -> bool:
+    byte = presence[index // 8]
+    return bool(byte >> (index % 8) & 1)
+
+
+def with_bit(presence: bytes, index: int, present: bool) -> bytes:
+    data = bytearray(presence)
+    if present:
+        data[index // 8] |= 1 << (index % 8)
+    else:
+        data[index // 8] &= ~(1 << (index % 8)) & 0xFF
+    return bytes(data)
+
+
+# =====================================================
+# AGGREGATION
+# =====================================================
+
+def roster_totals(roster: list[int], presences: list[bytes]) -> dict[int, int]:
+    """
+    Sessions attended per student for sessions sharing one roster.
+    Uses numpy to unpack all bitmaps at once when available.
+    """
+    if np is not None and presences:
+        packed = np.frombuffer(b"".join(presences), dtype=np.uint8)
+        matrix = np.unpackbits(
+            packed.reshape(len(presences), -1), axis=1, bitorder="little"
+        )[:, :len(roster)]
+        counts = matrix.sum(axis=0)
+        return {sid: int(counts[i]) for i, sid in enumerate(roster)}
+
+    counts = [0] * len(roster)
+    for presence in presences:
+        bits = to_int(presence)
+        while bits:
+            low = bits & -bits
+            counts[low.bit_length() - 1] += 1
+            bits ^= low
+    return dict(zip(roster, counts))
+
+
+def attendance_rows(sessions: str = "attendance_sessions", records: str = "attendance_records") -> str:
+    """
+    SQL yielding (session_id, session_date, course_id, student_id, present)
+    for every student of every session, whichever way it is stored
+    """
+    return f"""
+        SELECT r.session_id, r.session_date, s.course_id, r.student_id,
+               coalesce(r.present, false) AS present
+        FROM {records} r
+        JOIN {sessions} s
+          ON s.id = r.session_id AND s.date = r.session_date
+        UNION ALL
+        SELECT s.id, s.date, s.course_id, e.student_id,
+               get_bit(s.presence, (e.ord - 1)::int) = 1
+        FROM {sessions} s
+        CROSS JOIN LATERAL unnest(s.roster) WITH ORDINALITY AS e(student_id, ord)
+        WHERE s.presence IS NOT NULL
+    """
+
+
+def ensure_attendance_view(db: Session):
+    """
+    (Re)create attendance_records_all, for databases built by create_all
+    rather than the migrations
+    """
+    db.execute(text(f"CREATE OR REPLACE VIEW attendance_records_all AS {attendance_rows()}"))
+    db.commit()
+
+
+def student_presence(
+    db: Session,
+    student_id: int,
+    date_from: date | None = None,
+    date_to: date | None = None
+) -> list[tuple[int, date, bool]]:
+    """
+    (course_id, date, present) for every bitmap session the student is on
+    the roster of. Served by the GIN index on roster.
+    """
+    from models import AttendanceSession
+
+    query = (
+        db.query(
+            AttendanceSession.course_id,
+            AttendanceSession.date,
+            AttendanceSession.roster,
+            AttendanceSession.presence
+        )
+        .filter(
+            AttendanceSession.presence.isnot(None),
+            AttendanceSession.roster.contains([student_id])
+        )
+    )
+    if date_from is not None:
+        query = query.filter(AttendanceSession.date >= date_from)
+    if date_to is not None:
+        query = query.filter(AttendanceSession.date <= date_to)
+
+    result = []
+    for course_id, day, roster, presence in query:
+        index = position(roster, student_id)
+        if index is not None:
+            result.append((course_id, day, is_present(presence, index)))
+    return result
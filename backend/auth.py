@@ -8,10 +8,13 @@ from passlib.context import CryptContext
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from starlette.requests import HTTPConnection
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.session import make_transient_to_detached
 
-from database import get_db
-from models import User
+from database import BATCH_SCOPE_KEY, get_db
+from models import User, Student, Faculty
+from cache import principal_cache
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
@@ -89,26 +92,80 @@ def decode_access_token(token: str) -> dict:
 
 
 def get_current_user(
+        connection: HTTPConnection,
         token: str = Depends(oauth2_scheme),
         db: Session = Depends(get_db)
     ) -> User:
-        credentials_exception = HTTPException(
+        batch = connection.scope.get(BATCH_SCOPE_KEY)
+        if batch is not None:
+            # resolved once for the whole POST /batch
+            return db.merge(batch.principal, load=False)
+
+        user = user_from_token(token, db)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return user
+
+def user_from_token(token: str, db: Session) -> User | None:
+    """
+    The user behind a token, or None. Also used by WebSocket endpoints,
+    which get the token as a query parameter.
+    """
+    email = decode_access_token(token).get("sub")
+    if email is None:
+        return None
+
+    # cached principals are re-attached without a SELECT
+    cached = principal_cache.get(email)
+    if cached is not None:
+        return db.merge(cached, load=False)
+
+    user = db.query(User).filter(User.email == email).first()
+    if user is None:
+        return None
+
+    principal_cache.set(email, _snapshot(user), tags=[("users", user.id)])
+    return user
+
+async def get_token_claims(token: str = Depends(oauth2_scheme)) -> dict:
+    """
+    The token's claims, without loading the user: for hot paths that
+    authorize against data they already hold (live_attendance.py)
+    """
+    claims = decode_access_token(token)
+    if claims.get("sub") is None:
+        raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return claims
 
-        payload = decode_access_token(token)
-
-        email = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-
-        user = db.query(User).filter(User.email == email).first()
-        if user is None:
-            raise credentials_exception
+def principal_from_token(token: str, db: Session) -> User | None:
+    """
+    Detached copy of the user behind a token, for requests that resolve
+    it once and merge it into several sessions (batch.py)
+    """
+    user = user_from_token(token, db)
+    return _snapshot(user) if user is not None else None
 
-        return user
+def _snapshot(user: User) -> User:
+    """
+    Detached copy of the user row that is safe to share between sessions
+    """
+    snapshot = User(
+        id=user.id,
+        email=user.email,
+        hashed_password=user.hashed_password,
+        role=user.role,
+        is_active=user.is_active
+    )
+    make_transient_to_detached(snapshot)
+    return snapshot
 
 def get_current_admin(
     current_user: User = Depends(get_current_user)
@@ -140,3 +197,45 @@ def get_current_faculty(
         )
     return current_user
 
+
+# =====================================================
+# PRE-RESOLVED PROFILES
+# =====================================================
+
+def get_current_student_profile(
+    current_user: User = Depends(get_current_student),
+    db: Session = Depends(get_db)
+) -> Student:
+    """
+    Resolve the student profile behind the token once,
+    so composite endpoints can share it
+    """
+    student = db.query(Student).filter(
+        Student.user_id == current_user.id
+    ).first()
+
+    if not student:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Student profile not found"
+        )
+    return student
+
+def get_current_faculty_profile(
+    current_user: User = Depends(get_current_faculty),
+    db: Session = Depends(get_db)
+) -> Faculty:
+    """
+    Resolve the faculty profile behind the token once,
+    so composite endpoints can share it
+    """
+    faculty = db.query(Faculty).filter(
+        Faculty.user_id == current_user.id
+    ).first()
+
+    if not faculty:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Faculty profile not found"
+        )
+    return faculty
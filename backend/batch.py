@@ -0,0 +1,241 @@
+# batch.py
+
+import logging
+import os
+from functools import cache
+
+import orjson
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.asyncexitstack import AsyncExitStackMiddleware
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.exceptions import ExceptionMiddleware
+from starlette.requests import HTTPConnection
+
+import invalidation
+from auth import principal_from_token
+from database import BATCH_SCOPE_KEY, SessionLocal, batch_operation, engine
+from models import User
+from schemas import BatchOperation, BatchRequest
+
+logger = logging.getLogger("cms.batch")
+
+# =====================================================
+# CONFIG
+# =====================================================
+'''POST /batch: an ordered list of sub-requests to existing routes, run
+in one HTTP request, one database transaction and one authentication.
+
+Each operation is dispatched to the app's router in-process, with the
+caller's token, so it goes through the same validation, dependencies
+and permission checks as on its own. The batch takes one connection and
+begins a transaction on it; every operation's get_db session joins that
+transaction through a SAVEPOINT (join_transaction_mode
+"create_savepoint"). A route's commit() releases its savepoint, and its
+rollback() or an error undoes only that operation. The user is resolved
+from the token once and merged into each operation's session.
+
+  atomic       stop at the first operation that answers >= 400 and roll
+               everything back (the default)
+  best_effort  run every operation and commit the ones that succeeded
+
+Invalidation NOTIFYs are sent inside the transaction, so other workers
+only hear about a batch that commits. This worker evicts its caches as
+each operation commits, and again if the batch is rolled back (a later
+operation may have cached what was undone).
+
+A rollback only undoes what went through the transaction. Routes with
+effects outside it (the live roll-call buffer, the blob store, in-memory
+logs) depend on outside_transaction, which refuses them. While an
+operation runs, database.in_batch() is true: the TTL caches,
+single-flight and the partition bookkeeping neither serve it nor keep
+what it read, since that may be the batch's uncommitted writes.
+
+Locks taken by an operation (seat locks, FOR UPDATE) are held until the
+batch ends, hence BATCH_MAX_OPERATIONS. Bodies are JSON; uploads and
+streams can't be batched. The route middleware (compression, ETags,
+profiling) doesn't run per operation.'''
+
+BATCH_MAX_OPERATIONS = int(os.getenv("BATCH_MAX_OPERATIONS", "200"))
+BATCH_METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE"}
+NOT_BATCHABLE = ("/batch", "/app")
+
+# forwarded from the batch request to each operation
+FORWARDED_HEADERS = {b"authorization", b"accept-language", b"user-agent"}
+
+
+class NotBatchable(Exception):
+    pass
+
+
+def outside_transaction(connection: HTTPConnection):
+    """
+    Route dependency marking effects a rollback can't undo: refused
+    inside POST /batch, before the route runs
+    """
+    if connection.scope.get(BATCH_SCOPE_KEY) is not None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{connection.scope['path']} has effects outside the transaction and can't be batched"
+        )
+
+
+class Batch:
+    """
+    One POST /batch: its connection, principal, and the changes its
+    operations committed
+    """
+    def __init__(self, connection: Connection, principal: User):
+        self.connection = connection
+        self.principal = principal
+        self.changes: set = set()
+
+    def session(self) -> Session:
+        # commit() releases a SAVEPOINT; close() without one rolls back to it
+        return SessionLocal(
+            bind=self.connection,
+            join_transaction_mode="create_savepoint",
+            info={invalidation.RECORD_KEY: self.changes}
+        )
+
+
+def resolve_principal(connection: Connection, token: str) -> User:
+    db = SessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        principal = principal_from_token(token, db)
+    finally:
+        db.close()
+    if principal is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return principal
+
+
+# =====================================================
+# DISPATCH
+# =====================================================
+
+@cache
+def operation_app(app: FastAPI):
+    """
+    The router wrapped the way FastAPI wraps it inside the user
+    middleware: exception handlers (HTTPException, validation errors)
+    and the per-request exit stack
+    """
+    handlers = {k: v for k, v in app.exception_handlers.items() if k not in (500, Exception)}
+    return ExceptionMiddleware(AsyncExitStackMiddleware(app.router), handlers=handlers)
+
+
+def _error(status: int, detail) -> dict:
+    return {"status": status, "body": {"detail": detail}}
+
+
+async def dispatch(request: Request, batch: Batch, operation: BatchOperation) -> dict:
+    """
+    Run one operation through the router; {"status", "body"}
+    """
+    method = operation.method.upper()
+    path, _, query = operation.path.partition("?")
+    if method not in BATCH_METHODS:
+        return _error(400, f"method must be one of: {', '.join(sorted(BATCH_METHODS))}")
+    if not path.startswith("/") or path.startswith(NOT_BATCHABLE):
+        return _error(400, f"{path} can't be batched")
+
+    body = b"" if operation.body is None else orjson.dumps(operation.body)
+    headers = [(k, v) for k, v in request.scope["headers"] if k in FORWARDED_HEADERS]
+    headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+
+    scope = {
+        "type": "http",
+        "asgi": request.scope["asgi"],
+        "http_version": request.scope["http_version"],
+        "scheme": request.scope["scheme"],
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),
+        "root_path": request.scope.get("root_path", ""),
+        "method": method,
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": headers,
+        "app": request.scope["app"],
+        "state": {},
+        BATCH_SCOPE_KEY: batch,
+    }
+
+    received = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            return {"type": "http.disconnect"}
+        received = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    status, content_type, chunks = 500, b"", []
+
+    async def send(message):
+        nonlocal status, content_type
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            content_type = next(
+                (v for k, v in message.get("headers", []) if k.lower() == b"content-type"), b""
+            )
+            if content_type.startswith(b"text/event-stream"):
+                raise NotBatchable
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    in_batch = batch_operation.set(True)
+    try:
+        await operation_app(request.app)(scope, receive, send)
+    except NotBatchable:
+        return _error(400, f"{path} streams its response and can't be batched")
+    except Exception:
+        logger.exception("Batch operation %s %s failed", method, path)
+        return _error(500, "Internal Server Error")
+    finally:
+        batch_operation.reset(in_batch)
+
+    content = b"".join(chunks)
+    if content and content_type.startswith(b"application/json"):
+        return {"status": status, "body": orjson.loads(content)}
+    return {"status": status, "body": None}
+
+
+# =====================================================
+# RUN
+# =====================================================
+
+async def run(request: Request, token: str, data: BatchRequest) -> dict:
+    if len(data.requests) > BATCH_MAX_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_OPERATIONS} operations per batch")
+
+    connection = await run_in_threadpool(engine.connect)
+    batch = None
+    committed = False
+    try:
+        transaction = connection.begin()
+        batch = Batch(connection, await run_in_threadpool(resolve_principal, connection, token))
+
+        results = []
+        for operation in data.requests:
+            result = await dispatch(request, batch, operation)
+            results.append(result)
+            if result["status"] >= 400 and data.mode == "atomic":
+                break
+
+        if data.mode == "best_effort" or all(r["status"] < 400 for r in results):
+            await run_in_threadpool(transaction.commit)
+            committed = True
+    finally:
+        # anything not committed is rolled back here
+        await run_in_threadpool(connection.close)
+        if batch is not None and not committed:
+            invalidation.evict_local(batch.changes)
+
+    return {"mode": data.mode, "committed": committed, "results": results}
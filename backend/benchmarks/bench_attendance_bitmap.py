@@ -0,0 +1,198 @@
+# benchmarks/bench_attendance_bitmap.py
+'''Row vs bitmap attendance storage, measured in postgres.
+
+Loads the same synthetic attendance twice, into scratch schemas whose
+tables copy the columns and indexes of the real ones:
+  - bench_rows:   one attendance_records row per student per session
+  - bench_bitmap: roster + presence on attendance_sessions, no records
+then reports
+  - storage: pg_total_relation_size (heap + indexes + toast) per mode
+  - aggregation: the attendance SQL for one course, for one student and
+    for a whole term (the attendance_rows() summary archive_term runs)
+
+Needs DATABASE_URL. The scratch schemas are dropped afterwards unless
+--keep is given.
+
+    python benchmarks/bench_attendance_bitmap.py --records 10000000
+'''
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import attendance_bitmap as bm      # noqa: E402
+from database import engine         # noqa: E402
+from generate_data import copy_rows     # noqa: E402
+
+SCHEMAS = {"rows": "bench_rows", "bitmap": "bench_bitmap"}
+TABLES = ("attendance_sessions", "attendance_records")
+START = date(2026, 1, 5)
+PRESENT_RATE = 0.8
+
+# query per mode; {s} / {r} are the mode's sessions / records tables
+QUERIES = {
+    "per-course": {
+        "rows": """
+            SELECT count(*) FILTER (WHERE r.present), count(*)
+            FROM {s} s
+            JOIN {r} r ON r.session_id = s.id AND r.session_date = s.date
+            WHERE s.course_id = %(course)s
+        """,
+        "bitmap": """
+            SELECT sum(bit_count(s.presence)), sum(cardinality(s.roster))
+            FROM {s} s
+            WHERE s.course_id = %(course)s AND s.presence IS NOT NULL
+        """,
+    },
+    "per-student": {
+        "rows": """
+            SELECT count(*) FILTER (WHERE r.present), count(*)
+            FROM {r} r
+            WHERE r.student_id = %(student)s
+        """,
+        "bitmap": """
+            SELECT count(*) FILTER (
+                       WHERE get_bit(s.presence, array_position(s.roster, %(student)s) - 1) = 1
+                   ),
+                   count(*)
+            FROM {s} s
+            WHERE s.presence IS NOT NULL AND s.roster @> ARRAY[%(student)s]
+        """,
+    },
+}
+TERM_SUMMARY = """
+    SELECT count(*), sum(attended)
+    FROM (
+        SELECT student_id, course_id, count(*) FILTER (WHERE present) AS attended
+        FROM ({rows}) attendance
+        GROUP BY student_id, course_id
+    ) summary
+"""
+
+
+def build(records: int, roster_size: int, courses: int, seed: int):
+    rng = random.Random(seed)
+    rosters = {
+        c: sorted(rng.sample(range(1, records), roster_size)) for c in range(1, courses + 1)
+    }
+    sessions = []       # (id, course_id, date, flags)
+    for i in range(records // roster_size):
+        course = i % courses + 1
+        day = START + timedelta(days=i // courses)
+        flags = [rng.random() < PRESENT_RATE for _ in range(roster_size)]
+        sessions.append((i + 1, course, day, flags))
+    return sessions, rosters
+
+
+def create_schemas(cur):
+    for schema in SCHEMAS.values():
+        cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        cur.execute(f"CREATE SCHEMA {schema}")
+        for table in TABLES:
+            cur.execute(
+                f"CREATE TABLE {schema}.{table} "
+                f"(LIKE public.{table} INCLUDING DEFAULTS INCLUDING INDEXES)"
+            )
+
+
+def load(cur, sessions, rosters):
+    rows = SCHEMAS["rows"]
+    # LIKE copies no foreign keys: the course id stands in for the teacher
+    copy_rows(cur, f"{rows}.attendance_sessions", ["id", "course_id", "faculty_id", "date"], (
+        (sid, course, course, day) for sid, course, day, _ in sessions
+    ))
+
+    def records():
+        rid = 0
+        for sid, course, day, flags in sessions:
+            for student, present in zip(rosters[course], flags):
+                rid += 1
+                yield (rid, sid, day, student, present)
+    copy_rows(cur, f"{rows}.attendance_records",
+              ["id", "session_id", "session_date", "student_id", "present"], records())
+
+    bitmap = SCHEMAS["bitmap"]
+    copy_rows(cur, f"{bitmap}.attendance_sessions",
+              ["id", "course_id", "faculty_id", "date", "roster", "presence"], (
+        (sid, course, course, day, rosters[course], bm.encode(flags)) for sid, course, day, flags in sessions
+    ))
+
+    for schema in SCHEMAS.values():
+        for table in TABLES:
+            cur.execute(f"VACUUM ANALYZE {schema}.{table}")
+
+
+def storage(cur, schema: str) -> int:
+    cur.execute(
+        "SELECT sum(pg_total_relation_size(format('%%I.%%I', %(schema)s, t)::regclass)) "
+        "FROM unnest(%(tables)s) AS t",
+        {"schema": schema, "tables": list(TABLES)}
+    )
+    return int(cur.fetchone()[0])
+
+
+def timed(cur, sql: str, params: dict, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cur.execute(sql, params)
+        result = cur.fetchall()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=10_000_000)
+    parser.add_argument("--roster-size", type=int, default=60)
+    parser.add_argument("--courses", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schemas")
+    args = parser.parse_args()
+
+    print(f"building {args.records:,} records ...", flush=True)
+    sessions, rosters = build(args.records, args.roster_size, args.courses, args.seed)
+
+    raw = engine.raw_connection()
+    raw.driver_connection.autocommit = True     # VACUUM can't run in a transaction
+    cur = raw.cursor()
+    try:
+        create_schemas(cur)
+        load(cur, sessions, rosters)
+
+        # ---------------- storage ----------------
+        sizes = {mode: storage(cur, schema) for mode, schema in SCHEMAS.items()}
+        print(f"\nstorage   rows: {sizes['rows'] / 2**20:10.1f} MiB")
+        print(f"storage bitmap: {sizes['bitmap'] / 2**20:10.1f} MiB   "
+              f"({sizes['rows'] / sizes['bitmap']:.1f}x smaller)")
+
+        # ---------------- aggregation ----------------
+        params = {"course": 1, "student": rosters[1][0]}
+        queries = dict(QUERIES)
+        queries["term summary"] = {mode: TERM_SUMMARY for mode in SCHEMAS}
+
+        for name, modes in queries.items():
+            results = {}
+            for mode, schema in SCHEMAS.items():
+                s, r = f"{schema}.attendance_sessions", f"{schema}.attendance_records"
+                sql = modes[mode].format(s=s, r=r, rows=bm.attendance_rows(s, r))
+                timed(cur, sql, params, repeat=1)       # warm the cache
+                results[mode] = timed(cur, sql, params)
+            (t_rows, r1), (t_bits, r2) = results["rows"], results["bitmap"]
+            assert r1 == r2, (name, r1, r2)
+            print(f"\n{name:>12}   rows: {t_rows * 1000:9.1f} ms")
+            print(f"{name:>12} bitmap: {t_bits * 1000:9.1f} ms   ({t_rows / t_bits:.1f}x)")
+    finally:
+        if not args.keep:
+            for schema in SCHEMAS.values():
+                cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        raw.close()
+
+
+if __name__ == "__main__":
+    main()
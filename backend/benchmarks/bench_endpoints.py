@@ -0,0 +1,491 @@
+# benchmarks/bench_endpoints.py
+'''Endpoint latency benchmark with regression gates.
+
+Boots the app in-process (httpx ASGITransport, startup hooks included)
+against the database in DATABASE_URL, which should hold data from
+generate_data.py, and drives each scenario at a fixed concurrency.
+
+Per scenario it reports p50/p95/p99 latency, throughput and SQL queries
+per request, then compares against a stored baseline:
+
+    python generate_data.py --scale medium --truncate
+    python benchmarks/bench_endpoints.py --update-baseline      # record
+    python benchmarks/bench_endpoints.py                        # compare, exit 1 on regression
+
+A scenario regresses when any of its requests fails (4xx/5xx, which
+are fast and query-free, so they would otherwise look like a speedup),
+its p95 grows by more than --threshold (default 20%) or it issues more
+queries per request than the baseline. A run with failed requests is
+never recorded as the baseline.
+Write scenarios clean up after themselves so runs stay comparable.
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from typing import Callable, NamedTuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx                                    # noqa: E402
+from sqlalchemy import event, text              # noqa: E402
+
+from database import engine, SessionLocal       # noqa: E402
+
+engine.echo = False                             # before main runs create_all
+
+from generate_data import DEFAULT_PASSWORD      # noqa: E402
+from partitions import term_for                 # noqa: E402
+from main import app                            # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+TOKEN_POOL = 20     # distinct accounts per role, so per-user caches don't flatter the numbers
+BULK_PAIRS = 50             # enrollments per POST /admin/enrollments/bulk
+GRADE_SHEET_SIZE = 25       # grades per PUT /faculty/assignments/{id}/grades
+BATCH_OPERATIONS = 10       # attendance marks per POST /batch
+
+
+# =====================================================
+# QUERY COUNTING
+# =====================================================
+
+class QueryCounter:
+    """
+    Counts statements sent through the engine. Scenarios run one at a
+    time, so total queries / total requests is exact per scenario.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        with self._lock:
+            self.count += 1
+
+    def take(self) -> int:
+        with self._lock:
+            count, self.count = self.count, 0
+        return count
+
+
+# =====================================================
+# SCENARIOS
+# =====================================================
+
+class Scenario(NamedTuple):
+    name: str
+    request: Callable[[int], tuple[str, str, dict]]   # i -> (method, url, httpx kwargs)
+    teardown: Callable[[], None] | None = None
+
+
+def auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def login(client: httpx.AsyncClient, email: str) -> str:
+    res = await client.post("/auth/login", data={"username": email, "password": DEFAULT_PASSWORD})
+    res.raise_for_status()
+    return res.json()["access_token"]
+
+
+def scalars(sql: str, **params) -> list:
+    db = SessionLocal()
+    try:
+        return [row[0] for row in db.execute(text(sql), params)]
+    finally:
+        db.close()
+
+
+def fetch_rows(sql: str, **params) -> list:
+    db = SessionLocal()
+    try:
+        return db.execute(text(sql), params).all()
+    finally:
+        db.close()
+
+
+def run_sql(sql: str, **params):
+    db = SessionLocal()
+    try:
+        db.execute(text(sql), params)
+        db.commit()
+    finally:
+        db.close()
+
+
+def unenroll(pairs: list[tuple[int, int]]):
+    """
+    Remove those of the (student_id, course_id) pairs that are enrolled,
+    giving their seats back (a skipped scenario enrolled none)
+    """
+    run_sql(
+        "WITH gone AS ("
+        "  DELETE FROM enrollments e"
+        "  USING unnest(CAST(:s AS integer[]), CAST(:c AS integer[])) AS p(student_id, course_id)"
+        "  WHERE e.student_id = p.student_id AND e.course_id = p.course_id"
+        "  RETURNING e.course_id"
+        ") "
+        "UPDATE courses c SET seats_taken = c.seats_taken - g.n "
+        "FROM (SELECT course_id, count(*) AS n FROM gone GROUP BY course_id) g "
+        "WHERE c.id = g.course_id",
+        s=[s for s, _ in pairs], c=[c for _, c in pairs]
+    )
+
+
+async def build_scenarios(client: httpx.AsyncClient, requests: int, seed: int) -> list[Scenario]:
+    rng = random.Random(seed)
+
+    student_ids = scalars("SELECT id FROM students ORDER BY id")
+    faculty_ids = scalars("SELECT faculty_id FROM faculty_courses GROUP BY faculty_id ORDER BY faculty_id")
+    if not student_ids or not faculty_ids:
+        sys.exit("No data to benchmark against; run generate_data.py first")
+
+    def emails(role: str, ids: list[int]) -> list[str]:
+        return [f"{role}{i}@college.edu" for i in rng.sample(ids, min(TOKEN_POOL, len(ids)))]
+
+    student_emails = emails("student", student_ids)
+    students = [await login(client, e) for e in student_emails]
+    faculty = [await login(client, e) for e in emails("faculty", faculty_ids)]
+    admin = await login(client, "admin@college.edu")
+
+    def get(url: str, tokens: list[str]):
+        return lambda i: ("GET", url, {"headers": auth(tokens[i % len(tokens)])})
+
+    scenarios = [
+        Scenario("auth.login", lambda i: (
+            "POST", "/auth/login",
+            {"data": {"username": student_emails[i % len(student_emails)], "password": DEFAULT_PASSWORD}}
+        )),
+        Scenario("students.dashboard", get("/students/dashboard", students)),
+        Scenario("students.my-timetable", get("/students/my-timetable", students)),
+        Scenario("students.my-attendance-summary", get("/students/my-attendance-summary", students)),
+        Scenario("students.my-results", get("/students/my-results", students)),
+        Scenario("students.bootstrap", get("/students/bootstrap", students)),
+        Scenario("faculty.dashboard", get("/faculty/dashboard", faculty)),
+        Scenario("faculty.my-courses", get("/faculty/my-courses", faculty)),
+        Scenario("faculty.bootstrap", get("/faculty/bootstrap", faculty)),
+        Scenario("admin.students", get("/students/", [admin])),
+        Scenario("admin.faculty", get("/admin/faculty", [admin])),
+        Scenario("admin.courses", get("/admin/courses", [admin])),
+        Scenario("courses.catalog", get("/courses/", students)),
+    ]
+    scenarios += await write_scenarios(client, requests, rng, admin)
+    return scenarios
+
+
+async def write_scenarios(client, requests, rng, admin) -> list[Scenario]:
+    # ---------------- attendance marking ----------------
+    course_id, faculty_id = rng.choice(
+        scalars("SELECT array[course_id, faculty_id] FROM faculty_courses ORDER BY id")
+    )
+    roster = scalars(
+        "SELECT student_id FROM enrollments WHERE course_id = :c ORDER BY student_id", c=course_id
+    )
+    teacher = await login(client, f"faculty{faculty_id}@college.edu")
+
+    # sessions dated inside the current term, one per lap over the roster
+    day = term_for(date.today()).start
+    session_ids = []
+
+    async def open_sessions(count: int) -> list[int]:
+        opened = []
+        for _ in range(count):
+            res = await client.post(
+                "/faculty/attendance/session",
+                json={"course_id": course_id, "date": (day + timedelta(days=len(session_ids))).isoformat()},
+                headers=auth(teacher)
+            )
+            res.raise_for_status()
+            session_ids.append(res.json()["id"])
+            opened.append(res.json()["id"])
+        return opened
+
+    marked = await open_sessions(-(-requests // max(len(roster), 1)))
+
+    def mark(i):
+        return ("POST", "/faculty/attendance/mark", {
+            "json": {
+                "session_id": marked[i // len(roster)],
+                "student_id": roster[i % len(roster)],
+                "present": i % 5 != 0
+            },
+            "headers": auth(teacher)
+        })
+
+    # ---------------- batched attendance marking ----------------
+    # one atomic batch marks BATCH_OPERATIONS students of a session;
+    # consecutive batches go to different sessions, as separate classes would
+    ops = max(min(BATCH_OPERATIONS, len(roster)), 1)
+    per_session = max(len(roster) // ops, 1)
+    batched = await open_sessions(-(-requests // per_session))
+
+    def mark_batch(i):
+        session_id = batched[i % len(batched)]
+        first = i // len(batched) * ops
+        return ("POST", "/batch", {
+            "json": {"mode": "atomic", "requests": [
+                {"method": "POST", "path": "/faculty/attendance/mark", "body": {
+                    "session_id": session_id, "student_id": student_id, "present": k % 5 != 0
+                }}
+                for k, student_id in enumerate(roster[first:first + ops])
+            ]},
+            "headers": auth(teacher)
+        })
+
+    def drop_sessions(ids: list[int]):
+        def drop():
+            run_sql("DELETE FROM attendance_records WHERE session_id = ANY(:ids)", ids=ids)
+            run_sql("DELETE FROM attendance_sessions WHERE id = ANY(:ids)", ids=ids)
+        return drop
+
+    # ---------------- admin enrollment ----------------
+    pairs = [
+        tuple(p) for p in scalars(
+            "SELECT array[s.id, c.id] FROM students s CROSS JOIN courses c "
+            "WHERE NOT EXISTS (SELECT 1 FROM enrollments e WHERE e.student_id = s.id AND e.course_id = c.id) "
+            "ORDER BY s.id DESC, c.id LIMIT :n", n=requests
+        )
+    ]
+
+    def enroll(i):
+        student_id, course_id = pairs[i]
+        return ("POST", "/admin/enroll-student", {
+            "json": {"student_id": student_id, "course_id": course_id},
+            "headers": auth(admin)
+        })
+
+    def drop_enrollments():
+        unenroll(pairs)
+
+    # ---------------- admin bulk enrollment ----------------
+    bulk = [
+        tuple(p) for p in scalars(
+            "SELECT array[s.id, c.id] FROM students s CROSS JOIN courses c "
+            "WHERE NOT EXISTS (SELECT 1 FROM enrollments e WHERE e.student_id = s.id AND e.course_id = c.id) "
+            "AND NOT EXISTS (SELECT 1 FROM waitlist_entries w WHERE w.student_id = s.id AND w.course_id = c.id) "
+            "ORDER BY s.id DESC, c.id LIMIT :n", n=requests * BULK_PAIRS
+        )
+    ]
+
+    def enroll_bulk(i):
+        chunk = bulk[i * BULK_PAIRS:(i + 1) * BULK_PAIRS]
+        return ("POST", "/admin/enrollments/bulk", {
+            "json": {"pairs": [{"student_id": s, "course_id": c} for s, c in chunk]},
+            "headers": auth(admin)
+        })
+
+    def drop_bulk():
+        unenroll(bulk)
+
+    # ---------------- grade sheets ----------------
+    # each submission is on one sheet only, so the versions as listed
+    # stay current; teardown puts marks and versions back
+    teaching = fetch_rows(
+        "SELECT DISTINCT ON (a.id) a.id, fc.faculty_id FROM assignments a "
+        "JOIN faculty_courses fc ON fc.course_id = a.course_id ORDER BY a.id, fc.faculty_id"
+    )
+    teachers = sorted({f for _, f in teaching})
+    graders = {
+        f: await login(client, f"faculty{f}@college.edu")
+        for f in rng.sample(teachers, min(TOKEN_POOL, len(teachers)))
+    }
+    graded_by = {a: f for a, f in teaching if f in graders}
+    listed = fetch_rows(
+        "SELECT id, assignment_id, marks, version FROM assignment_submissions "
+        "WHERE assignment_id = ANY(:ids) ORDER BY assignment_id, id", ids=list(graded_by)
+    )
+
+    sheets = []         # (assignment_id, token, [(submission_id, version)])
+    by_assignment: dict[int, list] = {}
+    for r in listed:
+        by_assignment.setdefault(r.assignment_id, []).append((r.id, r.version))
+    for assignment_id, subs in by_assignment.items():
+        for start in range(0, len(subs), GRADE_SHEET_SIZE):
+            sheets.append((assignment_id, graders[graded_by[assignment_id]], subs[start:start + GRADE_SHEET_SIZE]))
+
+    def grade(i):
+        assignment_id, token, subs = sheets[i]
+        return ("PUT", f"/faculty/assignments/{assignment_id}/grades", {
+            "json": {"grades": [
+                {"submission_id": sid, "marks": (i + k) % 11, "version": version}
+                for k, (sid, version) in enumerate(subs)
+            ]},
+            "headers": auth(token)
+        })
+
+    def restore_grades():
+        run_sql(
+            "UPDATE assignment_submissions s SET marks = o.marks, version = o.version "
+            "FROM unnest(CAST(:ids AS integer[]), CAST(:marks AS integer[]), CAST(:versions AS integer[])) "
+            "AS o(id, marks, version) WHERE s.id = o.id",
+            ids=[r.id for r in listed], marks=[r.marks for r in listed], versions=[r.version for r in listed]
+        )
+
+    scenarios = [
+        Scenario("faculty.attendance-mark", mark, drop_sessions(marked)),
+        Scenario("batch.attendance-mark", mark_batch, drop_sessions(batched)),
+    ]
+    if len(pairs) == requests:
+        scenarios.append(Scenario("admin.enroll-student", enroll, drop_enrollments))
+    if len(bulk) == requests * BULK_PAIRS:
+        scenarios.append(Scenario("admin.enrollments-bulk", enroll_bulk, drop_bulk))
+    if len(sheets) >= requests:
+        scenarios.append(Scenario("faculty.assignment-grades", grade, restore_grades))
+    return scenarios
+
+
+# =====================================================
+# RUNNER
+# =====================================================
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+async def run_scenario(client, scenario: Scenario, first: int, requests: int, concurrency: int,
+                       counter: QueryCounter) -> dict:
+    latencies = []
+    errors = 0
+    next_index = first
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < first + requests:
+            i = next_index
+            next_index += 1
+            method, url, kwargs = scenario.request(i)
+            start = time.perf_counter()
+            res = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if res.status_code >= 400:
+                errors += 1
+
+    counter.take()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    queries = counter.take()
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "throughput_rps": round(requests / elapsed, 1),
+        "queries_per_request": round(queries / requests, 2),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    failures = []
+    for name, current in results.items():
+        if current["errors"]:
+            failures.append(f"{name}: {current['errors']} of {current['requests']} requests failed")
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            failures.append(
+                f"{name}: p95 {base['p95_ms']}ms -> {current['p95_ms']}ms "
+                f"(+{(current['p95_ms'] / base['p95_ms'] - 1) * 100:.0f}%)"
+            )
+        if current["queries_per_request"] > base["queries_per_request"]:
+            failures.append(
+                f"{name}: queries/request {base['queries_per_request']} -> {current['queries_per_request']}"
+            )
+    return failures
+
+
+async def run(args) -> dict:
+    counter = QueryCounter()
+    results = {}
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            scenarios = await build_scenarios(client, args.requests, args.seed)
+            for scenario in scenarios:
+                if args.only and not any(s in scenario.name for s in args.only):
+                    if scenario.teardown:
+                        scenario.teardown()
+                    continue
+                try:
+                    for i in range(args.warmup):
+                        method, url, kwargs = scenario.request(i)
+                        await client.request(method, url, **kwargs)
+                    results[scenario.name] = await run_scenario(
+                        client, scenario, args.warmup, args.requests - args.warmup,
+                        args.concurrency, counter
+                    )
+                finally:
+                    if scenario.teardown:
+                        scenario.teardown()
+                r = results[scenario.name]
+                print(
+                    f"{scenario.name:<32} p50 {r['p50_ms']:8.2f}  p95 {r['p95_ms']:8.2f}  p99 {r['p99_ms']:8.2f} ms"
+                    f"  {r['throughput_rps']:8.1f} req/s  {r['queries_per_request']:6.2f} q/req"
+                    + (f"  {r['errors']} errors" if r["errors"] else ""),
+                    flush=True
+                )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario, warmup included")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--threshold", type=float, default=0.20, help="allowed p95 growth, 0.20 = 20%%")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--only", nargs="*", help="run scenarios whose name contains any of these")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.warmup >= args.requests:
+        parser.error("--warmup must be smaller than --requests")
+
+    results = asyncio.run(run(args))
+
+    baseline = {}
+    if not args.update_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    failures = compare(results, baseline, args.threshold)
+    if args.update_baseline and not failures:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nbaseline written to {args.baseline}")
+        return
+    if not failures and not baseline:
+        print("\nno baseline yet; run with --update-baseline to record one")
+        return
+
+    if failures:
+        print("\nREGRESSIONS")
+        for line in failures:
+            print("  " + line)
+        sys.exit(1)
+    print("\nno regressions")
+
+
+if __name__ == "__main__":
+    main()
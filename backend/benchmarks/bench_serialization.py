@@ -0,0 +1,115 @@
+# benchmarks/bench_serialization.py
+'''Response serialization CPU per response.
+
+Compares, for list payloads of --rows rows (default 1,000):
+  - the stock path: response_model validation / jsonable_encoder
+    rendered by JSONResponse
+  - FastAPI's own dump_json path (newer FastAPI, response_model routes
+    using the default response class)
+  - serialization.py: pre-built TypeAdapters / orjson straight to bytes
+
+No database needed.
+
+    python benchmarks/bench_serialization.py --rows 1000
+'''
+
+import argparse
+import os
+import sys
+import time
+from datetime import time as dtime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder                   # noqa: E402
+from fastapi.responses import JSONResponse                      # noqa: E402
+from pydantic import TypeAdapter                                # noqa: E402
+
+from schemas import TimetableResponse                           # noqa: E402
+from serialization import course_list, plain_rows               # noqa: E402
+
+
+class CourseRow:
+    """Stand-in for an ORM Course instance"""
+
+    def __init__(self, i):
+        self.id = i
+        self.course_code = f"C{i:05d}"
+        self.course_name = f"Course {i}"
+        self.credits = 3
+        self.semester = i % 8 + 1
+        self.department_id = i % 20 + 1
+
+
+def cpu_per_call(fn, repeat: int) -> float:
+    fn()
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat
+
+
+def report(title: str, variants: list[tuple[str, callable]], repeat: int):
+    print(f"\n{title}")
+    baseline = None
+    for name, fn in variants:
+        cpu = cpu_per_call(fn, repeat)
+        baseline = baseline or cpu
+        print(f"  {name:<44} {cpu * 1e6:10.0f} us   {baseline / cpu:5.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    timetable = [
+        {
+            "day_of_week": "Monday",
+            "start_time": dtime(9 + i % 8, 0),
+            "end_time": dtime(10 + i % 8, 0),
+            "room": f"R-{i}",
+            "subject": f"Subject {i}",
+            "faculty": f"Dr. Faculty {i}"
+        }
+        for i in range(args.rows)
+    ]
+    students = [
+        {
+            "id": i,
+            "name": f"Student {i}",
+            "reg_no": f"REG{i:07d}",
+            "email": f"student{i}@college.edu",
+            "department_id": i % 20 + 1,
+            "department_name": f"Department {i % 20 + 1}"
+        }
+        for i in range(args.rows)
+    ]
+    courses = [CourseRow(i) for i in range(args.rows)]
+
+    # response_model routes: older FastAPI validates, dumps to json-compatible
+    # python and renders with json.dumps; newer FastAPI validates + dump_json
+    adapter = TypeAdapter(list[TimetableResponse])
+
+    report(f"timetable, response_model=list[TimetableResponse], {args.rows} rows", [
+        ("response_model + JSONResponse", lambda: JSONResponse(
+            adapter.dump_python(adapter.validate_python(timetable), mode="json")).body),
+        ("response_model, validate + dump_json", lambda: adapter.dump_json(
+            adapter.validate_python(timetable))),
+        ("plain_rows (orjson, no revalidation)", lambda: plain_rows(timetable).body),
+    ], args.repeat)
+
+    report(f"untyped dict list (GET /students/), {args.rows} rows", [
+        ("jsonable_encoder + JSONResponse", lambda: JSONResponse(jsonable_encoder(students)).body),
+        ("plain_rows (orjson only)", lambda: plain_rows(students).body),
+    ], args.repeat)
+
+    report(f"ORM objects (GET /admin/courses), {args.rows} rows", [
+        ("jsonable_encoder + JSONResponse", lambda: JSONResponse(jsonable_encoder(courses)).body),
+        ("course_list.orm (TypeAdapter)", lambda: course_list.orm(courses).body),
+    ], args.repeat)
+
+
+if __name__ == "__main__":
+    main()
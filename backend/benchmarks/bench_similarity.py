@@ -0,0 +1,103 @@
+# benchmarks/bench_similarity.py
+'''All-pairs Jaccard vs MinHash + LSH for near-duplicate submissions.
+
+Builds one assignment's worth of synthetic submissions in memory (no
+database needed), some of them edited copies of others, and compares
+  - exact: shingle every submission, Jaccard over all n^2 / 2 pairs
+  - similarity.py: sign, bucket by band, compare candidates only
+reporting time and the recall / precision of the LSH pairs against the
+exact pairs at --threshold.
+
+    python benchmarks/bench_similarity.py --submissions 2000
+'''
+
+import argparse
+import os
+import random
+import sys
+import time
+from itertools import combinations
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import similarity as sim    # noqa: E402
+
+
+def build(submissions: int, copies: int, vocabulary: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(vocabulary)]
+    texts = [" ".join(rng.choices(words, k=rng.randint(150, 400))) for _ in range(submissions - copies)]
+
+    # copies: a source with 0-30% of its words replaced
+    for _ in range(copies):
+        source = rng.choice(texts).split()
+        edit = rng.uniform(0, 0.3)
+        texts.append(" ".join(
+            rng.choice(words) if rng.random() < edit else w for w in source
+        ))
+    return texts
+
+
+def exact_pairs(texts: list[str], threshold: float) -> set[tuple[int, int]]:
+    sets = [sim.shingles(t) for t in texts]
+    return {
+        (i, j) for i, j in combinations(range(len(sets)), 2)
+        if len(sets[i] & sets[j]) / len(sets[i] | sets[j]) >= threshold
+    }
+
+
+def lsh_pairs(texts: list[str], threshold: float) -> tuple[set[tuple[int, int]], float]:
+    start = time.perf_counter()
+    signatures = [sim.signature(sim.shingles(t)) for t in texts]
+    signed = time.perf_counter() - start
+
+    buckets: dict[tuple[int, int], list[int]] = {}
+    for i, sig in enumerate(signatures):
+        for band, bucket in enumerate(sim.band_buckets(sig)):
+            buckets.setdefault((band, bucket), []).append(i)
+
+    candidates = {
+        pair for members in buckets.values() if len(members) > 1
+        for pair in combinations(members, 2)
+    }
+    return {
+        (i, j) for i, j in candidates
+        if sim.estimate(signatures[i], signatures[j]) >= threshold
+    }, signed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--submissions", type=int, default=2000)
+    parser.add_argument("--copies", type=int, default=100, help="how many are edited copies")
+    parser.add_argument("--vocabulary", type=int, default=3000)
+    parser.add_argument("--threshold", type=float, default=sim.SIMILARITY_THRESHOLD)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    texts = build(args.submissions, args.copies, args.vocabulary, args.seed)
+    print(f"{len(texts)} submissions, {args.copies} edited copies, threshold {args.threshold}"
+          f"{'' if sim.np is not None else ' (no numpy)'}\n", flush=True)
+
+    start = time.perf_counter()
+    truth = exact_pairs(texts, args.threshold)
+    exact_time = time.perf_counter() - start
+    print(f"exact   {exact_time:8.2f}s   {len(truth)} pairs", flush=True)
+
+    start = time.perf_counter()
+    found, signed = lsh_pairs(texts, args.threshold)
+    lsh_time = time.perf_counter() - start
+    hits = len(found & truth)
+    print(
+        f"minhash {lsh_time:8.2f}s   {len(found)} pairs"
+        f"   (signing {signed:.2f}s, {signed / len(texts) * 1000:.2f} ms per submission)"
+    )
+    print(
+        f"\nrecall {hits / len(truth) if truth else 1:.3f}"
+        f"   precision {hits / len(found) if found else 1:.3f}"
+        f"   {exact_time / lsh_time:.1f}x faster"
+    )
+
+
+if __name__ == "__main__":
+    main()
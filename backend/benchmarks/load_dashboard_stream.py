@@ -0,0 +1,194 @@
+# benchmarks/load_dashboard_stream.py
+'''Dashboard event streams: fan-out to many open connections.
+
+Opens --streams faculty dashboard streams (spread over the faculty
+members with papers to grade) against a running server, then grades one
+pending paper of each of them in one commit from this process, so the change reaches
+the server the way another worker's would (NOTIFY). Reports:
+  - how long opening the streams took
+  - commit-to-event latency over all streams (p50 / p99 / max)
+and does the same again for un-grading. Exits 1 if a stream missed an
+event or saw the wrong count.
+
+    uvicorn main:app --port 8000 &
+    python benchmarks/load_dashboard_stream.py --url http://127.0.0.1:8000
+
+The streams have to be real connections (the in-process transport
+buffers whole responses), so it needs --url. The grades are put back
+afterwards.
+'''
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx                                    # noqa: E402
+import orjson                                   # noqa: E402
+
+from database import engine, SessionLocal       # noqa: E402
+
+engine.echo = False
+
+from auth import create_access_token            # noqa: E402
+from bench_endpoints import percentile          # noqa: E402
+from dashboards import load_counters            # noqa: E402
+from load_registration import query             # noqa: E402
+from models import Assignment, AssignmentSubmission, FacultyCourse  # noqa: E402
+
+
+async def follow(client, token: str, inbox: asyncio.Queue, opened: asyncio.Event, failures: list):
+    """
+    One stream: puts (received_at, counters) on inbox for every event
+    """
+    try:
+        async with client.stream("GET", "/faculty/dashboard/stream", params={"token": token}) as res:
+            if res.status_code != 200:
+                failures.append(f"stream opened with {res.status_code}")
+                opened.set()
+                return
+            event = None
+            async for line in res.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[7:]
+                elif line.startswith("data: ") and event == "counters":
+                    await inbox.put((time.perf_counter(), orjson.loads(line[6:])))
+                    opened.set()
+    except (httpx.HTTPError, asyncio.CancelledError):
+        pass
+
+
+def grade(faculty_ids: list[int], submission_ids: dict[int, int] | None, marks) -> dict[int, int]:
+    """
+    Set marks on one pending paper per faculty member (or the given ones),
+    in one ORM commit so the change is NOTIFYed like any other
+    """
+    db = SessionLocal()
+    try:
+        if submission_ids is None:
+            submission_ids = {}
+            for faculty_id in faculty_ids:
+                row = db.query(AssignmentSubmission.id).join(
+                    Assignment, Assignment.id == AssignmentSubmission.assignment_id
+                ).join(
+                    FacultyCourse, FacultyCourse.course_id == Assignment.course_id
+                ).filter(
+                    FacultyCourse.faculty_id == faculty_id,
+                    AssignmentSubmission.marks.is_(None),
+                    AssignmentSubmission.id.notin_(list(submission_ids.values()) or [0])
+                ).first()
+                if row is not None:
+                    submission_ids[faculty_id] = row.id
+        for submission in db.query(AssignmentSubmission).filter(
+            AssignmentSubmission.id.in_(list(submission_ids.values()))
+        ):
+            submission.marks = marks
+        db.commit()
+        return submission_ids
+    finally:
+        db.close()
+
+
+async def round_trip(label, change, streams, failures: list):
+    """
+    Run change(), then wait for every stream's next event
+    """
+    started = time.perf_counter()
+    await asyncio.to_thread(change)
+    committed = time.perf_counter()
+    expected = {
+        faculty_id: counters["pending_papers"]
+        for faculty_id, counters in load_counters("faculty", list({fid for fid, _ in streams})).items()
+    }
+
+    latencies = []
+    for faculty_id, inbox in streams:
+        try:
+            received_at, counters = await asyncio.wait_for(inbox.get(), 10)
+        except asyncio.TimeoutError:
+            failures.append(f"{label}: a stream of faculty {faculty_id} got no event")
+            continue
+        latencies.append(received_at - committed)
+        if counters["pending_papers"] != expected[faculty_id]:
+            failures.append(
+                f"{label}: faculty {faculty_id} saw {counters['pending_papers']}, expected {expected[faculty_id]}"
+            )
+
+    if latencies:
+        print(
+            f"{label:<9} {len(latencies):>6} events  commit {(committed - started) * 1000:6.1f} ms  "
+            f"latency p50 {percentile(latencies, 50) * 1000:7.1f} ms  "
+            f"p99 {percentile(latencies, 99) * 1000:7.1f} ms  max {max(latencies) * 1000:7.1f} ms",
+            flush=True
+        )
+
+
+async def run(args) -> list[str]:
+    faculty = query("SELECT f.id, u.email FROM faculty f JOIN users u ON u.id = f.user_id ORDER BY f.id")
+    tokens = {fid: create_access_token({"sub": email, "role": "faculty"}) for fid, email in faculty}
+    # everyone watched has a paper to grade
+    gradable = [row[0] for row in query("""
+        SELECT DISTINCT fc.faculty_id
+        FROM faculty_courses fc
+        JOIN assignments a ON a.course_id = fc.course_id
+        JOIN assignment_submissions s ON s.assignment_id = a.id
+        WHERE s.marks IS NULL
+        ORDER BY fc.faculty_id
+    """)]
+    failures: list[str] = []
+
+    limits = httpx.Limits(max_connections=args.streams, max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=args.url, timeout=None, limits=limits) as client:
+        streams, tasks = [], []
+        started = time.perf_counter()
+        for i in range(args.streams):
+            faculty_id = gradable[i % len(gradable)]
+            inbox, opened = asyncio.Queue(), asyncio.Event()
+            tasks.append(asyncio.create_task(follow(client, tokens[faculty_id], inbox, opened, failures)))
+            streams.append((faculty_id, inbox, opened))
+        await asyncio.gather(*(opened.wait() for _, _, opened in streams))
+        print(f"open      {args.streams:>6} streams in {time.perf_counter() - started:6.2f}s", flush=True)
+        if failures:
+            return failures
+
+        # the server rechecks new streams on its next tick; let that pass
+        await asyncio.sleep(2)
+        for _, inbox, _ in streams:
+            while not inbox.empty():
+                inbox.get_nowait()
+        streams = [(faculty_id, inbox) for faculty_id, inbox, _ in streams]
+
+        graded = {}
+
+        def grade_all():
+            graded.update(grade(gradable, None, 0))
+
+        try:
+            await round_trip("grade", grade_all, streams, failures)
+        finally:
+            await round_trip("un-grade", lambda: grade(gradable, graded, None), streams, failures)
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=2000)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="base URL of a running server")
+    args = parser.parse_args()
+
+    failures = asyncio.run(run(args))
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures[:20]))
+        sys.exit(1)
+    print("\nevery stream saw every change")
+
+
+if __name__ == "__main__":
+    main()
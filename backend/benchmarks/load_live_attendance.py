@@ -0,0 +1,221 @@
+# benchmarks/load_live_attendance.py
+'''Live roll-call: check-in throughput and write-behind flushing.
+
+Creates a throwaway course with --students enrolled students and a
+session for today, connects one faculty WebSocket, then has every
+student check in (--concurrency requests in flight) and reports:
+  - check-ins per second accepted over HTTP
+  - how long until the last one is in attendance_records
+  - how many students the WebSocket saw arrive in deltas
+  - the time write_batch takes for one flush of --students check-ins
+Exits 1 if a check-in failed, the records don't match or the feed
+missed anyone.
+
+    python benchmarks/load_live_attendance.py                    # in-process
+    python benchmarks/load_live_attendance.py --url http://127.0.0.1:8000
+                                   # against uvicorn main:app --workers N
+
+Uses students already in the database (generate_data.py) and signs their
+tokens directly. Everything it creates is removed afterwards.
+'''
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx                                    # noqa: E402
+import orjson                                   # noqa: E402
+
+from database import engine, SessionLocal       # noqa: E402
+
+engine.echo = False                             # before main runs create_all
+
+from auth import create_access_token            # noqa: E402
+from load_registration import query, run_sql    # noqa: E402
+from main import app                            # noqa: E402
+import live_attendance                          # noqa: E402
+
+
+def create_course(students: list[int], faculty_id: int) -> int:
+    department_id = query("SELECT min(id) FROM departments")[0][0]
+    course_id = run_sql(
+        """
+        INSERT INTO courses (course_code, course_name, credits, semester, department_id)
+        VALUES (:code, 'Live attendance load test', 3, 1, :dept)
+        RETURNING id
+        """,
+        code=f"LIVE-{uuid.uuid4().hex[:8]}", dept=department_id
+    ).scalar()
+    run_sql("INSERT INTO faculty_courses (faculty_id, course_id) VALUES (:f, :c)", f=faculty_id, c=course_id)
+    run_sql(
+        "INSERT INTO enrollments (student_id, course_id) SELECT unnest(CAST(:ids AS integer[])), :c",
+        ids=students, c=course_id
+    )
+    return course_id
+
+
+def remove_course(course_id: int):
+    run_sql(
+        """
+        DELETE FROM attendance_records r USING attendance_sessions s
+        WHERE s.course_id = :c AND r.session_id = s.id AND r.session_date = s.date
+        """,
+        c=course_id
+    )
+    for table in ("attendance_sessions", "enrollments", "faculty_courses"):
+        run_sql(f"DELETE FROM {table} WHERE course_id = :c", c=course_id)
+    run_sql("DELETE FROM courses WHERE id = :c", c=course_id)
+
+
+async def watch(url: str, seen: set, ready: asyncio.Event, stop: asyncio.Event):
+    """
+    Faculty feed over a real WebSocket (--url only)
+    """
+    import websockets
+    async with websockets.connect(url) as ws:
+        orjson.loads(await ws.recv())           # snapshot
+        ready.set()
+        while not stop.is_set():
+            try:
+                message = orjson.loads(await asyncio.wait_for(ws.recv(), 0.5))
+            except asyncio.TimeoutError:
+                continue
+            seen.update(sid for sid, present in message["changes"] if present)
+
+
+async def fire(client, url: str, tokens: list[str], concurrency: int) -> tuple[dict, float]:
+    codes: dict[int, int] = {}
+    queue = iter(tokens)
+
+    async def worker():
+        for token in queue:
+            res = await client.post(url, headers={"Authorization": f"Bearer {token}"})
+            codes[res.status_code] = codes.get(res.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return codes, time.perf_counter() - started
+
+
+async def run(args, client, feed) -> list[str]:
+    students = query(
+        """
+        SELECT s.id, u.email FROM students s JOIN users u ON u.id = s.user_id
+        ORDER BY s.id LIMIT :n
+        """,
+        n=args.students
+    )
+    if len(students) < args.students:
+        sys.exit(f"need {args.students} students with accounts, found {len(students)}")
+    faculty_id, faculty_email = query(
+        "SELECT f.id, u.email FROM faculty f JOIN users u ON u.id = f.user_id ORDER BY f.id LIMIT 1"
+    )[0]
+    faculty_token = create_access_token({"sub": faculty_email, "role": "faculty"})
+    tokens = [create_access_token({"sub": email, "role": "student"}) for _, email in students]
+    ids = {sid for sid, _ in students}
+
+    course_id = create_course(sorted(ids), faculty_id)
+    failures = []
+    try:
+        res = await client.post(
+            "/faculty/attendance/session",
+            headers={"Authorization": f"Bearer {faculty_token}"},
+            json={"course_id": course_id, "date": date.today().isoformat()}
+        )
+        session_id = res.json()["id"]
+
+        seen: set[int] = set()
+        done = asyncio.Event()
+        watcher = await feed(session_id, faculty_token, seen, done)
+
+        codes, elapsed = await fire(client, f"/students/attendance/{session_id}/check-in", tokens, args.concurrency)
+        print(
+            f"check-in  {len(tokens):>6} in {elapsed:6.2f}s  {len(tokens) / elapsed:8.0f}/s"
+            f"  status {dict(sorted(codes.items()))}",
+            flush=True
+        )
+        if codes.get(202, 0) != len(tokens):
+            failures.append(f"check-ins not accepted: {codes}")
+
+        started = time.perf_counter()
+        stored: set[int] = set()
+        while time.perf_counter() - started < 10:
+            stored = {row[0] for row in query(
+                "SELECT student_id FROM attendance_records WHERE session_id = :s AND present", s=session_id
+            )}
+            if stored >= ids:
+                break
+            await asyncio.sleep(0.05)
+        print(f"stored    {len(stored):>6} records {time.perf_counter() - started:6.2f}s after the last check-in")
+        if stored != ids:
+            failures.append(f"{len(ids - stored)} check-ins missing from attendance_records")
+
+        if watcher is not None:
+            await asyncio.sleep(live_attendance.LIVE_FLUSH_SECONDS * 2)
+            done.set()
+            await watcher
+            print(f"feed      {len(seen):>6} students seen over the WebSocket")
+            if seen != ids:
+                failures.append(f"the feed missed {len(ids - seen)} check-ins")
+
+        # one flush of every student, timed on its own (an update this time)
+        db = SessionLocal()
+        try:
+            roster = live_attendance.load_roster(db, session_id)
+            batch = {session_id: (roster, {sid: True for sid in ids})}
+            started = time.perf_counter()
+            live_attendance.write_batch(db, batch)
+            took = time.perf_counter() - started
+        finally:
+            db.close()
+        print(f"flush     {len(ids):>6} check-ins in one write_batch: {took * 1000:.1f} ms")
+    finally:
+        remove_course(course_id)
+
+    return failures
+
+
+async def main_async(args) -> list[str]:
+    if args.url:
+        async def feed(session_id, token, seen, stop):
+            ready = asyncio.Event()
+            ws_url = args.url.replace("http", "ws", 1) + f"/faculty/attendance/{session_id}/live?token={token}"
+            task = asyncio.create_task(watch(ws_url, seen, ready, stop))
+            await ready.wait()
+            return task
+
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.url, timeout=None, limits=limits) as client:
+            return await run(args, client, feed)
+
+    async def no_feed(*_):
+        return None     # httpx can't open WebSockets in-process
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None) as client:
+            return await run(args, client, no_feed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=5000, help="roster size; each checks in once")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--url", help="base URL of a running server; default: in-process")
+    args = parser.parse_args()
+
+    failures = asyncio.run(main_async(args))
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nevery check-in stored")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# benchmarks/load_registration.py
+'''Registration stampede: no overselling, FIFO waitlist.
+
+Creates a throwaway course with --capacity seats and fires --requests
+registrations from distinct students all at once, then checks:
+  - enrollments = seats_taken = capacity, nobody both enrolled and waitlisted
+  - every other student is waitlisted
+  - no request failed
+Then --drops enrolled students drop concurrently and it checks that
+exactly the first --drops waitlisted students took their seats.
+
+    python benchmarks/load_registration.py                          # in-process
+    python benchmarks/load_registration.py --url http://127.0.0.1:8000
+                                          # against uvicorn main:app --workers N
+
+Uses students already in the database (generate_data.py) and signs their
+tokens directly instead of logging 2,000 users in. Everything it creates
+is removed afterwards. Exits 1 if a check fails.
+'''
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx                                    # noqa: E402
+from sqlalchemy import text                     # noqa: E402
+
+from database import engine, SessionLocal       # noqa: E402
+
+engine.echo = False                             # before main runs create_all
+
+from auth import create_access_token            # noqa: E402
+from bench_endpoints import percentile          # noqa: E402
+from main import app                            # noqa: E402
+
+
+def query(sql: str, **params) -> list:
+    db = SessionLocal()
+    try:
+        return db.execute(text(sql), params).all()
+    finally:
+        db.close()
+
+
+def run_sql(sql: str, **params):
+    db = SessionLocal()
+    try:
+        result = db.execute(text(sql), params)
+        db.commit()
+        return result
+    finally:
+        db.close()
+
+
+def create_course(capacity: int) -> int:
+    department_id = query("SELECT min(id) FROM departments")[0][0]
+    return run_sql(
+        """
+        INSERT INTO courses (course_code, course_name, credits, semester, department_id, capacity, seats_taken)
+        VALUES (:code, 'Registration load test', 3, 1, :dept, :capacity, 0)
+        RETURNING id
+        """,
+        code=f"LOAD-{uuid.uuid4().hex[:8]}", dept=department_id, capacity=capacity
+    ).scalar()
+
+
+def remove_course(course_id: int):
+    for table in ("waitlist_entries", "enrollments"):
+        run_sql(f"DELETE FROM {table} WHERE course_id = :c", c=course_id)
+    run_sql("DELETE FROM courses WHERE id = :c", c=course_id)
+
+
+async def fire(client, requests: list[tuple[str, str, str]]) -> tuple[list, list[float]]:
+    """
+    Send all requests at once; (method, url, token) -> responses in order
+    """
+    latencies = []
+
+    async def one(method, url, token):
+        start = time.perf_counter()
+        res = await client.request(method, url, headers={"Authorization": f"Bearer {token}"})
+        latencies.append(time.perf_counter() - start)
+        return res
+
+    responses = await asyncio.gather(*(one(*r) for r in requests))
+    latencies.sort()
+    return responses, latencies
+
+
+def report(label: str, responses: list, latencies: list[float], elapsed: float):
+    codes = {}
+    for res in responses:
+        codes[res.status_code] = codes.get(res.status_code, 0) + 1
+    print(
+        f"{label:<10} {len(responses):>5} requests in {elapsed:6.2f}s"
+        f"  p50 {percentile(latencies, 50) * 1000:7.1f}  p99 {percentile(latencies, 99) * 1000:7.1f} ms"
+        f"  status {dict(sorted(codes.items()))}",
+        flush=True
+    )
+
+
+async def run(args, client) -> list[str]:
+    students = query(
+        """
+        SELECT s.id, u.email FROM students s JOIN users u ON u.id = s.user_id
+        ORDER BY s.id LIMIT :n
+        """,
+        n=args.requests
+    )
+    if len(students) < args.requests:
+        sys.exit(f"need {args.requests} students with accounts, found {len(students)}")
+    tokens = {sid: create_access_token({"sub": email, "role": "student"}) for sid, email in students}
+
+    course_id = create_course(args.capacity)
+    failures = []
+    try:
+        url = f"/registration/courses/{course_id}"
+
+        # 1. stampede
+        started = time.perf_counter()
+        responses, latencies = await fire(client, [("POST", url, tokens[sid]) for sid, _ in students])
+        report("register", responses, latencies, time.perf_counter() - started)
+
+        bad = [r for r in responses if r.status_code not in (200, 202)]
+        if bad:
+            failures.append(f"{len(bad)} registrations failed, e.g. {bad[0].status_code} {bad[0].text[:200]}")
+
+        enrolled = {row[0] for row in query("SELECT student_id FROM enrollments WHERE course_id = :c", c=course_id)}
+        waitlist = [row[0] for row in query(
+            "SELECT student_id FROM waitlist_entries WHERE course_id = :c ORDER BY id", c=course_id
+        )]
+        seats_taken = query("SELECT seats_taken FROM courses WHERE id = :c", c=course_id)[0][0]
+
+        expected_enrolled = min(args.capacity, args.requests)
+        if len(enrolled) != expected_enrolled:
+            failures.append(f"{len(enrolled)} enrolled, capacity {args.capacity}")
+        if seats_taken != len(enrolled):
+            failures.append(f"seats_taken {seats_taken} != {len(enrolled)} enrollments")
+        if enrolled & set(waitlist):
+            failures.append(f"{len(enrolled & set(waitlist))} students both enrolled and waitlisted")
+        if len(waitlist) != args.requests - expected_enrolled:
+            failures.append(f"{len(waitlist)} waitlisted, expected {args.requests - expected_enrolled}")
+
+        # positions are counted when joining, so concurrent joiners may
+        # share one; they must stay within the queue
+        positions = [r.json()["position"] for r in responses if r.status_code == 202]
+        if positions and not (min(positions) >= 1 and max(positions) <= len(waitlist)):
+            failures.append(f"waitlist positions out of range: {min(positions)}..{max(positions)}")
+
+        print(f"           enrolled {len(enrolled)}, seats_taken {seats_taken}, waitlisted {len(waitlist)}")
+
+        # 2. concurrent drops promote the head of the waitlist, in order
+        drops = min(args.drops, len(enrolled), len(waitlist))
+        if drops:
+            leaving = sorted(enrolled)[:drops]
+            started = time.perf_counter()
+            responses, latencies = await fire(client, [("DELETE", url, tokens[sid]) for sid in leaving])
+            report("drop", responses, latencies, time.perf_counter() - started)
+
+            if any(r.status_code != 204 for r in responses):
+                failures.append("some drops failed")
+
+            now_enrolled = {row[0] for row in query(
+                "SELECT student_id FROM enrollments WHERE course_id = :c", c=course_id
+            )}
+            seats_taken = query("SELECT seats_taken FROM courses WHERE id = :c", c=course_id)[0][0]
+            if now_enrolled != (enrolled - set(leaving)) | set(waitlist[:drops]):
+                failures.append("freed seats did not go to the head of the waitlist")
+            if seats_taken != len(now_enrolled) or len(now_enrolled) != expected_enrolled:
+                failures.append(f"after drops: {len(now_enrolled)} enrolled, seats_taken {seats_taken}")
+            print(f"           promoted {drops} from the waitlist, enrolled {len(now_enrolled)}")
+    finally:
+        remove_course(course_id)
+
+    return failures
+
+
+async def main_async(args) -> list[str]:
+    limits = httpx.Limits(max_connections=args.requests, max_keepalive_connections=args.requests)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=None, limits=limits) as client:
+            return await run(args, client)
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None) as client:
+            return await run(args, client)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="concurrent registrations, one per student")
+    parser.add_argument("--capacity", type=int, default=150)
+    parser.add_argument("--drops", type=int, default=25)
+    parser.add_argument("--url", help="base URL of a running server; default: in-process")
+    args = parser.parse_args()
+
+    failures = asyncio.run(main_async(args))
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nno overselling, waitlist FIFO")
+
+
+if __name__ == "__main__":
+    main()
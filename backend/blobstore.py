@@ -0,0 +1,244 @@
+# blobstore.py
+
+import hashlib
+import os
+import re
+import tempfile
+
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, Response
+from python_multipart.multipart import MultipartParser, MultipartParseError, parse_options_header
+
+# =====================================================
+# CONFIG
+# =====================================================
+'''Content-addressed storage for submission bodies.
+
+A blob is named by the SHA-256 of its content, so storing the same bytes
+twice keeps one copy and a stored blob never changes. Rows point at
+blobs by hash (blobs.sha256); the bytes live outside postgres.
+
+LocalBlobStore keeps them under BLOB_DIR as ab/cd/<sha256>. Uploads are
+streamed into a temporary file in the same directory tree while being
+hashed, then renamed into place, so a half-written upload is never
+visible under a hash. Downloads are FileResponses: streamed in chunks,
+with Range / If-Range support for resuming and seeking.
+
+BLOB_STORE picks the implementation from BLOB_STORES; another backend
+(object storage, say) implements the BlobStore methods.
+
+Blobs are not deleted when nothing references them any more.'''
+
+BLOB_STORE = os.getenv("BLOB_STORE", "local")
+BLOB_DIR = os.getenv("BLOB_DIR", "blobs")
+BLOB_MAX_BYTES = int(os.getenv("BLOB_MAX_BYTES", str(50 * 1024 * 1024)))
+
+_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+
+class StoredBlob:
+    def __init__(self, sha256: str, size: int, content_type: str, filename: str | None = None):
+        self.sha256 = sha256
+        self.size = size
+        self.content_type = content_type
+        self.filename = filename
+
+
+# =====================================================
+# STORES
+# =====================================================
+
+class BlobStore:
+    def writer(self) -> "BlobWriter":
+        raise NotImplementedError
+
+    def exists(self, sha256: str) -> bool:
+        raise NotImplementedError
+
+    def read(self, sha256: str) -> bytes:
+        raise NotImplementedError
+
+    def response(self, sha256: str, media_type: str, filename: str | None = None) -> Response:
+        raise NotImplementedError
+
+
+class BlobWriter:
+    """
+    Receives a blob chunk by chunk; commit() stores it, abort() drops it
+    """
+    def write(self, data: bytes):
+        raise NotImplementedError
+
+    def commit(self) -> tuple[str, int]:
+        raise NotImplementedError
+
+    def abort(self):
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: str = BLOB_DIR):
+        self.root = root
+
+    def path(self, sha256: str) -> str:
+        if not _SHA256.fullmatch(sha256):
+            raise ValueError("not a sha256 hex digest")
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def writer(self) -> "LocalBlobWriter":
+        return LocalBlobWriter(self)
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.path(sha256))
+
+    def read(self, sha256: str) -> bytes:
+        with open(self.path(sha256), "rb") as f:
+            return f.read()
+
+    def response(self, sha256: str, media_type: str, filename: str | None = None) -> Response:
+        path = self.path(sha256)
+        if not os.path.exists(path):
+            raise HTTPException(status_code=404, detail="Blob not found")
+        return FileResponse(
+            path,
+            media_type=media_type,
+            filename=filename,
+            content_disposition_type="inline" if media_type.startswith("text/") else "attachment"
+        )
+
+
+class LocalBlobWriter(BlobWriter):
+    def __init__(self, store: LocalBlobStore):
+        self.store = store
+        self.hash = hashlib.sha256()
+        self.size = 0
+        tmp_dir = os.path.join(store.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > BLOB_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Larger than {BLOB_MAX_BYTES} bytes")
+        self.hash.update(data)
+        self.file.write(data)
+
+    def commit(self) -> tuple[str, int]:
+        self.file.close()
+        sha256 = self.hash.hexdigest()
+        path = self.store.path(sha256)
+        if os.path.exists(path):
+            os.unlink(self.tmp_path)        # already stored: dedup
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self.tmp_path, path)
+        return sha256, self.size
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.unlink(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+BLOB_STORES = {
+    "local": LocalBlobStore,
+}
+
+blob_store: BlobStore = BLOB_STORES[BLOB_STORE]()
+
+
+def store_bytes(data: bytes, content_type: str, filename: str | None = None) -> StoredBlob:
+    writer = blob_store.writer()
+    try:
+        writer.write(data)
+    except BaseException:
+        writer.abort()
+        raise
+    sha256, size = writer.commit()
+    return StoredBlob(sha256, size, content_type, filename)
+
+
+# =====================================================
+# STREAMING MULTIPART UPLOAD
+# =====================================================
+
+async def receive_upload(request: Request, field: str = "file") -> StoredBlob:
+    """
+    Stream one multipart/form-data file field straight into the blob
+    store, without spooling the request first. Other fields are ignored.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data")
+
+    part = {}               # headers of the part being parsed
+    header = [b"", b""]
+    target = None           # the part is our file field
+    buffer = bytearray()
+    found = None            # (content_type, filename) once the field started
+
+    def on_part_begin():
+        part.clear()
+
+    def on_header_field(data, start, end):
+        header[0] += data[start:end]
+
+    def on_header_value(data, start, end):
+        header[1] += data[start:end]
+
+    def on_header_end():
+        part[header[0].lower()] = header[1]
+        header[0], header[1] = b"", b""
+
+    def on_headers_finished():
+        nonlocal target, found
+        _, disposition = parse_options_header(part.get(b"content-disposition", b""))
+        target = disposition.get(b"name") == field.encode() and found is None
+        if target:
+            found = (
+                part.get(b"content-type", b"application/octet-stream").decode("latin-1"),
+                disposition.get(b"filename", b"").decode("utf-8", "replace") or None,
+            )
+
+    def on_part_data(data, start, end):
+        if target:
+            buffer.extend(data[start:end])
+
+    def on_part_end():
+        nonlocal target
+        target = False
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    writer = await run_in_threadpool(blob_store.writer)
+    try:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except MultipartParseError:
+                raise HTTPException(status_code=400, detail="Malformed multipart body")
+            if buffer:
+                await run_in_threadpool(writer.write, bytes(buffer))
+                buffer.clear()
+        parser.finalize()
+        if found is None:
+            raise HTTPException(status_code=400, detail=f"No '{field}' file in the upload")
+        sha256, size = await run_in_threadpool(writer.commit)
+    except BaseException:
+        await run_in_threadpool(writer.abort)
+        raise
+
+    return StoredBlob(sha256, size, found[0], found[1])
@@ -0,0 +1,180 @@
+# build_frontend.py
+'''Build frontend/ into frontend/dist for the backend to serve.
+
+    python build_frontend.py
+
+  - JS and CSS files get a content hash in their name (admin.3f9a1c2b7d.js)
+    and every reference to them (ES module imports, <script src>,
+    <link href>, CSS url()) is rewritten. Dependencies are hashed first,
+    so a change to api.js also renames every module that imports it.
+  - HTML pages keep their names; they are the entry points.
+  - Text files of at least COMPRESSION_MIN_SIZE bytes get .gz (level 9)
+    and .br (quality 11, if brotli is installed) siblings, which
+    static_assets.PrecompressedStaticFiles sends as-is.
+  - dist/manifest.json maps original paths to hashed ones.
+
+Output is deterministic: same sources, same bytes.'''
+
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+import sys
+
+from compression import COMPRESSION_MIN_SIZE, brotli
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE = os.path.join(ROOT, "frontend")
+DIST = os.path.join(SOURCE, "dist")
+
+HASHED_TYPES = (".js", ".css", ".svg", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".woff", ".woff2")
+TEXT_TYPES = (".html", ".js", ".css", ".svg", ".json")
+
+JS_IMPORT = re.compile(r"""(\bfrom\s*|\bimport\s*\(?\s*)(["'])(\.{1,2}/[^"']+)\2""")
+CSS_URL = re.compile(r"""url\(\s*(["']?)(?!data:|https?:|//)([^"')]+)\1\s*\)""")
+HTML_REF = re.compile(r"""\b(src|href)=(["'])(?!https?:|//|#|mailto:|data:)([^"']+)\2""")
+
+
+def sources() -> list[str]:
+    """
+    Paths relative to SOURCE, '/'-separated, dist excluded
+    """
+    found = []
+    for directory, dirs, files in os.walk(SOURCE):
+        dirs[:] = sorted(d for d in dirs if os.path.join(directory, d) != DIST and not d.startswith("."))
+        for name in sorted(files):
+            if name.startswith("."):
+                continue
+            rel = os.path.relpath(os.path.join(directory, name), SOURCE)
+            found.append(rel.replace(os.sep, "/"))
+    return found
+
+
+def references(path: str, text: str) -> list[tuple[re.Pattern, int]]:
+    if path.endswith(".js"):
+        return [(JS_IMPORT, 3)]
+    if path.endswith(".css"):
+        return [(CSS_URL, 2)]
+    if path.endswith(".html"):
+        return [(HTML_REF, 3), (CSS_URL, 2)]
+    return []
+
+
+def resolve(path: str, ref: str) -> str:
+    clean = ref.split("?")[0].split("#")[0]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(path), clean))
+
+
+def rewrite(path: str, text: str, renamed: dict[str, str]) -> tuple[str, set[str]]:
+    """
+    Point references at hashed names; also return the local files referenced
+    """
+    deps = set()
+    for pattern, group in references(path, text):
+        def replace(match):
+            target = resolve(path, match.group(group))
+            deps.add(target)
+            if target not in renamed:
+                return match.group(0)
+            new_ref = posixpath.relpath(renamed[target], posixpath.dirname(path) or ".")
+            if match.group(group).startswith("./") and not new_ref.startswith("."):
+                new_ref = "./" + new_ref
+            start, end = match.span(group)
+            whole_start = match.start(0)
+            return match.group(0)[:start - whole_start] + new_ref + match.group(0)[end - whole_start:]
+        text = pattern.sub(replace, text)
+    return text, deps
+
+
+def hashed_name(path: str, data: bytes) -> str:
+    stem, ext = posixpath.splitext(path)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+
+def build() -> dict[str, str]:
+    files = sources()
+    contents = {}
+    for path in files:
+        with open(os.path.join(SOURCE, path), "rb") as f:
+            contents[path] = f.read()
+
+    def is_text(path):
+        return path.endswith(TEXT_TYPES)
+
+    deps = {
+        path: {d for d in rewrite(path, contents[path].decode(), {})[1] if d in contents}
+        if is_text(path) else set()
+        for path in files
+    }
+
+    # hash leaves first so importers see their dependencies' final names
+    renamed: dict[str, str] = {}
+    output: dict[str, bytes] = {}
+    visiting = set()
+
+    def emit(path):
+        if path in output:
+            return
+        if path in visiting:
+            sys.exit(f"Import cycle through {path}; can't content-hash it")
+        visiting.add(path)
+        for dep in sorted(deps[path]):
+            emit(dep)
+        visiting.discard(path)
+
+        data = contents[path]
+        if is_text(path):
+            data = rewrite(path, data.decode(), renamed)[0].encode()
+        if path.endswith(HASHED_TYPES):
+            renamed[path] = hashed_name(path, data)
+        output[path] = data
+
+    for path in files:
+        emit(path)
+
+    if os.path.isdir(DIST):
+        shutil.rmtree(DIST)
+
+    for path, data in output.items():
+        target = os.path.join(DIST, renamed.get(path, path))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(data)
+
+        if not is_text(path) or len(data) < COMPRESSION_MIN_SIZE:
+            continue
+        variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", brotli.compress(data, quality=11)))
+        for suffix, packed in variants:
+            if len(packed) < len(data):
+                with open(target + suffix, "wb") as f:
+                    f.write(packed)
+
+    manifest = {path: renamed.get(path, path) for path in files}
+    with open(os.path.join(DIST, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def main():
+    manifest = build()
+    total = raw = 0
+    for original, built in sorted(manifest.items()):
+        path = os.path.join(DIST, built)
+        size = os.path.getsize(path)
+        best = min(
+            [size] + [os.path.getsize(path + s) for s in (".br", ".gz") if os.path.exists(path + s)]
+        )
+        raw += size
+        total += best
+        print(f"  {original:<28} -> {built:<36} {size:>8,} B  {best:>8,} B on the wire")
+    print(f"built {len(manifest)} files into {DIST} ({raw:,} B, {total:,} B compressed)"
+          + ("" if brotli is not None else "; brotli not installed, .gz only"))
+
+
+if __name__ == "__main__":
+    main()
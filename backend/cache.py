@@ -0,0 +1,150 @@
+# cache.py
+
+import threading
+import time
+
+from database import in_batch
+
+# =====================================================
+# IN-PROCESS CACHES
+# =====================================================
+'''Small TTL caches that live inside one worker process.
+Each cache declares the tables it is derived from; a change to one of
+those tables (reported by invalidation.py, locally or from another
+worker) evicts the affected entries.
+
+Entries can be tagged with (table, primary key) pairs. A change to a
+table only evicts entries tagged with the changed key; entries with no
+tag for that table are evicted on any change to it.
+
+Inside POST /batch the caches are bypassed: a batch reads its own
+uncommitted writes, which must not outlive a rollback.'''
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, name: str, ttl_seconds: float, tables: set[str], maxsize: int = 10_000):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.tables = set(tables)
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries: dict = {}        # key -> (expires_at, value, tags)
+        self._generation = 0            # bumped on every eviction
+
+    def get(self, key, default=None):
+        if in_batch():
+            return default
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return default
+            return entry[1]
+
+    def set(self, key, value, tags=()):
+        if in_batch():
+            return
+        with self._lock:
+            if len(self._entries) >= self.maxsize:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value, frozenset(tags))
+
+    def get_or_load(self, key, loader, tags=()):
+        """
+        Return the cached value or load and store it.
+        A value loaded while an eviction happened is returned but not stored,
+        so a slow loader can't put stale data back into the cache.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            generation = self._generation
+
+        value = loader()
+
+        with self._lock:
+            if generation != self._generation:
+                return value
+        self.set(key, value, tags)
+        return value
+
+    def invalidate(self, table: str, key=None):
+        if table not in self.tables:
+            return
+
+        with self._lock:
+            self._generation += 1
+            for cache_key, (_, _, tags) in list(self._entries.items()):
+                tagged_for_table = any(t[0] == table for t in tags)
+                if key is None or not tagged_for_table or (table, key) in tags:
+                    del self._entries[cache_key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "tables": sorted(self.tables)}
+
+
+# =====================================================
+# REGISTRY
+# =====================================================
+
+_caches: dict[str, TTLCache] = {}
+
+
+def register_cache(cache: TTLCache) -> TTLCache:
+    _caches[cache.name] = cache
+    return cache
+
+
+def invalidate(table: str, key=None):
+    """
+    Evict everything derived from (table, key) in every cache
+    """
+    for cache in _caches.values():
+        cache.invalidate(table, key)
+
+
+def clear_all():
+    for cache in _caches.values():
+        cache.clear()
+
+
+def cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in _caches.items()}
+
+
+# email -> detached User snapshot
+principal_cache = register_cache(
+    TTLCache("principals", ttl_seconds=300, tables={"users"})
+)
+
+# course catalog listings
+catalog_cache = register_cache(
+    TTLCache("catalog", ttl_seconds=600, tables={"courses", "departments"})
+)
+
+# course id -> timetable slots, shared by everyone enrolled in the course
+timetable_cache = register_cache(
+    TTLCache(
+        "timetables",
+        ttl_seconds=300,
+        tables={"timetable", "faculty_courses", "courses", "faculty"}
+    )
+)
+
+# attendance session id -> LiveRoster (live_attendance.py): rows rosters
+# follow enrollments, and students are looked up by their users' emails
+live_roster_cache = register_cache(
+    TTLCache("live_rosters", ttl_seconds=300, tables={"enrollments", "students", "users"})
+)
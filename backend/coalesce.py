@@ -0,0 +1,107 @@
+# coalesce.py
+
+import threading
+from collections import defaultdict
+
+from database import in_batch
+
+# =====================================================
+# SINGLE-FLIGHT REQUEST COALESCING
+# =====================================================
+'''Sync routes run on the threadpool, so when hundreds of identical reads
+land at the same moment they would each run the same query.
+With single-flight the first caller (the leader) runs the query and every
+identical caller that arrives while it is running waits for that result
+instead of hitting the database.
+
+Callers only share a load when their keys are equal, so key on the part
+of the data that is shared (a course's timetable, a department's
+catalog) and assemble per-user results on top of it. A key that names
+the principal only folds that user's own overlapping requests.
+
+Followers wait on a threadpool thread, usually with their request's
+pooled DB connection already checked out, so a slow leader ties up
+threads and connections behind it (at most FOLLOWER_TIMEOUT_SECONDS).
+
+Only use it for read-only work that returns plain data (dicts / lists),
+never ORM objects: followers never touch the leader's session.
+Sub-requests of POST /batch always run fn() themselves: they read the
+batch's uncommitted writes, which no other caller may be handed.'''
+
+FOLLOWER_TIMEOUT_SECONDS = 30
+
+
+class _InFlight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[tuple, _InFlight] = {}
+        self._stats = defaultdict(lambda: {"executed": 0, "coalesced": 0})
+
+    def do(self, key: tuple, fn):
+        """
+        Run fn() once per key at a time and share its result
+        with every caller that arrives while it is in flight
+        """
+        if in_batch():
+            return fn()
+
+        route = key[0]
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlight()
+                self._calls[key] = call
+                self._stats[route]["executed"] += 1
+            else:
+                self._stats[route]["coalesced"] += 1
+
+        if not leader:
+            # a stuck leader must not stall everyone behind it
+            if not call.done.wait(FOLLOWER_TIMEOUT_SECONDS):
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                route: {
+                    **counts,
+                    "in_flight": sum(1 for k in self._calls if k[0] == route)
+                }
+                for route, counts in self._stats.items()
+            }
+
+
+def coalesce_key(route: str, scope, **params) -> tuple:
+    """
+    Build the identity of a read: route, principal scope and params.
+    Use scope="public" for data that is the same for every caller.
+    """
+    return (route, scope, tuple(sorted(params.items())))
+
+
+single_flight = SingleFlight()
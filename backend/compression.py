@@ -0,0 +1,173 @@
+# compression.py
+
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:     # without brotli, clients get gzip
+    brotli = None
+
+# =====================================================
+# CONFIG
+# =====================================================
+'''Response compression for API responses.
+
+Bodies of at least COMPRESSION_MIN_SIZE bytes with a compressible
+content type are compressed with brotli when the client accepts it (and
+the brotli package is installed), otherwise gzip. Streamed responses are
+compressed chunk by chunk, flushing after each chunk so nothing is held
+back. Server-sent events and responses that already carry a
+Content-Encoding (precompressed static files) are passed through, and so
+are responses that serve byte ranges (Accept-Ranges / Content-Range, e.g.
+blob downloads): a range must address the bytes as stored.
+
+Dynamic responses favour speed: the defaults are gzip 6 and brotli 4.
+Static assets are compressed at maximum level at build time instead
+(build_frontend.py).'''
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "text/",
+    "image/svg+xml",
+)
+NEVER_COMPRESS = ("text/event-stream",)
+
+
+def accepted_encodings(header: str) -> set[str]:
+    """
+    Codings from an Accept-Encoding header with a non-zero q
+    """
+    result = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            result.add(coding.strip().lower())
+    return result
+
+
+def choose_encoding(header: str) -> str | None:
+    accepted = accepted_encodings(header)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+# =====================================================
+# COMPRESSORS
+# =====================================================
+
+class _Gzip:
+    def __init__(self, level: int):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._z.compress(data) + self._z.flush()
+
+
+class _Brotli:
+    def __init__(self, quality: int):
+        self._c = brotli.Compressor(quality=quality)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._c.process(data) + self._c.finish()
+
+
+def compressor(encoding: str):
+    return _Brotli(BROTLI_QUALITY) if encoding == "br" else _Gzip(GZIP_LEVEL)
+
+
+# =====================================================
+# MIDDLEWARE
+# =====================================================
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            return await self.app(scope, receive, send)
+
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept)
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        codec = None            # set once we decided to compress
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, codec, passthrough
+
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+
+            if codec is None:
+                headers = {k.lower(): v for k, v in start.get("headers", [])}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                if (
+                    b"content-encoding" in headers
+                    or b"accept-ranges" in headers
+                    or b"content-range" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or content_type.startswith(NEVER_COMPRESS)
+                    or (not more and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+
+                codec = compressor(encoding)
+                raw = [
+                    (k, v) for k, v in start.get("headers", [])
+                    if k.lower() not in (b"content-length", b"vary")
+                ]
+                vary = headers.get(b"vary", b"")
+                raw.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+                raw.append((b"content-encoding", encoding.encode()))
+
+                if not more:
+                    data = codec.finish(body)
+                    raw.append((b"content-length", str(len(data)).encode()))
+                    await send({**start, "headers": raw})
+                    return await send({"type": "http.response.body", "body": data})
+
+                await send({**start, "headers": raw})
+
+            data = codec.chunk(body) if more else codec.finish(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,462 @@
+# dashboards.py
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import attendance_bitmap
+import invalidation
+from auth import user_from_token
+from coalesce import single_flight, coalesce_key
+from database import SessionLocal
+from models import AttendanceSession, Faculty, Student
+
+logger = logging.getLogger("cms.dashboards")
+
+# =====================================================
+# CONFIG
+# =====================================================
+'''Dashboard counters, and a server-sent event stream of them.
+
+Counters are computed for many profiles at once: one statement per role
+takes an array of profile ids and returns a row for each.
+GET /faculty/dashboard and /students/dashboard ask for one id.
+
+GET /faculty/dashboard/stream and /students/dashboard/stream are
+EventSource streams of "counters" events, the same object the dashboard
+endpoint returns, sent when it changes. Changes are noticed through
+invalidation.py: every committed change, in this worker or another,
+names its table, and a change to a table a role's counters read marks
+the role dirty. Every DASHBOARD_PUSH_SECONDS a pusher thread recomputes
+each dirty role for every profile with a stream open in this worker, in
+one statement, and sends only values that differ from the last ones
+sent. That is at most one query per role per interval however many
+changes or streams there are; an event is encoded once per profile and
+shared by all of that profile's streams.
+
+A stream only ever holds the latest value, so a slow reader skips
+values instead of queueing them. Counters that move with the clock
+(classes today, next class, days to exam) are recomputed every
+DASHBOARD_REFRESH_SECONDS regardless, and an idle stream gets a comment
+every DASHBOARD_KEEPALIVE_SECONDS so proxies don't close it.
+
+Streams are long-lived: they skip admission control (admission.py) and
+hold no database connection between events. EventSource can't set
+headers, so the token comes as ?token=.'''
+
+DASHBOARD_PUSH_SECONDS = float(os.getenv("DASHBOARD_PUSH_SECONDS", "1"))
+DASHBOARD_REFRESH_SECONDS = 60
+DASHBOARD_KEEPALIVE_SECONDS = 15
+DASHBOARD_RETRY_MS = 5000       # EventSource reconnect delay
+
+# tables each role's counters are computed from
+ROLE_TABLES = {
+    "faculty": {
+        "faculty_courses", "courses", "enrollments", "assignments",
+        "assignment_submissions", "timetable",
+    },
+    "student": {
+        "enrollments", "assignments", "assignment_submissions", "exams",
+        "attendance_sessions", "attendance_records", "attendance_term_summaries",
+    },
+}
+
+PROFILES = {"faculty": Faculty, "student": Student}
+
+
+# =====================================================
+# COUNTERS
+# =====================================================
+
+FACULTY_COUNTERS = text("""
+    WITH ids AS (
+        SELECT DISTINCT unnest(CAST(:ids AS integer[])) AS faculty_id
+    )
+    SELECT i.faculty_id, k.courses, st.students, p.pending_papers, t.classes_today,
+           n.course_name AS next_course, n.start_time AS next_time, n.room AS next_room
+    FROM ids i
+    CROSS JOIN LATERAL (
+        SELECT count(*) AS courses FROM faculty_courses fc WHERE fc.faculty_id = i.faculty_id
+    ) k
+    CROSS JOIN LATERAL (
+        SELECT count(DISTINCT e.student_id) AS students
+        FROM faculty_courses fc
+        JOIN enrollments e ON e.course_id = fc.course_id
+        WHERE fc.faculty_id = i.faculty_id
+    ) st
+    CROSS JOIN LATERAL (
+        SELECT count(*) AS pending_papers
+        FROM faculty_courses fc
+        JOIN assignments a ON a.course_id = fc.course_id
+        JOIN assignment_submissions s ON s.assignment_id = a.id
+        WHERE fc.faculty_id = i.faculty_id AND s.marks IS NULL
+    ) p
+    CROSS JOIN LATERAL (
+        SELECT count(*) AS classes_today
+        FROM faculty_courses fc
+        JOIN timetable t ON t.course_id = fc.course_id
+        WHERE fc.faculty_id = i.faculty_id AND t.day_of_week = :day
+    ) t
+    LEFT JOIN LATERAL (
+        SELECT c.course_name, t.start_time, t.room
+        FROM faculty_courses fc
+        JOIN courses c ON c.id = fc.course_id
+        JOIN timetable t ON t.course_id = c.id
+        WHERE fc.faculty_id = i.faculty_id AND t.day_of_week = :day AND t.start_time > :now
+        ORDER BY t.start_time, t.id
+        LIMIT 1
+    ) n ON true
+""")
+
+STUDENT_COUNTERS = text("""
+    WITH ids AS (
+        SELECT DISTINCT unnest(CAST(:ids AS integer[])) AS student_id
+    )
+    SELECT i.student_id, k.courses, p.pending_assignments, x.next_exam
+    FROM ids i
+    CROSS JOIN LATERAL (
+        SELECT count(*) AS courses FROM enrollments e WHERE e.student_id = i.student_id
+    ) k
+    CROSS JOIN LATERAL (
+        SELECT count(*) AS pending_assignments
+        FROM enrollments e
+        JOIN assignments a ON a.course_id = e.course_id
+        WHERE e.student_id = i.student_id
+          AND a.due_date >= :today
+          AND NOT EXISTS (
+              SELECT 1 FROM assignment_submissions s
+              WHERE s.assignment_id = a.id AND s.student_id = i.student_id
+          )
+    ) p
+    CROSS JOIN LATERAL (
+        SELECT min(x.exam_date) AS next_exam
+        FROM enrollments e
+        JOIN exams x ON x.course_id = e.course_id
+        WHERE e.student_id = i.student_id AND x.exam_date >= :today
+    ) x
+""")
+
+# live (rows) and archived attendance; bitmap sessions are added in python
+ATTENDANCE_TOTALS = text("""
+    WITH ids AS (
+        SELECT DISTINCT unnest(CAST(:ids AS integer[])) AS student_id
+    )
+    SELECT i.student_id,
+           r.present + t.attended AS present,
+           r.total + t.total AS total
+    FROM ids i
+    CROSS JOIN LATERAL (
+        SELECT count(*) FILTER (WHERE r.present) AS present, count(*) AS total
+        FROM attendance_records r WHERE r.student_id = i.student_id
+    ) r
+    CROSS JOIN LATERAL (
+        SELECT coalesce(sum(s.attended), 0) AS attended, coalesce(sum(s.total), 0) AS total
+        FROM attendance_term_summaries s WHERE s.student_id = i.student_id
+    ) t
+""")
+
+
+def faculty_counters(db: Session, faculty_ids: list[int], now: datetime | None = None) -> dict[int, dict]:
+    """
+    faculty id -> FacultyDashboard dict
+    """
+    now = now or datetime.now()
+    rows = db.execute(FACULTY_COUNTERS, {
+        "ids": faculty_ids, "day": now.strftime("%A"), "now": now.time()
+    }).all()
+
+    return {
+        r.faculty_id: {
+            "courses": r.courses,
+            "students": r.students,
+            "pending_papers": r.pending_papers,
+            "meetings_today": 2,        # meetings aren't stored yet
+            "classes_today": r.classes_today,
+            "next_class": {
+                "course": r.next_course,
+                "time": r.next_time.strftime("%I:%M %p"),
+                "room": r.next_room
+            } if r.next_time is not None else None
+        }
+        for r in rows
+    }
+
+
+def attendance_totals(db: Session, student_ids: list[int]) -> dict[int, tuple[int, int]]:
+    """
+    student id -> (present, total) over open terms (live partitions, row
+    and bitmap sessions) plus the summaries of archived terms
+    """
+    totals = {r.student_id: [r.present, r.total] for r in db.execute(ATTENDANCE_TOTALS, {"ids": student_ids})}
+
+    # bitmap sessions any of them is on the roster of (GIN index on roster),
+    # counted a roster at a time
+    sessions = db.query(AttendanceSession.roster, AttendanceSession.presence).filter(
+        AttendanceSession.presence.isnot(None),
+        AttendanceSession.roster.overlap(student_ids)
+    )
+    by_roster: dict[tuple[int, ...], list[bytes]] = {}
+    for roster, presence in sessions:
+        by_roster.setdefault(tuple(roster), []).append(presence)
+
+    for roster, presences in by_roster.items():
+        attended = attendance_bitmap.roster_totals(list(roster), presences)
+        for student_id in totals.keys() & attended.keys():
+            totals[student_id][0] += attended[student_id]
+            totals[student_id][1] += len(presences)
+
+    return {student_id: (present, total) for student_id, (present, total) in totals.items()}
+
+
+def student_counters(db: Session, student_ids: list[int], today: date | None = None) -> dict[int, dict]:
+    """
+    student id -> StudentDashboard dict
+    """
+    today = today or date.today()
+    rows = db.execute(STUDENT_COUNTERS, {"ids": student_ids, "today": today}).all()
+    attendance = attendance_totals(db, student_ids)
+
+    counters = {}
+    for r in rows:
+        present, total = attendance[r.student_id]
+        counters[r.student_id] = {
+            "courses": r.courses,
+            "attendance_percentage": round(present / total * 100) if total > 0 else 0,
+            "pending_assignments": r.pending_assignments,
+            "days_to_exam": (r.next_exam - today).days if r.next_exam is not None else None,
+        }
+    return counters
+
+
+COUNTERS = {"faculty": faculty_counters, "student": student_counters}
+
+
+def load_counters(role: str, profile_ids: list[int]) -> dict[int, dict]:
+    db = SessionLocal()
+    try:
+        return COUNTERS[role](db, profile_ids)
+    finally:
+        db.close()
+
+
+def counters_event(values: dict, retry: bool = False) -> bytes:
+    head = f"retry: {DASHBOARD_RETRY_MS}\n".encode() if retry else b""
+    return head + b"event: counters\ndata: " + orjson.dumps(values) + b"\n\n"
+
+
+# =====================================================
+# HUB (ONE PER WORKER)
+# =====================================================
+
+class StreamClient:
+    """
+    One open stream. Holds only the latest event.
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.latest: bytes | None = None
+        self.ready = asyncio.Event()
+
+    def offer(self, event: bytes):
+        # on the client's loop
+        self.latest = event
+        self.ready.set()
+
+
+def _deliver(deliveries: list[tuple[StreamClient, bytes]]):
+    for client, event in deliveries:
+        client.offer(event)
+
+
+class DashboardHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: dict[str, dict[int, set[StreamClient]]] = {role: {} for role in ROLE_TABLES}
+        self._sent: dict[tuple[str, int], bytes] = {}
+        self._dirty: set[str] = set()
+
+    def changed(self, table: str | None, key=None):
+        """
+        invalidation.on_change() handler: any thread, kept cheap
+        """
+        roles = {role for role, tables in ROLE_TABLES.items() if table is None or table in tables}
+        if roles:
+            with self._lock:
+                self._dirty |= roles
+
+    def mark_all(self):
+        with self._lock:
+            self._dirty |= set(ROLE_TABLES)
+
+    def subscribe(self, role: str, profile_id: int, client: StreamClient, initial: bytes):
+        """
+        initial: the event the stream opens with. It may already be
+        behind, so the role is recomputed on the next tick.
+        """
+        with self._lock:
+            clients = self._clients[role].setdefault(profile_id, set())
+            if clients:
+                # the profile's other streams may hold something else:
+                # send the next value to all of them
+                self._sent.pop((role, profile_id), None)
+            else:
+                self._sent[(role, profile_id)] = initial
+            clients.add(client)
+            self._dirty.add(role)
+
+    def unsubscribe(self, role: str, profile_id: int, client: StreamClient):
+        with self._lock:
+            clients = self._clients[role].get(profile_id)
+            if clients is not None:
+                clients.discard(client)
+                if not clients:
+                    del self._clients[role][profile_id]
+                    self._sent.pop((role, profile_id), None)
+
+    def streams(self) -> int:
+        with self._lock:
+            return sum(len(c) for profiles in self._clients.values() for c in profiles.values())
+
+    def push(self) -> int:
+        """
+        Recompute the dirty roles and send what changed; returns the
+        number of events handed to streams
+        """
+        with self._lock:
+            work = {role: list(self._clients[role]) for role in self._dirty if self._clients[role]}
+            self._dirty.clear()
+
+        deliveries: dict[asyncio.AbstractEventLoop, list] = {}
+        for role, profile_ids in work.items():
+            try:
+                values = load_counters(role, profile_ids)
+            except Exception:
+                logger.exception("Recomputing %s dashboards failed, retrying next tick", role)
+                with self._lock:
+                    self._dirty.add(role)
+                continue
+
+            with self._lock:
+                for profile_id, counters in values.items():
+                    clients = self._clients[role].get(profile_id)
+                    if not clients:
+                        continue
+                    event = counters_event(counters)
+                    if self._sent.get((role, profile_id)) == event:
+                        continue
+                    self._sent[(role, profile_id)] = event
+                    for client in clients:
+                        deliveries.setdefault(client.loop, []).append((client, event))
+
+        # one wakeup per event loop, not per stream
+        for loop, batch in deliveries.items():
+            try:
+                loop.call_soon_threadsafe(_deliver, batch)
+            except RuntimeError:
+                pass        # loop closed under us: the streams are gone
+        return sum(len(batch) for batch in deliveries.values())
+
+
+hub = DashboardHub()
+invalidation.on_change(hub.changed)
+
+
+class DashboardPusher(threading.Thread):
+    def __init__(self):
+        super().__init__(name="dashboard-pusher", daemon=True)
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self):
+        refresh_at = time.monotonic() + DASHBOARD_REFRESH_SECONDS
+        while not self._stopping.wait(DASHBOARD_PUSH_SECONDS):
+            if time.monotonic() >= refresh_at:
+                refresh_at = time.monotonic() + DASHBOARD_REFRESH_SECONDS
+                hub.mark_all()
+            hub.push()
+
+
+_pusher: DashboardPusher | None = None
+
+
+def start_pusher():
+    global _pusher
+    if _pusher is not None:
+        return
+    _pusher = DashboardPusher()
+    _pusher.start()
+
+
+def stop_pusher():
+    global _pusher
+    if _pusher is not None:
+        _pusher.stop()
+        _pusher.join(timeout=10)
+        _pusher = None
+
+
+# =====================================================
+# STREAM
+# =====================================================
+
+def stream_profile(role: str, token: str) -> tuple[int, dict]:
+    """
+    The profile behind ?token= and its current counters. Uses its own
+    short session; the stream holds no connection.
+    """
+    db = SessionLocal()
+    try:
+        user = user_from_token(token, db) if token else None
+        if user is None:
+            raise HTTPException(status_code=401, detail="Could not validate credentials")
+        if user.role != role:
+            raise HTTPException(status_code=403, detail=f"{role.capitalize()} access required")
+
+        model = PROFILES[role]
+        profile_id = db.query(model.id).filter(model.user_id == user.id).scalar()
+        if profile_id is None:
+            raise HTTPException(status_code=404, detail=f"{role.capitalize()} profile not found")
+        # a reconnect wave opens many streams per profile at once
+        return profile_id, single_flight.do(
+            coalesce_key(f"{role}.dashboard", profile_id),
+            lambda: COUNTERS[role](db, [profile_id])[profile_id]
+        )
+    finally:
+        db.close()
+
+
+async def _events(role: str, profile_id: int, initial: dict):
+    client = StreamClient(asyncio.get_running_loop())
+    hub.subscribe(role, profile_id, client, counters_event(initial))
+    try:
+        yield counters_event(initial, retry=True)
+        while True:
+            try:
+                await asyncio.wait_for(client.ready.wait(), DASHBOARD_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            client.ready.clear()
+            event, client.latest = client.latest, None
+            yield event
+    finally:
+        hub.unsubscribe(role, profile_id, client)
+
+
+def event_stream(role: str, profile_id: int, initial: dict) -> StreamingResponse:
+    return StreamingResponse(
+        _events(role, profile_id, initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
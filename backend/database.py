@@ -1,11 +1,13 @@
 # database.py
 import os
+from contextvars import ContextVar
 from dotenv import load_dotenv
 
 load_dotenv()
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from starlette.requests import HTTPConnection
 
 # =====================================================
 # DATABASE CONFIG
@@ -20,6 +22,11 @@ DB_NAME = "college_db"
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# connections per worker: DB_POOL_SIZE kept open, up to DB_MAX_OVERFLOW more
+# under load. admission.py keeps in-flight requests within their sum.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
 
 #connection string format for PostgreSQL
 
@@ -30,9 +37,15 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 engine = create_engine(
     DATABASE_URL,
     echo=True,          # Set False in production
-    future=True
+    future=True,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW
 ) #connection to the database
 
+# statements slower than SLOW_QUERY_MS end up in GET /admin/slow-queries
+from slow_queries import install_slow_query_log
+install_slow_query_log(engine)
+
 # =====================================================
 # SESSION
 # =====================================================
@@ -53,11 +66,24 @@ Base = declarative_base() #all models will inherit from this base class "Base"
 # DEPENDENCY
 # =====================================================
 
-def get_db():
+# sub-requests of POST /batch find their batch.Batch here; their sessions
+# share its connection and transaction
+BATCH_SCOPE_KEY = "cms.batch"
+
+# set by batch.dispatch while a sub-request runs: what it reads may be
+# the batch's uncommitted writes, so it must not fill or share
+# process-wide state (cache.py, coalesce.py, partitions._ensured)
+batch_operation: ContextVar[bool] = ContextVar("batch_operation", default=False)
+
+def in_batch() -> bool:
+    return batch_operation.get()
+
+def get_db(connection: HTTPConnection):
     """
     Dependency to get DB session
     """
-    db = SessionLocal()
+    batch = connection.scope.get(BATCH_SCOPE_KEY)
+    db = SessionLocal() if batch is None else batch.session()
     try:
         yield db
     finally:
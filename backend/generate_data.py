@@ -0,0 +1,384 @@
+# generate_data.py
+'''Synthetic university data for load testing and benchmarks.
+
+    python generate_data.py --scale small --truncate
+    python generate_data.py --scale xl --seed 7 --truncate      # ~100k students, ~50M attendance records
+
+Every table is streamed into postgres with COPY, so nothing but the
+enrollment map is held in memory. Ids are assigned here rather than by
+the sequences (which are moved past them at the end), and each table
+draws from its own seeded RNG, so the same --seed and scale always
+produce the same database.'''
+
+import argparse
+import random
+import sys
+import time
+from datetime import date, time as dtime, timedelta
+
+from sqlalchemy import text
+
+from auth import hash_password
+from database import engine, SessionLocal
+import attendance_bitmap
+from partitions import term_for, terms_between, ensure_partitions_for
+
+# =====================================================
+# SCALES
+# =====================================================
+
+SCALES = {
+    #          departments  courses/dept  students  faculty  courses/student  sessions/course
+    "tiny":   dict(departments=2,  courses_per_department=5,  students=100,     faculty=10,    courses_per_student=4, sessions_per_course=10),
+    "small":  dict(departments=5,  courses_per_department=10, students=2_000,   faculty=100,   courses_per_student=5, sessions_per_course=30),
+    "medium": dict(departments=10, courses_per_department=20, students=20_000,  faculty=600,   courses_per_student=6, sessions_per_course=60),
+    "large":  dict(departments=15, courses_per_department=30, students=50_000,  faculty=1_200, courses_per_student=6, sessions_per_course=70),
+    "xl":     dict(departments=20, courses_per_department=40, students=100_000, faculty=2_000, courses_per_student=6, sessions_per_course=80),
+}
+
+ASSIGNMENTS_PER_COURSE = 4
+SUBMISSION_RATE = 0.85
+GRADED_RATE = 0.6
+PRESENT_RATE = 0.82
+
+DEFAULT_PASSWORD = "password"
+
+TABLES = [
+    "exam_marks", "exams", "final_grades",
+    "submission_lsh_buckets", "submission_signatures",
+    "assignment_submissions", "blobs", "assignments",
+    "attendance_records", "attendance_sessions",
+    "timetable", "waitlist_entries", "enrollments", "faculty_courses",
+    "courses", "students", "faculty", "departments", "users",
+]
+
+# keyed by something other than a serial id (content hashes, composite keys)
+UNSERIAL_TABLES = {"submission_lsh_buckets", "submission_signatures", "blobs"}
+SERIAL_TABLES = [table for table in TABLES if table not in UNSERIAL_TABLES]
+
+FIRST_NAMES = [
+    "Aarav", "Priya", "Rohan", "Ananya", "Vikram", "Meera", "Arjun", "Kavya", "Sanjay", "Neha",
+    "Rahul", "Isha", "Karan", "Diya", "Aditya", "Sneha", "Nikhil", "Pooja", "Varun", "Riya",
+]
+LAST_NAMES = [
+    "Sharma", "Patel", "Reddy", "Nair", "Gupta", "Iyer", "Verma", "Joshi", "Kumar", "Singh",
+    "Menon", "Rao", "Das", "Mehta", "Bose", "Pillai", "Chopra", "Kapoor", "Malhotra", "Agarwal",
+]
+SUBJECT_WORDS = [
+    "Data", "Structures", "Algorithms", "Systems", "Networks", "Signals", "Circuits", "Design",
+    "Analysis", "Theory", "Machine", "Learning", "Databases", "Compilers", "Control", "Thermodynamics",
+    "Mechanics", "Materials", "Optimization", "Statistics",
+]
+TEXT_WORDS = (
+    "the algorithm runs in linear time because each element is visited once and the invariant "
+    "holds after every iteration so the result follows by induction on the input size while the "
+    "memory footprint stays constant apart from the output buffer which we allocate up front"
+).split()
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+
+# =====================================================
+# COPY PLUMBING
+# =====================================================
+
+class _RowStream:
+    """
+    File-like object that feeds COPY from a row generator
+    without materializing the whole table
+    """
+
+    def __init__(self, rows):
+        self._rows = rows
+        self._buffer = b""
+        self.count = 0
+
+    @staticmethod
+    def _field(value) -> str:
+        if value is None:
+            return r"\N"
+        if isinstance(value, bool):
+            return "t" if value else "f"
+        if isinstance(value, bytes):
+            return "\\\\x" + value.hex()
+        if isinstance(value, list):
+            return "{" + ",".join(str(v) for v in value) + "}"
+        return str(value).replace("\\", "\\\\").replace("\t", " ").replace("\n", " ")
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                row = next(self._rows)
+            except StopIteration:
+                break
+            self.count += 1
+            self._buffer += ("\t".join(self._field(v) for v in row) + "\n").encode()
+
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def copy_rows(cursor, table: str, columns: list[str], rows) -> int:
+    stream = _RowStream(iter(rows))
+    started = time.perf_counter()
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", stream, size=1 << 16)
+    print(f"  {table:<24} {stream.count:>12,} rows  {time.perf_counter() - started:7.1f}s", flush=True)
+    return stream.count
+
+
+def rng_for(seed: int, table: str) -> random.Random:
+    return random.Random(f"{seed}:{table}")
+
+
+def person_name(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def school_days(start: date, count: int):
+    day = start
+    while count:
+        if day.weekday() < 5:
+            yield day
+            count -= 1
+        day += timedelta(days=1)
+
+
+# =====================================================
+# GENERATOR
+# =====================================================
+
+def generate(cfg: dict, seed: int, storage: str):
+    hashed = hash_password(DEFAULT_PASSWORD)
+
+    departments = cfg["departments"]
+    courses = departments * cfg["courses_per_department"]
+    students = cfg["students"]
+    faculty = cfg["faculty"]
+
+    term = term_for(date.today())
+    session_days = list(school_days(term.start, cfg["sessions_per_course"]))
+
+    # before the load's transaction: a new partition takes locks on the
+    # tables its foreign keys reference, which the COPYs below hold
+    db = SessionLocal()
+    try:
+        for t in terms_between(session_days[0], session_days[-1]):
+            ensure_partitions_for(db, t.start)
+        db.commit()
+    finally:
+        db.close()
+
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+
+        copy_rows(cur, "departments", ["id", "code", "name"], (
+            (d, f"D{d:02d}", f"Department {d:02d}") for d in range(1, departments + 1)
+        ))
+
+        # users: 1 admin, then students, then faculty
+        def users():
+            yield (1, "admin@college.edu", hashed, "admin", True)
+            for s in range(1, students + 1):
+                yield (1 + s, f"student{s}@college.edu", hashed, "student", True)
+            for f in range(1, faculty + 1):
+                yield (1 + students + f, f"faculty{f}@college.edu", hashed, "faculty", True)
+        copy_rows(cur, "users", ["id", "email", "hashed_password", "role", "is_active"], users())
+
+        rng = rng_for(seed, "students")
+        student_dept = {s: rng.randint(1, departments) for s in range(1, students + 1)}
+        copy_rows(cur, "students", ["id", "name", "reg_no", "department_id", "user_id"], (
+            (s, person_name(rng), f"REG{s:07d}", student_dept[s], 1 + s) for s in range(1, students + 1)
+        ))
+
+        rng = rng_for(seed, "faculty")
+        copy_rows(cur, "faculty", ["id", "name", "employee_id", "department_id", "user_id"], (
+            (f, "Dr. " + person_name(rng), f"EMP{f:05d}", (f - 1) % departments + 1, 1 + students + f)
+            for f in range(1, faculty + 1)
+        ))
+
+        rng = rng_for(seed, "courses")
+        course_dept = {c: (c - 1) // cfg["courses_per_department"] + 1 for c in range(1, courses + 1)}
+        copy_rows(cur, "courses", ["id", "course_code", "course_name", "credits", "semester", "department_id"], (
+            (c, f"C{c:05d}", " ".join(rng.sample(SUBJECT_WORDS, 2)), rng.choice([2, 3, 4]),
+             rng.randint(1, 8), course_dept[c])
+            for c in range(1, courses + 1)
+        ))
+
+        # one faculty member per course, from the course's department
+        faculty_by_dept: dict[int, list[int]] = {}
+        for f in range(1, faculty + 1):
+            faculty_by_dept.setdefault((f - 1) % departments + 1, []).append(f)
+        rng = rng_for(seed, "faculty_courses")
+        teacher = {c: rng.choice(faculty_by_dept[course_dept[c]]) for c in range(1, courses + 1)}
+        copy_rows(cur, "faculty_courses", ["id", "faculty_id", "course_id"], (
+            (c, teacher[c], c) for c in range(1, courses + 1)
+        ))
+
+        # enrollments, mostly within the student's department
+        courses_by_dept: dict[int, list[int]] = {}
+        for c, d in course_dept.items():
+            courses_by_dept.setdefault(d, []).append(c)
+        rng = rng_for(seed, "enrollments")
+        roster: dict[int, list[int]] = {c: [] for c in range(1, courses + 1)}
+        enrollments = []
+        for s in range(1, students + 1):
+            own = courses_by_dept[student_dept[s]]
+            picks = set(rng.sample(own, min(cfg["courses_per_student"] - 1, len(own))))
+            picks.add(rng.randint(1, courses))          # one elective anywhere
+            for c in sorted(picks):
+                roster[c].append(s)
+                enrollments.append((s, c))
+        copy_rows(cur, "enrollments", ["id", "student_id", "course_id"], (
+            (i, s, c) for i, (s, c) in enumerate(enrollments, start=1)
+        ))
+        del enrollments
+        # seat counters (seats.py) match the rosters; capacity stays unlimited
+        cur.execute("""
+            UPDATE courses c SET seats_taken = e.n
+            FROM (SELECT course_id, count(*) AS n FROM enrollments GROUP BY course_id) e
+            WHERE e.course_id = c.id
+        """)
+
+        rng = rng_for(seed, "timetable")
+        copy_rows(cur, "timetable", ["id", "course_id", "faculty_id", "day_of_week", "start_time", "end_time", "room"], (
+            (2 * c - k, c, teacher[c], DAYS[(c + 2 * k) % 5],
+             dtime(9 + (c + k) % 8, 0), dtime(10 + (c + k) % 8, 0), f"R-{rng.randint(100, 499)}")
+            for c in range(1, courses + 1) for k in (0, 1)
+        ))
+
+        # ---------------- attendance ----------------
+        sessions = [
+            (c, day) for c in range(1, courses + 1) for day in session_days
+        ]
+        rng = rng_for(seed, "attendance")
+
+        if storage == "bitmap":
+            def bitmap_sessions():
+                for sid, (c, day) in enumerate(sessions, start=1):
+                    flags = [rng.random() < PRESENT_RATE for _ in roster[c]]
+                    yield (sid, c, teacher[c], day, roster[c], attendance_bitmap.encode(flags))
+            copy_rows(cur, "attendance_sessions",
+                      ["id", "course_id", "faculty_id", "date", "roster", "presence"], bitmap_sessions())
+        else:
+            copy_rows(cur, "attendance_sessions", ["id", "course_id", "faculty_id", "date"], (
+                (sid, c, teacher[c], day) for sid, (c, day) in enumerate(sessions, start=1)
+            ))
+
+            def records():
+                rid = 0
+                for sid, (c, day) in enumerate(sessions, start=1):
+                    for s in roster[c]:
+                        rid += 1
+                        yield (rid, sid, day, s, rng.random() < PRESENT_RATE)
+            copy_rows(cur, "attendance_records",
+                      ["id", "session_id", "session_date", "student_id", "present"], records())
+
+        # ---------------- assignments ----------------
+        copy_rows(cur, "assignments", ["id", "course_id", "faculty_id", "title", "description", "due_date"], (
+            ((c - 1) * ASSIGNMENTS_PER_COURSE + a, c, teacher[c], f"Assignment {a}", None,
+             term.start + timedelta(days=21 * a))
+            for c in range(1, courses + 1) for a in range(1, ASSIGNMENTS_PER_COURSE + 1)
+        ))
+
+        rng = rng_for(seed, "submissions")
+
+        def submissions():
+            sub_id = 0
+            for c in range(1, courses + 1):
+                for a in range(1, ASSIGNMENTS_PER_COURSE + 1):
+                    assignment_id = (c - 1) * ASSIGNMENTS_PER_COURSE + a
+                    due = term.start + timedelta(days=21 * a)
+                    for s in roster[c]:
+                        if rng.random() >= SUBMISSION_RATE:
+                            continue
+                        sub_id += 1
+                        body = " ".join(rng.choices(TEXT_WORDS, k=rng.randint(40, 120)))
+                        submitted = f"{due - timedelta(days=rng.randint(0, 6))} {rng.randint(8, 23):02d}:{rng.randint(0, 59):02d}:00"
+                        marks = rng.randint(0, 10) if rng.random() < GRADED_RATE else None
+                        yield (sub_id, assignment_id, s, body, submitted, marks)
+        copy_rows(cur, "assignment_submissions",
+                  ["id", "assignment_id", "student_id", "submission_text", "submitted_at", "marks"], submissions())
+
+        # ---------------- exams, marks, grades ----------------
+        exam_date = term.end - timedelta(days=20)
+        copy_rows(cur, "exams", ["id", "course_id", "faculty_id", "name", "max_marks", "exam_date"], (
+            (2 * c - 1 + k, c, teacher[c], name, 50, exam_date + timedelta(days=7 * k))
+            for c in range(1, courses + 1) for k, name in enumerate(("Internal", "External"))
+        ))
+
+        rng = rng_for(seed, "exam_marks")
+
+        def exam_marks():
+            mark_id = 0
+            for c in range(1, courses + 1):
+                for k in (0, 1):
+                    for s in roster[c]:
+                        mark_id += 1
+                        yield (mark_id, 2 * c - 1 + k, s, rng.randint(10, 50))
+        copy_rows(cur, "exam_marks", ["id", "exam_id", "student_id", "marks_obtained"], exam_marks())
+
+        rng = rng_for(seed, "final_grades")
+
+        def final_grades():
+            grade_id = 0
+            for c in range(1, courses + 1):
+                for s in roster[c]:
+                    grade_id += 1
+                    yield (grade_id, c, s, rng.choice(["S", "A+", "A", "B+", "B", "C", "D", "E", "F"]))
+        copy_rows(cur, "final_grades", ["id", "course_id", "student_id", "grade"], final_grades())
+
+        # keep the sequences ahead of the ids we wrote
+        for table in SERIAL_TABLES:
+            cur.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"coalesce((SELECT max(id) FROM {table}), 0) + 1, false)"
+            )
+        cur.execute("ANALYZE")
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+
+def truncate():
+    with engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--truncate", action="store_true", help="empty every table first")
+    parser.add_argument("--attendance-storage", choices=["rows", "bitmap"],
+                        default=attendance_bitmap.ATTENDANCE_STORAGE)
+    for key in SCALES["tiny"]:
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, help="override the scale preset")
+    args = parser.parse_args()
+    engine.echo = False
+
+    cfg = dict(SCALES[args.scale])
+    for key in cfg:
+        if getattr(args, key) is not None:
+            cfg[key] = getattr(args, key)
+
+    if not args.truncate:
+        with engine.connect() as conn:
+            if conn.execute(text("SELECT EXISTS (SELECT 1 FROM users)")).scalar():
+                sys.exit("Database is not empty; pass --truncate to replace its data")
+
+    print(f"scale={args.scale} seed={args.seed} storage={args.attendance_storage} {cfg}")
+    started = time.perf_counter()
+    if args.truncate:
+        truncate()
+    generate(cfg, args.seed, args.attendance_storage)
+    print(f"done in {time.perf_counter() - started:.1f}s "
+          f"(every account's password is {DEFAULT_PASSWORD!r}, admin is admin@college.edu)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# http_cache.py
+
+import hashlib
+import os
+
+# =====================================================
+# CONFIG
+# =====================================================
+'''Conditional GETs for the API.
+
+Successful JSON GET responses get a weak ETag (hash of the body) and
+"Cache-Control: private, no-cache": browsers and the frontend cache in
+js/api.js may keep a copy but must revalidate it. A request whose
+If-None-Match matches gets an empty 304 instead of the body, so a client
+revalidating unchanged data only pays for the query, not the transfer.
+
+Runs inside CompressionMiddleware so the tag is computed on the
+uncompressed body and is the same whatever the client accepts. That is
+why it is weak: gzip, br and identity bodies differ byte for byte, and a
+strong validator promises identical bytes. If-None-Match uses weak
+comparison anyway, so revalidation works the same. Streamed responses
+(more_body) are passed through untouched.'''
+
+ETAG_MAX_SIZE = int(os.getenv("ETAG_MAX_SIZE", str(8 * 1024 * 1024)))
+
+CACHE_CONTROL = b"private, no-cache"
+
+
+def etag_for(body: bytes) -> bytes:
+    return b'W/"' + hashlib.sha1(body).hexdigest().encode() + b'"'
+
+
+def etag_matches(if_none_match: bytes, etag: bytes) -> bool:
+    if if_none_match.strip() == b"*":
+        return True
+    # weak comparison: only the opaque tags have to match
+    tags = [t.strip().removeprefix(b"W/") for t in if_none_match.split(b",")]
+    return etag.removeprefix(b"W/") in tags
+
+
+# =====================================================
+# MIDDLEWARE
+# =====================================================
+
+class ETagMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+
+        if_none_match = None
+        for name, value in scope["headers"]:
+            if name == b"if-none-match":
+                if_none_match = value
+                break
+
+        start = None
+        passthrough = False
+
+        async def send_tagged(message):
+            nonlocal start, passthrough
+
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+
+            body = message.get("body", b"")
+            headers = start.get("headers", [])
+            names = {k.lower() for k, _ in headers}
+            content_type = next((v for k, v in headers if k.lower() == b"content-type"), b"")
+
+            if (
+                start["status"] != 200
+                or message.get("more_body", False)
+                or not content_type.startswith(b"application/json")
+                or b"etag" in names
+                or len(body) > ETAG_MAX_SIZE
+            ):
+                passthrough = True
+                await send(start)
+                return await send(message)
+
+            etag = etag_for(body)
+            raw = [(k, v) for k, v in headers if k.lower() != b"cache-control"]
+            raw += [(b"etag", etag), (b"cache-control", CACHE_CONTROL)]
+
+            if if_none_match is not None and etag_matches(if_none_match, etag):
+                raw = [
+                    (k, v) for k, v in raw
+                    if k.lower() not in (b"content-length", b"content-type")
+                ]
+                await send({**start, "status": 304, "headers": raw})
+                return await send({"type": "http.response.body", "body": b""})
+
+            await send({**start, "headers": raw})
+            await send(message)
+
+        await self.app(scope, receive, send_tagged)
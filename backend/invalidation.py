@@ -0,0 +1,273 @@
+# invalidation.py
+
+import json
+import logging
+import os
+import select
+import threading
+import time
+import uuid
+from typing import Callable
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+import cache
+from database import engine
+
+logger = logging.getLogger("cms.invalidation")
+
+# =====================================================
+# CONFIG
+# =====================================================
+
+CHANNEL = "cms_invalidate"
+MAX_PAYLOAD_BYTES = 7000        # postgres caps NOTIFY payloads at 8000 bytes
+LISTEN_POLL_SECONDS = 5
+RECONNECT_BACKOFF_SECONDS = 2
+
+# lets a worker skip the echo of its own notifications
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+'''Cross-worker cache invalidation over postgres LISTEN/NOTIFY.
+
+Publishing: every ORM flush records the (table, primary key) pairs it
+touched on the session. Right before commit they are sent with
+pg_notify() inside the same transaction, so postgres only delivers them
+if the transaction commits. The committing worker evicts its own caches
+in after_commit without waiting for the round-trip.
+
+Subscribing: each worker runs one background thread that LISTENs on
+the channel and evicts the matching cache entries.
+
+Other modules can have their own channels delivered by the same thread
+(and connection) with listen(); their handlers run on that thread.
+on_change() handlers see every change this worker learns about, its own
+commits (on the committing thread) and other workers' (on the listener
+thread); table None means "anything may have changed".'''
+
+_PENDING_KEY = "cms_invalidations"
+
+# a set in session.info under this key collects what the session commits
+RECORD_KEY = "cms_recorded_changes"
+
+
+# =====================================================
+# PUBLISHING
+# =====================================================
+
+def mark_changed(session: Session, table: str, key=None):
+    """
+    Record a change made outside the ORM unit of work
+    (core inserts/updates, raw SQL). key=None means "any row".
+    """
+    session.info.setdefault(_PENDING_KEY, set()).add((table, key))
+
+
+def _identity(obj):
+    state = obj.__mapper__.primary_key_from_instance(obj)
+    return state[0] if len(state) == 1 else None
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table:
+            mark_changed(session, table, _identity(obj))
+
+
+@event.listens_for(Session, "after_bulk_update")
+def _collect_bulk_update(update_context):
+    mark_changed(update_context.session, update_context.mapper.local_table.name)
+
+
+@event.listens_for(Session, "after_bulk_delete")
+def _collect_bulk_delete(delete_context):
+    mark_changed(delete_context.session, delete_context.mapper.local_table.name)
+
+
+def _payloads(changes):
+    """
+    Pack changes into NOTIFY-sized messages.
+    Tables with too many changed keys collapse into a table-wide event.
+    """
+    by_table: dict[str, set] = {}
+    for table, key in changes:
+        by_table.setdefault(table, set()).add(key)
+
+    events = []
+    for table, keys in by_table.items():
+        if None in keys or len(keys) > 200:
+            events.append([table, None])
+        else:
+            events.extend([table, k] for k in keys)
+
+    batch = []
+    for ev in events:
+        batch.append(ev)
+        if len(json.dumps(batch)) > MAX_PAYLOAD_BYTES:
+            batch.pop()
+            yield json.dumps({"origin": WORKER_ID, "events": batch})
+            batch = [ev]
+    if batch:
+        yield json.dumps({"origin": WORKER_ID, "events": batch})
+
+
+@event.listens_for(Session, "before_commit")
+def _publish(session):
+    # flush first so the last unit of work is recorded too
+    session.flush()
+
+    changes = session.info.get(_PENDING_KEY)
+    if not changes or session.get_bind().dialect.name != "postgresql":
+        return
+
+    for payload in _payloads(changes):
+        session.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": CHANNEL, "payload": payload}
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_local(session):
+    changes = session.info.pop(_PENDING_KEY, ())
+    record = session.info.get(RECORD_KEY)
+    if record is not None:
+        record.update(changes)
+    for table, key in changes:
+        _changed(table, key)
+
+
+def evict_local(changes):
+    """
+    Evict (table, key) changes in this worker only, e.g. ones recorded
+    under RECORD_KEY whose enclosing transaction was rolled back
+    """
+    for table, key in changes:
+        _changed(table, key)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+# =====================================================
+# SUBSCRIBING
+# =====================================================
+
+# extra channels: name -> handler(payload), registered before start_listener()
+_channels: dict[str, Callable[[str], None]] = {}
+
+# handler(table, key) for every change; must return quickly
+_observers: list[Callable[[str | None, object], None]] = []
+
+
+def listen(channel: str, handler: Callable[[str], None]):
+    _channels[channel] = handler
+
+
+def on_change(handler: Callable[[str | None, object], None]):
+    _observers.append(handler)
+
+
+def _changed(table: str | None, key=None):
+    if table is None:
+        cache.clear_all()
+    else:
+        cache.invalidate(table, key)
+    for handler in _observers:
+        try:
+            handler(table, key)
+        except Exception:
+            logger.exception("Change observer failed")
+
+
+class InvalidationListener(threading.Thread):
+    def __init__(self):
+        super().__init__(name="cache-invalidation-listener", daemon=True)
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _connect(self):
+        raw = engine.raw_connection()
+        conn = raw.driver_connection    # gone from the proxy once detached
+        raw.detach()                    # keep it out of the pool for good
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            for channel in (CHANNEL, *_channels):
+                cur.execute(f"LISTEN {channel}")
+        return conn
+
+    def _handle(self, payload: str):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed invalidation payload")
+            return
+
+        if message.get("origin") == WORKER_ID:
+            return
+
+        for table, key in message.get("events", []):
+            _changed(table, key)
+
+    def _dispatch(self, channel: str, payload: str):
+        handler = _channels.get(channel)
+        if handler is None:
+            return
+        try:
+            handler(payload)
+        except Exception:
+            logger.exception("Handler for %s failed", channel)
+
+    def run(self):
+        while not self._stopping.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                # anything could have changed while we were not listening
+                _changed(None)
+
+                while not self._stopping.is_set():
+                    ready, _, _ = select.select([conn], [], [], LISTEN_POLL_SECONDS)
+                    if not ready:
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        if notify.channel == CHANNEL:
+                            self._handle(notify.payload)
+                        else:
+                            self._dispatch(notify.channel, notify.payload)
+            except Exception:
+                logger.exception("Invalidation listener lost its connection, reconnecting")
+                time.sleep(RECONNECT_BACKOFF_SECONDS)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+
+_listener: InvalidationListener | None = None
+
+
+def start_listener():
+    global _listener
+    if engine.dialect.name != "postgresql" or _listener is not None:
+        return
+    _listener = InvalidationListener()
+    _listener.start()
+
+
+def stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
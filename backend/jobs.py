@@ -0,0 +1,461 @@
+# jobs.py
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import select
+import signal
+import socket
+import traceback
+import uuid
+from typing import Callable, NamedTuple
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from auth import hash_password
+from blobstore import store_bytes
+from database import engine, SessionLocal
+from invalidation import mark_changed
+from models import Job
+from schemas import BulkEnrollment, StudentProvisioning, SubmissionBodyMove
+import seats
+import submissions
+
+logger = logging.getLogger("cms.jobs")
+
+# =====================================================
+# CONFIG
+# =====================================================
+'''Background jobs for long admin operations, with postgres as the queue.
+
+The API only inserts a row into jobs (POST /admin/jobs) and returns; worker
+processes started with `python jobs.py --workers N` claim queued rows with
+SELECT ... FOR UPDATE SKIP LOCKED, so any number of them can poll the same
+table without handing a job out twice. Enqueueing NOTIFYs JOB_CHANNEL to
+wake idle workers; they also poll every JOB_POLL_SECONDS. No broker.
+
+A job kind is a step function that does one chunk of work and updates a
+checkpoint dict. The chunk's writes, the checkpoint and the progress
+counters commit in one transaction, and only if the worker still owns the
+job, so a job resumes exactly where its last committed chunk left off:
+  - a stopped worker (SIGTERM/Ctrl-C) finishes its chunk and requeues the job
+  - a dead worker's job is reclaimed once its heartbeat (one per chunk) is
+    older than JOB_STALE_SECONDS, up to JOB_MAX_ATTEMPTS times
+  - an exception in a step fails the job with the traceback in jobs.error
+
+Cancellation (POST /admin/jobs/{id}/cancel) drops a queued job at once and
+stops a running one after its current chunk.'''
+
+JOB_CHANNEL = "cms_jobs"
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "5"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_CHUNK_SIZE = int(os.getenv("JOB_CHUNK_SIZE", "500"))
+
+
+class Progress(NamedTuple):
+    done: int
+    total: int | None
+    finished: bool = False
+
+
+class JobKind(NamedTuple):
+    params: type[BaseModel]
+    step: Callable[[Session, BaseModel, dict], Progress]
+    check: Callable[[BaseModel], None] | None = None   # raises HTTPException
+
+
+JOB_KINDS: dict[str, JobKind] = {}
+
+
+def job_kind(name: str, params: type[BaseModel], check=None):
+    def register(step):
+        JOB_KINDS[name] = JobKind(params, step, check)
+        return step
+    return register
+
+
+# =====================================================
+# QUEUE (API SIDE)
+# =====================================================
+
+def enqueue(db: Session, kind: str, params: dict, created_by: int | None = None) -> Job:
+    spec = JOB_KINDS.get(kind)
+    if spec is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"kind must be one of: {', '.join(JOB_KINDS)}"
+        )
+    try:
+        parsed = spec.params(**params)
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=exc.errors(include_url=False, include_context=False))
+    if spec.check is not None:
+        spec.check(parsed)
+
+    job = Job(kind=kind, params=parsed.dict(), created_by=created_by)
+    db.add(job)
+    db.flush()
+    db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": JOB_CHANNEL, "payload": str(job.id)}
+    )
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def request_cancel(db: Session, job_id: int) -> Job:
+    job = db.get(Job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    cancelled = db.execute(
+        text("""
+            UPDATE jobs SET
+                cancel_requested = true,
+                status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END,
+                finished_at = CASE WHEN status = 'queued' THEN now() ELSE finished_at END
+            WHERE id = :id AND status IN ('queued', 'running')
+            RETURNING id
+        """),
+        {"id": job_id}
+    ).scalar()
+    if cancelled is None:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+# =====================================================
+# WORKER
+# =====================================================
+
+CLAIM = text("""
+    UPDATE jobs SET
+        status = 'running',
+        worker = :worker,
+        attempts = attempts + 1,
+        started_at = coalesce(started_at, now()),
+        heartbeat_at = now()
+    WHERE id = (
+        SELECT id FROM jobs
+        WHERE status = 'queued'
+           OR (status = 'running' AND heartbeat_at < now() - make_interval(secs => :stale))
+        ORDER BY id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, attempts
+""")
+
+SAVE_PROGRESS = text("""
+    UPDATE jobs SET
+        checkpoint = CAST(:checkpoint AS jsonb),
+        done = :done,
+        total = :total,
+        heartbeat_at = clock_timestamp(),
+        status = CASE WHEN :finished THEN 'done' ELSE status END,
+        finished_at = CASE WHEN :finished THEN clock_timestamp() ELSE finished_at END
+    WHERE id = :id AND worker = :worker AND status = 'running'
+    RETURNING cancel_requested
+""")
+
+FINISH = text("""
+    UPDATE jobs SET status = :status, error = :error, finished_at = now()
+    WHERE id = :id AND worker = :worker AND status = 'running'
+""")
+
+# stopping gracefully is not a failed attempt
+RELEASE = text("""
+    UPDATE jobs SET status = 'queued', worker = NULL, attempts = attempts - 1
+    WHERE id = :id AND worker = :worker AND status = 'running'
+""")
+
+
+class Worker:
+    def __init__(self, name: str | None = None):
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.stopping = False
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def _execute(self, statement, **params):
+        db = SessionLocal()
+        try:
+            result = db.execute(statement, {"worker": self.name, **params})
+            row = result.first() if result.returns_rows else None
+            db.commit()
+            return row
+        finally:
+            db.close()
+
+    def claim(self) -> int | None:
+        row = self._execute(CLAIM, stale=JOB_STALE_SECONDS)
+        if row is None:
+            return None
+        if row.attempts > JOB_MAX_ATTEMPTS:
+            self._execute(
+                FINISH, id=row.id, status="failed",
+                error=f"Gave up after {JOB_MAX_ATTEMPTS} attempts (workers lost)"
+            )
+            return None
+        return row.id
+
+    def run_chunk(self, job_id: int) -> bool:
+        """
+        One step of the job in one transaction. False once the job is
+        finished, failed, cancelled or no longer ours.
+        """
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            if job is None or job.worker != self.name or job.status != "running":
+                return False
+            if job.cancel_requested:
+                db.rollback()
+                self._execute(FINISH, id=job_id, status="cancelled", error=None)
+                return False
+
+            spec = JOB_KINDS.get(job.kind)
+            checkpoint = dict(job.checkpoint)
+            try:
+                if spec is None:
+                    raise ValueError(f"Unknown job kind {job.kind!r}")
+                progress = spec.step(db, spec.params(**job.params), checkpoint)
+            except Exception:
+                db.rollback()
+                logger.exception("Job %s failed", job_id)
+                self._execute(FINISH, id=job_id, status="failed", error=traceback.format_exc())
+                return False
+
+            owned = db.execute(SAVE_PROGRESS, {
+                "id": job_id,
+                "worker": self.name,
+                "checkpoint": json.dumps(checkpoint),
+                "done": progress.done,
+                "total": progress.total,
+                "finished": progress.finished,
+            }).first()
+            if owned is None:
+                # reclaimed as stale or finished meanwhile: the chunk never happened
+                db.rollback()
+                return False
+            db.commit()
+            return not progress.finished
+        finally:
+            db.close()
+
+    def run(self, job_id: int):
+        logger.info("Job %s: started on %s", job_id, self.name)
+        while self.run_chunk(job_id):
+            if self.stopping:
+                self._execute(RELEASE, id=job_id)
+                logger.info("Job %s: released after its last chunk", job_id)
+                return
+        logger.info("Job %s: stopped", job_id)
+
+    def _listen(self):
+        raw = engine.raw_connection()
+        conn = raw.driver_connection
+        raw.detach()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {JOB_CHANNEL}")
+        return conn
+
+    def serve(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        conn = self._listen()
+        try:
+            while not self.stopping:
+                job_id = self.claim()
+                if job_id is not None:
+                    self.run(job_id)
+                    continue
+
+                ready, _, _ = select.select([conn], [], [], JOB_POLL_SECONDS)
+                if ready:
+                    conn.poll()
+                    conn.notifies.clear()
+        finally:
+            conn.close()
+
+
+# =====================================================
+# JOB KINDS
+# =====================================================
+
+@job_kind("bulk_enroll", BulkEnrollment, check=seats.check_bulk_enroll)
+def bulk_enroll_step(db: Session, params: BulkEnrollment, checkpoint: dict) -> Progress:
+    """
+    seats.bulk_enroll, one course per chunk. The course list is fixed
+    by the first chunk.
+    """
+    pairs = None
+    if params.pairs is not None:
+        pairs = [(p.student_id, p.course_id) for p in params.pairs]
+    plan = seats.plan_bulk_enroll(db, params.department_id, params.semester, pairs)
+    plan = plan._replace(
+        course_ids=checkpoint.setdefault("course_ids", plan.course_ids),
+        requested=checkpoint.setdefault("requested", plan.requested),
+    )
+
+    n = checkpoint.get("next", 0)
+    valid, added = checkpoint.get("valid", 0), checkpoint.get("added", 0)
+    if n < len(plan.course_ids):
+        v, a = seats.enroll_course_chunk(db, plan, plan.course_ids[n], params.department_id)
+        n, valid, added = n + 1, valid + v, added + a
+
+    checkpoint.update(next=n, valid=valid, added=added, result=seats.bulk_result(plan, valid, added))
+    return Progress(n, len(plan.course_ids), n >= len(plan.course_ids))
+
+
+# same temporary password as POST /admin/students
+PROVISION_STUDENTS = text("""
+    WITH incoming AS (
+        SELECT r.*,
+               row_number() OVER (PARTITION BY r.email) AS nth_email,
+               row_number() OVER (PARTITION BY r.reg_no) AS nth_reg_no
+        FROM unnest(
+            CAST(:names AS text[]), CAST(:reg_nos AS text[]),
+            CAST(:emails AS text[]), CAST(:department_ids AS integer[])
+        ) AS r(name, reg_no, email, department_id)
+        JOIN departments d ON d.id = r.department_id
+    ), fresh AS (
+        SELECT * FROM incoming r
+        WHERE nth_email = 1 AND nth_reg_no = 1
+          AND NOT EXISTS (SELECT 1 FROM users u WHERE u.email = r.email)
+          AND NOT EXISTS (SELECT 1 FROM students s WHERE s.reg_no = r.reg_no)
+    ), new_users AS (
+        INSERT INTO users (email, hashed_password, role, is_active)
+        SELECT email, :hashed_password, 'student', true FROM fresh
+        RETURNING id, email
+    ), new_students AS (
+        INSERT INTO students (name, reg_no, department_id, user_id)
+        SELECT f.name, f.reg_no, f.department_id, u.id
+        FROM fresh f JOIN new_users u ON u.email = f.email
+        RETURNING id
+    )
+    SELECT count(*) FROM new_students
+""")
+
+
+@job_kind("provision_students", StudentProvisioning)
+def provision_students_step(db: Session, params: StudentProvisioning, checkpoint: dict) -> Progress:
+    """
+    POST /admin/students for many rows, JOB_CHUNK_SIZE per chunk. Rows whose
+    email or reg_no already exists, or whose department doesn't, are skipped.
+    """
+    rows = params.students
+    n = checkpoint.get("next", 0)
+    chunk = rows[n:n + JOB_CHUNK_SIZE]
+
+    created = 0
+    if chunk:
+        created = db.execute(PROVISION_STUDENTS, {
+            "names": [r.name for r in chunk],
+            "reg_nos": [r.reg_no for r in chunk],
+            "emails": [r.email for r in chunk],
+            "department_ids": [r.department_id for r in chunk],
+            "hashed_password": hash_password("Temp@123"),   # once per chunk
+        }).scalar()
+        if created:
+            mark_changed(db, "users")
+            mark_changed(db, "students")
+
+    n += len(chunk)
+    created += checkpoint.get("created", 0)
+    checkpoint.update(next=n, created=created, skipped=n - created)
+    return Progress(n, len(rows), n >= len(rows))
+
+
+@job_kind("move_submission_bodies", SubmissionBodyMove)
+def move_submission_bodies_step(db: Session, params: SubmissionBodyMove, checkpoint: dict) -> Progress:
+    """
+    Inline submission_text bodies into the blob store, JOB_CHUNK_SIZE rows
+    per chunk in id order. A chunk that rolls back leaves blobs behind,
+    which the retry stores again as the same hashes.
+    """
+    scope = "(CAST(:assignment_id AS integer) IS NULL OR assignment_id = :assignment_id)"
+    if "total" not in checkpoint:
+        checkpoint["total"] = db.execute(
+            text(f"SELECT count(*) FROM assignment_submissions WHERE submission_text IS NOT NULL AND {scope}"),
+            {"assignment_id": params.assignment_id}
+        ).scalar()
+
+    rows = db.execute(
+        text(f"""
+            SELECT id, submission_text FROM assignment_submissions
+            WHERE submission_text IS NOT NULL AND {scope} AND id > :after
+            ORDER BY id
+            LIMIT :limit
+        """),
+        {"assignment_id": params.assignment_id, "after": checkpoint.get("after", 0), "limit": JOB_CHUNK_SIZE}
+    ).all()
+
+    if rows:
+        moved = []
+        for row in rows:
+            blob = store_bytes(row.submission_text.encode(), submissions.TEXT_PLAIN)
+            submissions.record_blob(db, blob)
+            moved.append({"id": row.id, "sha256": blob.sha256, "content_type": blob.content_type, "size": blob.size})
+        db.execute(
+            text("""
+                UPDATE assignment_submissions
+                SET blob_sha256 = :sha256, content_type = :content_type, size = :size, submission_text = NULL
+                WHERE id = :id
+            """),
+            moved
+        )
+        mark_changed(db, "assignment_submissions")
+        checkpoint["after"] = rows[-1].id
+
+    done = checkpoint.get("moved", 0) + len(rows)
+    checkpoint["moved"] = done
+    return Progress(done, max(checkpoint["total"], done), len(rows) < JOB_CHUNK_SIZE)
+
+
+# =====================================================
+# ENTRY POINT
+# =====================================================
+
+def _serve():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    engine.echo = False
+    Worker().serve()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background job workers")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    args = parser.parse_args()
+
+    if args.workers == 1:
+        return _serve()
+
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_serve, name=f"job-worker-{i}") for i in range(args.workers)]
+    for p in processes:
+        p.start()
+
+    # Ctrl-C reaches the whole process group; forward SIGTERM ourselves
+    signal.signal(signal.SIGTERM, lambda *_: [p.terminate() for p in processes])
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for p in processes:
+        p.join()
+
+
+if __name__ == "__main__":
+    main()
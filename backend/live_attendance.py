@@ -0,0 +1,437 @@
+# live_attendance.py
+
+import asyncio
+import logging
+import os
+import threading
+from datetime import date
+from typing import NamedTuple
+
+import orjson
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+import attendance_bitmap
+import invalidation
+from cache import live_roster_cache
+from coalesce import single_flight, coalesce_key
+from database import SessionLocal
+from invalidation import mark_changed
+from models import AttendanceRecord, AttendanceSession, Enrollment, Student, User
+
+logger = logging.getLogger("cms.live_attendance")
+
+# =====================================================
+# CONFIG
+# =====================================================
+'''Live roll-call for an attendance session.
+
+Students check in from their phones on the day of the session
+(POST /students/attendance/{session_id}/check-in); faculty watch, and
+correct, the session over a WebSocket (/faculty/attendance/{session_id}/live).
+
+Check-ins are write-behind: the request never touches the database. It
+checks the token's subject against the session's roster (cached per
+worker in live_roster_cache, keyed by email), records the latest state
+per student in an in-memory buffer and returns 202. A flusher thread swaps the buffer out
+every LIVE_FLUSH_SECONDS and writes it in one transaction:
+  - rows sessions: one INSERT ... ON CONFLICT DO UPDATE over unnest()ed
+    arrays, for every session at once
+  - bitmap sessions (attendance_bitmap.py): each presence bitmap is
+    locked, has its bits set, and is written back once
+A student checking in twice in one window is written once. A failed
+flush goes back into the buffer (newer check-ins win) and is retried
+on the next tick; check-ins still buffered when a worker dies are lost,
+which is the price of not writing per request.
+
+The same transaction NOTIFYs the changes on LIVE_CHANNEL. The flushing
+worker pushes them to its own WebSocket clients after the commit; the
+other workers get them through invalidation.py's listener. A client is
+sent a snapshot of the session when it connects, then deltas. One that
+falls LIVE_CLIENT_QUEUE messages behind is disconnected (1013) and
+picks up a fresh snapshot when it reconnects.'''
+
+LIVE_CHANNEL = "cms_attendance"
+LIVE_FLUSH_SECONDS = float(os.getenv("LIVE_FLUSH_SECONDS", "0.25"))
+LIVE_CLIENT_QUEUE = 1000
+LIVE_NOTIFY_CHUNK = 300         # (student_id, present) pairs per NOTIFY payload
+
+
+class LiveRoster(NamedTuple):
+    session_id: int
+    date: date
+    course_id: int
+    bitmap_roster: list[int] | None     # the session's frozen roster in bitmap mode
+    students: dict[str, int]            # email (the token's subject) -> student_id
+    student_ids: frozenset[int]
+
+
+def load_roster(db: Session, session_id: int) -> LiveRoster:
+    session = db.query(
+        AttendanceSession.id, AttendanceSession.date,
+        AttendanceSession.course_id, AttendanceSession.roster
+    ).filter(AttendanceSession.id == session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Attendance session not found")
+
+    rows = db.query(User.email, Student.id).join(User, User.id == Student.user_id)
+    if session.roster is not None:
+        rows = rows.filter(Student.id.in_(session.roster))
+    else:
+        rows = rows.join(
+            Enrollment, Enrollment.student_id == Student.id
+        ).filter(Enrollment.course_id == session.course_id)
+
+    students = {email: student_id for email, student_id in rows}
+    return LiveRoster(
+        session.id, session.date, session.course_id, session.roster,
+        students, frozenset(students.values())
+    )
+
+
+def roster_for(db: Session, session_id: int) -> LiveRoster:
+    return live_roster_cache.get_or_load(session_id, lambda: load_roster(db, session_id))
+
+
+def _load_roster(session_id: int) -> LiveRoster:
+    # the whole class checks in at once: one load, shared
+    def load():
+        db = SessionLocal()
+        try:
+            return roster_for(db, session_id)
+        finally:
+            db.close()
+    return single_flight.do(coalesce_key("live_attendance.roster", "public", session_id=session_id), load)
+
+
+# =====================================================
+# HUB (ONE PER WORKER)
+# =====================================================
+
+class LiveClient:
+    """
+    One connected faculty screen. push() may be called from any thread.
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue[str] = asyncio.Queue(LIVE_CLIENT_QUEUE)
+        self.overflowed = False
+
+    def push(self, message: str):
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message: str):
+        if self.queue.full():
+            self.overflowed = True
+        else:
+            self.queue.put_nowait(message)
+
+
+class LiveHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: dict[int, tuple[LiveRoster, dict[int, bool]]] = {}
+        self._clients: dict[int, set[LiveClient]] = {}
+
+    # --- write-behind buffer
+
+    def check_in(self, roster: LiveRoster, student_id: int, present: bool = True):
+        with self._lock:
+            self._pending.setdefault(roster.session_id, (roster, {}))[1][student_id] = present
+
+    def take(self) -> dict[int, tuple[LiveRoster, dict[int, bool]]]:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        return batch
+
+    def restore(self, batch: dict[int, tuple[LiveRoster, dict[int, bool]]]):
+        """
+        Put back a batch that failed to flush, under anything newer
+        """
+        with self._lock:
+            for session_id, (roster, changes) in batch.items():
+                newer = self._pending.setdefault(session_id, (roster, {}))[1]
+                self._pending[session_id] = (roster, {**changes, **newer})
+
+    def pending_for(self, session_id: int) -> dict[int, bool]:
+        with self._lock:
+            entry = self._pending.get(session_id)
+            return dict(entry[1]) if entry else {}
+
+    # --- subscribers
+
+    def subscribe(self, session_id: int, client: LiveClient):
+        with self._lock:
+            self._clients.setdefault(session_id, set()).add(client)
+
+    def unsubscribe(self, session_id: int, client: LiveClient):
+        with self._lock:
+            clients = self._clients.get(session_id)
+            if clients is not None:
+                clients.discard(client)
+                if not clients:
+                    del self._clients[session_id]
+
+    def publish(self, session_id: int, changes: list):
+        with self._lock:
+            clients = list(self._clients.get(session_id, ()))
+        if not clients:
+            return
+        message = orjson.dumps({"type": "delta", "session_id": session_id, "changes": changes}).decode()
+        for client in clients:
+            client.push(message)
+
+    def receive(self, payload: str):
+        """
+        LIVE_CHANNEL notifications flushed by other workers
+        """
+        try:
+            message = orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            logger.warning("Ignoring malformed live attendance payload")
+            return
+        if message.get("origin") != invalidation.WORKER_ID:
+            self.publish(message["session_id"], message["changes"])
+
+
+hub = LiveHub()
+invalidation.listen(LIVE_CHANNEL, hub.receive)
+
+
+# =====================================================
+# FLUSHING
+# =====================================================
+
+# sessions or students deleted since the check-in are skipped, so a
+# batch never fails on them and gets retried forever
+UPSERT_RECORDS = text("""
+    INSERT INTO attendance_records (session_id, session_date, student_id, present)
+    SELECT c.session_id, c.session_date, c.student_id, c.present
+    FROM unnest(
+        CAST(:session_ids AS integer[]), CAST(:session_dates AS date[]),
+        CAST(:student_ids AS integer[]), CAST(:present AS boolean[])
+    ) AS c(session_id, session_date, student_id, present)
+    JOIN attendance_sessions s ON s.id = c.session_id AND s.date = c.session_date
+    JOIN students st ON st.id = c.student_id
+    ON CONFLICT (session_id, student_id, session_date) DO UPDATE SET present = EXCLUDED.present
+""")
+
+
+def write_batch(db: Session, batch: dict[int, tuple[LiveRoster, dict[int, bool]]]):
+    records = [
+        (roster, student_id, present)
+        for roster, changes in batch.values() if roster.bitmap_roster is None
+        for student_id, present in changes.items()
+    ]
+    if records:
+        db.execute(UPSERT_RECORDS, {
+            "session_ids": [r.session_id for r, _, _ in records],
+            "session_dates": [r.date for r, _, _ in records],
+            "student_ids": [sid for _, sid, _ in records],
+            "present": [p for _, _, p in records],
+        })
+        mark_changed(db, "attendance_records")
+
+    bitmaps = [(roster, changes) for roster, changes in batch.values() if roster.bitmap_roster is not None]
+    for roster, changes in bitmaps:
+        presence = db.execute(
+            text("SELECT presence FROM attendance_sessions WHERE id = :id AND date = :date FOR UPDATE"),
+            {"id": roster.session_id, "date": roster.date}
+        ).scalar()
+        if presence is None:
+            continue
+        for student_id, present in changes.items():
+            index = attendance_bitmap.position(roster.bitmap_roster, student_id)
+            if index is not None:
+                presence = attendance_bitmap.with_bit(presence, index, present)
+        db.execute(
+            text("UPDATE attendance_sessions SET presence = :presence WHERE id = :id AND date = :date"),
+            {"presence": presence, "id": roster.session_id, "date": roster.date}
+        )
+        mark_changed(db, "attendance_sessions", roster.session_id)
+
+    for session_id, (_, changes) in batch.items():
+        pairs = [[sid, present] for sid, present in changes.items()]
+        for i in range(0, len(pairs), LIVE_NOTIFY_CHUNK):
+            db.execute(text("SELECT pg_notify(:channel, :payload)"), {
+                "channel": LIVE_CHANNEL,
+                "payload": orjson.dumps({
+                    "origin": invalidation.WORKER_ID,
+                    "session_id": session_id,
+                    "changes": pairs[i:i + LIVE_NOTIFY_CHUNK],
+                }).decode(),
+            })
+
+    db.commit()
+
+
+class WriteBehind(threading.Thread):
+    def __init__(self):
+        super().__init__(name="live-attendance-flusher", daemon=True)
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def flush(self) -> int:
+        batch = hub.take()
+        if not batch:
+            return 0
+
+        db = SessionLocal()
+        try:
+            write_batch(db, batch)
+        except Exception:
+            db.rollback()
+            hub.restore(batch)
+            logger.exception("Live attendance flush failed, retrying next tick")
+            return 0
+        finally:
+            db.close()
+
+        for session_id, (_, changes) in batch.items():
+            hub.publish(session_id, [[sid, present] for sid, present in changes.items()])
+        return sum(len(changes) for _, changes in batch.values())
+
+    def run(self):
+        while not self._stopping.wait(LIVE_FLUSH_SECONDS):
+            self.flush()
+        self.flush()        # what was buffered when we were told to stop
+
+
+_flusher: WriteBehind | None = None
+
+
+def start_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    _flusher = WriteBehind()
+    _flusher.start()
+
+
+def stop_flusher():
+    global _flusher
+    if _flusher is not None:
+        _flusher.stop()
+        _flusher.join(timeout=10)
+        _flusher = None
+
+
+# =====================================================
+# CHECK-IN AND FEED
+# =====================================================
+
+async def student_check_in(session_id: int, claims: dict) -> dict:
+    """
+    Authorized against the cached roster by the token's subject alone;
+    no query once the roster is cached
+    """
+    if claims.get("role") != "student":
+        raise HTTPException(status_code=403, detail="Student access required")
+
+    roster = live_roster_cache.get(session_id)
+    if roster is None:
+        roster = await run_in_threadpool(_load_roster, session_id)
+    if roster.date != date.today():
+        raise HTTPException(status_code=409, detail="Check-in is only open on the day of the session")
+
+    student_id = roster.students.get(claims["sub"])
+    if student_id is None:
+        raise HTTPException(status_code=403, detail="Not on this session's roster")
+
+    hub.check_in(roster, student_id, True)
+    return {"session_id": session_id, "student_id": student_id, "present": True}
+
+
+def snapshot(db: Session, roster: LiveRoster) -> list[int]:
+    """
+    Present student ids: what's stored plus what's still buffered here
+    """
+    if roster.bitmap_roster is not None:
+        presence = db.query(AttendanceSession.presence).filter(
+            AttendanceSession.id == roster.session_id, AttendanceSession.date == roster.date
+        ).scalar()
+        flags = attendance_bitmap.decode(presence, len(roster.bitmap_roster))
+        present = {sid for sid, flag in zip(roster.bitmap_roster, flags) if flag}
+    else:
+        present = {
+            sid for (sid,) in db.query(AttendanceRecord.student_id).filter(
+                AttendanceRecord.session_id == roster.session_id,
+                AttendanceRecord.session_date == roster.date,
+                AttendanceRecord.present == True
+            )
+        }
+
+    for student_id, flag in hub.pending_for(roster.session_id).items():
+        if flag:
+            present.add(student_id)
+        else:
+            present.discard(student_id)
+    return sorted(present)
+
+
+def load_snapshot(roster: LiveRoster) -> list[int]:
+    db = SessionLocal()
+    try:
+        return snapshot(db, roster)
+    finally:
+        db.close()
+
+
+async def serve_feed(websocket: WebSocket, roster: LiveRoster):
+    """
+    Snapshot, then deltas as they're flushed. The client may send
+    {"student_id": .., "present": ..} to mark a student itself.
+    """
+    client = LiveClient(asyncio.get_running_loop())
+    hub.subscribe(roster.session_id, client)    # before the snapshot: no gap
+    try:
+        present = await run_in_threadpool(load_snapshot, roster)
+        await websocket.send_text(orjson.dumps({
+            "type": "snapshot",
+            "session_id": roster.session_id,
+            "roster": sorted(roster.student_ids),
+            "present": present,
+        }).decode())
+
+        async def send():
+            while True:
+                message = await client.queue.get()
+                if client.overflowed:
+                    await websocket.close(code=1013)
+                    return
+                await websocket.send_text(message)
+
+        async def receive():
+            while True:
+                try:
+                    data = orjson.loads(await websocket.receive_text())
+                except orjson.JSONDecodeError:
+                    data = None
+                student_id = data.get("student_id") if isinstance(data, dict) else None
+                present = data.get("present") if isinstance(data, dict) else None
+                if student_id not in roster.student_ids or not isinstance(present, bool):
+                    await websocket.send_text(orjson.dumps({
+                        "type": "error", "detail": "Expected {student_id, present} for a student on the roster"
+                    }).decode())
+                    continue
+                hub.check_in(roster, student_id, present)
+
+        tasks = [asyncio.create_task(send()), asyncio.create_task(receive())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            for task in tasks:
+                try:
+                    await task
+                except (asyncio.CancelledError, WebSocketDisconnect):
+                    pass
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.unsubscribe(roster.session_id, client)
@@ -2,20 +2,38 @@
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
-from routers import auth, student, faculty, admin, course
+from database import engine, Base, SessionLocal
+from partitions import ensure_upcoming_partitions
+from search import ensure_search_indexes
+from attendance_bitmap import ensure_attendance_view
+from routers import auth, student, faculty, admin, course, registration, batch
+from profiling import ProfilingMiddleware
+from slow_queries import RouteTagMiddleware
+from http_cache import ETagMiddleware
+from compression import CompressionMiddleware
+from admission import AdmissionMiddleware
+from static_assets import PrecompressedStaticFiles, FRONTEND_DIR
+import invalidation
+import live_attendance
+import dashboards
 
 # =====================================================
 # CREATE FASTAPI APP
 # =====================================================
 
 app = FastAPI(title="College Management System")
+app.add_middleware(AdmissionMiddleware)     # in-flight requests <= DB pool size
+app.add_middleware(RouteTagMiddleware)      # names the route in the slow-query log
+app.add_middleware(ProfilingMiddleware)     # admin-only, opt-in per request
+app.add_middleware(ETagMiddleware)          # ETag + 304 for JSON GETs
+app.add_middleware(CompressionMiddleware)   # gzip / brotli above COMPRESSION_MIN_SIZE
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Profile-Id", "ETag"],
 )
 
 
@@ -25,6 +43,78 @@ app.add_middleware(
 
 Base.metadata.create_all(bind=engine)
 
+# =====================================================
+# CROSS-WORKER CACHE INVALIDATION
+# =====================================================
+
+@app.on_event("startup")
+def start_invalidation_listener():
+    invalidation.start_listener()
+
+@app.on_event("shutdown")
+def stop_invalidation_listener():
+    invalidation.stop_listener()
+
+# =====================================================
+# LIVE ATTENDANCE WRITE-BEHIND
+# =====================================================
+
+@app.on_event("startup")
+def start_live_attendance_flusher():
+    live_attendance.start_flusher()
+
+@app.on_event("shutdown")
+def stop_live_attendance_flusher():
+    live_attendance.stop_flusher()
+
+# =====================================================
+# DASHBOARD EVENT STREAMS
+# =====================================================
+
+@app.on_event("startup")
+def start_dashboard_pusher():
+    dashboards.start_pusher()
+
+@app.on_event("shutdown")
+def stop_dashboard_pusher():
+    dashboards.stop_pusher()
+
+# =====================================================
+# ATTENDANCE PARTITIONS (CURRENT + NEXT TERM)
+# =====================================================
+
+@app.on_event("startup")
+def create_upcoming_partitions():
+    db = SessionLocal()
+    try:
+        ensure_upcoming_partitions(db)
+    finally:
+        db.close()
+
+# =====================================================
+# ROW + BITMAP ATTENDANCE VIEW (attendance_records_all)
+# =====================================================
+
+@app.on_event("startup")
+def create_attendance_view():
+    db = SessionLocal()
+    try:
+        ensure_attendance_view(db)
+    finally:
+        db.close()
+
+# =====================================================
+# TRIGRAM INDEXES FOR ADMIN SEARCH (IF pg_trgm IS AVAILABLE)
+# =====================================================
+
+@app.on_event("startup")
+def create_search_indexes():
+    db = SessionLocal()
+    try:
+        ensure_search_indexes(db)
+    finally:
+        db.close()
+
 # =====================================================
 # INCLUDE ROUTERS
 # =====================================================
@@ -34,6 +124,18 @@ app.include_router(student.router)
 app.include_router(faculty.router)
 app.include_router(admin.router)
 app.include_router(course.router)
+app.include_router(registration.router)
+app.include_router(batch.router)
+
+# =====================================================
+# FRONTEND (HASHED, PRECOMPRESSED ASSETS)
+# =====================================================
+
+app.mount(
+    "/app",
+    PrecompressedStaticFiles(directory=FRONTEND_DIR, html=True, check_dir=False),
+    name="frontend"
+)
 
 # =====================================================
 # ROOT ENDPOINT
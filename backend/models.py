@@ -1,8 +1,9 @@
 # models.py
 
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, Boolean, ForeignKey, Date, DateTime, LargeBinary, Text, func
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.orm import relationship
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import UniqueConstraint, Index, ForeignKeyConstraint
 
 from database import Base
 
@@ -30,6 +31,15 @@ class User(Base):
     student = relationship("Student", back_populates="user", uselist=False) #back_populates tells SQLAlchemy that two relationship fields are the two ends of the same connection.
     faculty = relationship("Faculty", back_populates="user", uselist=False)
 
+    __table_args__ = (
+        # case-insensitive prefix search (search.py); substring search uses
+        # the pg_trgm index ix_users_email_trgm
+        Index(
+            "ix_users_email_prefix", func.lower(email).label("email_lower"),
+            postgresql_ops={"email_lower": "text_pattern_ops"}
+        ),
+    )
+
 # =====================================================
 # STUDENT MODEL
 # =====================================================
@@ -47,6 +57,21 @@ class Student(Base):
     user_id = Column(Integer, ForeignKey("users.id"), unique=True)
     user = relationship("User", back_populates="student")
 
+    __table_args__ = (
+        # admin search (search.py): keyset pages sorted by name, optionally
+        # within one department, and case-insensitive prefix matches
+        Index("ix_students_name_id", "name", "id"),
+        Index("ix_students_department_name_id", "department_id", "name", "id"),
+        Index(
+            "ix_students_name_prefix", func.lower(name).label("name_lower"),
+            postgresql_ops={"name_lower": "text_pattern_ops"}
+        ),
+        Index(
+            "ix_students_reg_no_prefix", func.lower(reg_no).label("reg_no_lower"),
+            postgresql_ops={"reg_no_lower": "text_pattern_ops"}
+        ),
+    )
+
 
 # =====================================================
 # FACULTY MODEL
@@ -65,6 +90,21 @@ class Faculty(Base):
     user_id = Column(Integer, ForeignKey("users.id"), unique=True)
     user = relationship("User", back_populates="faculty")
 
+    __table_args__ = (
+        # admin search (search.py): keyset pages sorted by name, optionally
+        # within one department, and case-insensitive prefix matches
+        Index("ix_faculty_name_id", "name", "id"),
+        Index("ix_faculty_department_name_id", "department_id", "name", "id"),
+        Index(
+            "ix_faculty_name_prefix", func.lower(name).label("name_lower"),
+            postgresql_ops={"name_lower": "text_pattern_ops"}
+        ),
+        Index(
+            "ix_faculty_employee_id_prefix", func.lower(employee_id).label("employee_id_lower"),
+            postgresql_ops={"employee_id_lower": "text_pattern_ops"}
+        ),
+    )
+
 # =====================================================
 # DEPARTMENT MODEL
 # =====================================================
@@ -98,6 +138,12 @@ class Course(Base):
     department_id = Column(Integer, ForeignKey("departments.id"))
     department = relationship("Department", back_populates="courses")
 
+    # seat allocation (seats.py): NULL capacity = unlimited.
+    # seats_taken is only changed by seats.py, in the same statement
+    # that adds or removes the enrollment.
+    capacity = Column(Integer, nullable=True)
+    seats_taken = Column(Integer, nullable=False, default=0, server_default="0")
+
 # =====================================================
 # FACULTY ↔ COURSE (ASSIGNMENT)
 # =====================================================
@@ -130,19 +176,56 @@ class Enrollment(Base):
         UniqueConstraint("student_id", "course_id", name="uq_student_course"),
     )
 
+# =====================================================
+# COURSE WAITLIST (FIFO BY id)
+# =====================================================
+
+class WaitlistEntry(Base):
+    __tablename__ = "waitlist_entries"
+
+    id = Column(Integer, primary_key=True)
+
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+    student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("course_id", "student_id", name="uq_waitlist_course_student"),
+        # head of the queue, and positions
+        Index("ix_waitlist_entries_course_id_id", "course_id", "id"),
+    )
+
 # =====================================================
 # ATTENDANCE SESSION
 # =====================================================
+# attendance tables are range-partitioned by academic term (see partitions.py);
+# postgres wants the partition key in the primary key, so the table key is
+# (id, date) while the ORM keeps identifying rows by id alone
 
 class AttendanceSession(Base):
     __tablename__ = "attendance_sessions"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
 
     course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
     faculty_id = Column(Integer, ForeignKey("faculty.id"), nullable=False)
 
-    date = Column(String, nullable=False)  # YYYY-MM-DD
+    date = Column(Date, primary_key=True, nullable=False)
+
+    # bitmap storage (see attendance_bitmap.py): sorted enrolled student ids
+    # at session creation and one presence bit per roster position.
+    # NULL for sessions stored as attendance_records rows.
+    roster = Column(ARRAY(Integer), nullable=True)
+    presence = Column(LargeBinary, nullable=True)
+
+    __table_args__ = (
+        # date range scans per course ("attendance between two dates")
+        Index("ix_attendance_sessions_course_date", "course_id", "date"),
+        # "sessions this student is on the roster of"
+        Index("ix_attendance_sessions_roster", "roster", postgresql_using="gin"),
+        {"postgresql_partition_by": "RANGE (date)"},
+    )
+    __mapper_args__ = {"primary_key": [id]}
 
 # =====================================================
 # ATTENDANCE RECORD
@@ -151,15 +234,46 @@ class AttendanceSession(Base):
 class AttendanceRecord(Base):
     __tablename__ = "attendance_records"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
 
-    session_id = Column(Integer, ForeignKey("attendance_sessions.id"), nullable=False)
+    session_id = Column(Integer, nullable=False)
+    session_date = Column(Date, primary_key=True, nullable=False)  # copy of the session's date
     student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
 
     present = Column(Boolean, default=False)
 
     __table_args__ = (
-        UniqueConstraint("session_id", "student_id", name="uq_session_student"),
+        ForeignKeyConstraint(
+            ["session_id", "session_date"],
+            ["attendance_sessions.id", "attendance_sessions.date"],
+            name="fk_attendance_records_session"
+        ),
+        UniqueConstraint("session_id", "student_id", "session_date", name="uq_session_student"),
+        Index("ix_attendance_records_student_session", "student_id", "session_id"),
+        {"postgresql_partition_by": "RANGE (session_date)"},
+    )
+    __mapper_args__ = {"primary_key": [id]}
+
+
+# =====================================================
+# ARCHIVED ATTENDANCE (ONE ROW PER STUDENT, COURSE AND CLOSED TERM)
+# =====================================================
+
+class AttendanceTermSummary(Base):
+    __tablename__ = "attendance_term_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    term_code = Column(String, nullable=False)     # 2026-S1
+    student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+
+    attended = Column(Integer, nullable=False)
+    total = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("term_code", "student_id", "course_id", name="uq_term_student_course"),
+        Index("ix_attendance_term_summaries_student", "student_id"),
     )
 
 
@@ -177,7 +291,23 @@ class Assignment(Base):
 
     title = Column(String, nullable=False)
     description = Column(String, nullable=True)
-    due_date = Column(String, nullable=False)  # YYYY-MM-DD
+    due_date = Column(Date, nullable=False)
+
+    __table_args__ = (
+        Index("ix_assignments_course_due_date", "course_id", "due_date"),
+    )
+
+
+# =====================================================
+# BLOBS (CONTENT-ADDRESSED, BYTES ON DISK, see blobstore.py)
+# =====================================================
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
 
 
 # =====================================================
@@ -192,13 +322,61 @@ class AssignmentSubmission(Base):
     assignment_id = Column(Integer, ForeignKey("assignments.id"), nullable=False)
     student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
 
+    # legacy inline body; new submissions keep theirs in the blob store
     submission_text = Column(String, nullable=True)
-    submitted_at = Column(String, nullable=False)
+    submitted_at = Column(DateTime, nullable=False)
+
+    # body in the blob store (blobstore.py), by content hash
+    blob_sha256 = Column(String(64), ForeignKey("blobs.sha256"), nullable=True)
+    content_type = Column(String, nullable=True)
+    filename = Column(String, nullable=True)
+    size = Column(BigInteger, nullable=True)
 
     marks = Column(Integer, nullable=True)
+    # bumped by every grade change; batch grading checks it (submissions.grade_sheet)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     __table_args__ = (
         UniqueConstraint("assignment_id", "student_id", name="uq_assignment_student"),
+        # grading listing (submissions.submission_page): pending first, then graded
+        Index(
+            "ix_assignment_submissions_pending", "assignment_id", "submitted_at", "id",
+            postgresql_where=marks.is_(None)
+        ),
+        Index(
+            "ix_assignment_submissions_graded", "assignment_id", "submitted_at", "id",
+            postgresql_where=marks.is_not(None)
+        ),
+    )
+
+
+# =====================================================
+# SUBMISSION SIMILARITY (MINHASH + LSH, see similarity.py)
+# =====================================================
+
+class SubmissionSignature(Base):
+    __tablename__ = "submission_signatures"
+
+    submission_id = Column(Integer, ForeignKey("assignment_submissions.id", ondelete="CASCADE"), primary_key=True)
+    assignment_id = Column(Integer, ForeignKey("assignments.id", ondelete="CASCADE"), nullable=False)
+
+    signature = Column(LargeBinary, nullable=False)     # NUM_PERM little-endian uint64
+
+
+class SubmissionLshBucket(Base):
+    __tablename__ = "submission_lsh_buckets"
+
+    # one row per (submission, band); the key leads with what candidate
+    # lookups join on
+    assignment_id = Column(Integer, ForeignKey("assignments.id", ondelete="CASCADE"), primary_key=True)
+    band = Column(SmallInteger, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    submission_id = Column(
+        Integer, ForeignKey("assignment_submissions.id", ondelete="CASCADE"), primary_key=True
+    )
+
+    __table_args__ = (
+        Index("ix_submission_lsh_buckets_submission_id", "submission_id"),
     )
 
 
@@ -216,7 +394,11 @@ class Exam(Base):
 
     name = Column(String, nullable=False)   # Midterm / Endsem
     max_marks = Column(Integer, nullable=False)
-    exam_date = Column(String, nullable=False)
+    exam_date = Column(Date, nullable=False)
+
+    __table_args__ = (
+        Index("ix_exams_course_exam_date", "course_id", "exam_date"),
+    )
 
 
 # =====================================================
@@ -276,3 +458,40 @@ class Timetable(Base):
 
     room = Column(String, nullable=False)
 
+
+# =====================================================
+# BACKGROUND JOBS (QUEUE FOR jobs.py WORKERS)
+# =====================================================
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)           # a key of jobs.JOB_KINDS
+    params = Column(JSONB, nullable=False)
+    status = Column(String, nullable=False, default="queued", server_default="queued")
+    # "queued" | "running" | "done" | "failed" | "cancelled"
+
+    # progress, committed with each chunk's work
+    done = Column(Integer, nullable=False, default=0, server_default="0")
+    total = Column(Integer, nullable=True)
+    checkpoint = Column(JSONB, nullable=False, default=dict, server_default="{}")
+    error = Column(Text, nullable=True)
+
+    cancel_requested = Column(Boolean, nullable=False, default=False, server_default="false")
+    worker = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # what workers scan when claiming: unfinished jobs only
+        Index(
+            "ix_jobs_unfinished", "id",
+            postgresql_where=status.in_(["queued", "running"])
+        ),
+    )
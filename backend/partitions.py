@@ -0,0 +1,323 @@
+# partitions.py
+
+import os
+import threading
+from datetime import date
+from typing import NamedTuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import attendance_bitmap
+from database import in_batch
+
+# =====================================================
+# ACADEMIC TERMS
+# =====================================================
+'''attendance_sessions and attendance_records are range-partitioned by
+academic term (sessions on date, records on session_date).
+A term starts on each of TERM_START_MONTHS and runs until the next one,
+so the default "1,7" gives two semesters a year: 2026-S1 (Jan-Jun) and
+2026-S2 (Jul-Dec).
+
+Partitions for the current and the next term are created on startup and
+on demand before a session is written, so inserts never land in a term
+that has no partition yet. Rows that did reach the default partition
+(written before their term had one) are moved into the term's partition
+when it is created.
+
+Closed terms are archived with archive_term(): their rows are folded
+into attendance_term_summaries and the partitions are detached, so live
+queries only touch open terms. Archiving also puts an archived_<term>
+CHECK on the default partitions, so a backdated write into an archived
+term is refused (TermArchived before the insert, the CHECK for anything
+that slips past) instead of landing in the default partition where no
+summary would ever count it. The CHECK is also how an archived term is
+recognised after its detached tables are dropped.'''
+
+TERM_START_MONTHS = sorted(
+    int(m) for m in os.getenv("TERM_START_MONTHS", "1,7").split(",")
+)
+
+PARTITIONED_TABLES = ("attendance_sessions", "attendance_records")
+PARTITION_KEYS = {"attendance_sessions": "date", "attendance_records": "session_date"}
+
+
+class Term(NamedTuple):
+    code: str           # 2026-S2
+    start: date         # inclusive
+    end: date           # exclusive
+
+    @property
+    def suffix(self) -> str:
+        return self.code.lower().replace("-", "_")
+
+
+def term_for(day: date) -> Term:
+    started = [m for m in TERM_START_MONTHS if m <= day.month]
+    if not started:
+        # before the first start month: still in last year's final term
+        return term_for(date(day.year - 1, 12, 31))
+
+    index = TERM_START_MONTHS.index(started[-1])
+
+    start = date(day.year, TERM_START_MONTHS[index], 1)
+    if index + 1 < len(TERM_START_MONTHS):
+        end = date(day.year, TERM_START_MONTHS[index + 1], 1)
+    else:
+        end = date(day.year + 1, TERM_START_MONTHS[0], 1)
+
+    return Term(f"{day.year}-S{index + 1}", start, end)
+
+
+def next_term(term: Term) -> Term:
+    return term_for(term.end)
+
+
+def term_by_code(code: str) -> Term:
+    try:
+        year, number = code.upper().split("-S")
+        number = int(number)
+        if not 1 <= number <= len(TERM_START_MONTHS):
+            raise ValueError
+        return term_for(date(int(year), TERM_START_MONTHS[number - 1], 1))
+    except ValueError:
+        raise ValueError(f"Unknown term code {code!r}")
+
+
+def terms_between(first: date, last: date) -> list[Term]:
+    terms = [term_for(first)]
+    while terms[-1].end <= last:
+        terms.append(next_term(terms[-1]))
+    return terms
+
+
+# =====================================================
+# PARTITION MAINTENANCE
+# =====================================================
+
+_ensured: set[str] = set()
+_ensured_lock = threading.Lock()
+
+
+def _is_partitioned(db: Session) -> bool:
+    return db.execute(
+        text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = 'attendance_records')"
+        )
+    ).scalar()
+
+
+class TermArchived(Exception):
+    pass
+
+
+def partition_state(db: Session, table: str) -> str | None:
+    """
+    "attached", "detached" (a plain table, e.g. an archived term)
+    or None when there is no such table
+    """
+    attached = db.execute(
+        text("SELECT relispartition FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": table}
+    ).scalar()
+    if attached is None:
+        return None
+    return "attached" if attached else "detached"
+
+
+def is_archived(db: Session, term: Term) -> bool:
+    marked = db.execute(
+        text(
+            "SELECT EXISTS (SELECT 1 FROM pg_constraint "
+            "WHERE conrelid = to_regclass('attendance_sessions_default') AND conname = :name)"
+        ),
+        {"name": f"archived_{term.suffix}"}
+    ).scalar()
+    # terms archived before the marker existed are only detached
+    return marked or partition_state(db, f"attendance_sessions_{term.suffix}") == "detached"
+
+
+def _in_term(key: str, term: Term) -> str:
+    return f"{key} >= '{term.start.isoformat()}' AND {key} < '{term.end.isoformat()}'"
+
+
+def _columns(db: Session, table: str) -> str:
+    return db.execute(
+        text(
+            "SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) FROM pg_attribute "
+            "WHERE attrelid = to_regclass(:table) AND attnum > 0 AND NOT attisdropped"
+        ),
+        {"table": table}
+    ).scalar()
+
+
+def _default_holds(db: Session, term: Term) -> bool:
+    if partition_state(db, "attendance_sessions_default") is None:
+        return False
+    return db.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM attendance_sessions_default "
+        f"WHERE {_in_term('date', term)})"
+    )).scalar()
+
+
+def ensure_term_partition(db: Session, term: Term):
+    """
+    Create the term's partitions (idempotent). Sessions first,
+    records reference them. Raises TermArchived for archived terms.
+    """
+    if is_archived(db, term):
+        raise TermArchived(f"Term {term.code} is archived")
+    if partition_state(db, f"attendance_sessions_{term.suffix}") == "attached":
+        return
+    if _default_holds(db, term):
+        _move_from_default(db, term)
+        return
+
+    for parent in PARTITIONED_TABLES:
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {parent}_{term.suffix} "
+            f"PARTITION OF {parent} "
+            f"FOR VALUES FROM ('{term.start.isoformat()}') TO ('{term.end.isoformat()}')"
+        ))
+
+
+def _move_from_default(db: Session, term: Term):
+    """
+    A partition can't be attached while the default partition holds rows
+    in its range: copy them into the new tables, delete them from the
+    default (records first, they reference sessions), then attach
+    """
+    for parent in PARTITIONED_TABLES:
+        columns = _columns(db, parent)
+        db.execute(text(
+            f"CREATE TABLE {parent}_{term.suffix} "
+            f"(LIKE {parent} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        ))
+        db.execute(text(
+            f"INSERT INTO {parent}_{term.suffix} ({columns}) "
+            f"SELECT {columns} FROM {parent}_default WHERE {_in_term(PARTITION_KEYS[parent], term)}"
+        ))
+
+    for parent in reversed(PARTITIONED_TABLES):
+        db.execute(text(
+            f"DELETE FROM {parent}_default WHERE {_in_term(PARTITION_KEYS[parent], term)}"
+        ))
+
+    for parent in PARTITIONED_TABLES:
+        db.execute(text(
+            f"ALTER TABLE {parent} ATTACH PARTITION {parent}_{term.suffix} "
+            f"FOR VALUES FROM ('{term.start.isoformat()}') TO ('{term.end.isoformat()}')"
+        ))
+
+
+def ensure_partitions_for(db: Session, day: date):
+    """
+    Make sure writes dated `day` have a partition.
+    Cheap after the first call per term: it's an in-memory set lookup.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+
+    term = term_for(day)
+    # another worker may archive a closed term at any time: always check those
+    if term.code in _ensured and term.end > date.today():
+        return
+
+    with _ensured_lock:
+        if term.code in _ensured and term.end > date.today():
+            return
+        if not _is_partitioned(db):
+            return
+        ensure_term_partition(db, term)
+        # a POST /batch may still roll the partitions back
+        if not in_batch():
+            _ensured.add(term.code)
+
+
+def ensure_upcoming_partitions(db: Session, today: date | None = None):
+    """
+    Current and next term, plus the default catch-all partition
+    """
+    if db.get_bind().dialect.name != "postgresql" or not _is_partitioned(db):
+        return
+
+    current = term_for(today or date.today())
+    for term in (current, next_term(current)):
+        ensure_term_partition(db, term)
+        _ensured.add(term.code)
+
+    for parent in PARTITIONED_TABLES:
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {parent}_default PARTITION OF {parent} DEFAULT"
+        ))
+
+    db.commit()
+
+
+# =====================================================
+# ARCHIVAL
+# =====================================================
+
+class TermNotClosed(Exception):
+    pass
+
+
+class TermNotPartitioned(Exception):
+    pass
+
+
+def archive_term(db: Session, term: Term, drop: bool = False) -> dict:
+    """
+    Fold a closed term into per (student, course) summaries and detach
+    its partitions. Detached partitions are kept as plain tables unless
+    drop=True.
+    """
+    if term.end > date.today():
+        raise TermNotClosed(f"Term {term.code} has not ended yet")
+    if is_archived(db, term):
+        raise TermArchived(f"Term {term.code} is already archived")
+
+    sessions = f"attendance_sessions_{term.suffix}"
+    records = f"attendance_records_{term.suffix}"
+    if partition_state(db, sessions) != "attached" or partition_state(db, records) != "attached":
+        raise TermNotPartitioned(f"Term {term.code} has no attendance partitions")
+
+    summarized = db.execute(text(f"""
+        INSERT INTO attendance_term_summaries
+            (term_code, student_id, course_id, attended, total)
+        SELECT :code, student_id, course_id,
+               count(*) FILTER (WHERE present),
+               count(*)
+        FROM ({attendance_bitmap.attendance_rows(sessions, records)}
+        ) attendance
+        GROUP BY student_id, course_id
+        ON CONFLICT (term_code, student_id, course_id)
+        DO UPDATE SET attended = EXCLUDED.attended, total = EXCLUDED.total
+    """), {"code": term.code}).rowcount
+
+    # records reference sessions, so they go first; the detached records
+    # table keeps a copy of the FK, which would pin the sessions partition
+    db.execute(text(f"ALTER TABLE attendance_records DETACH PARTITION {records}"))
+    db.execute(text(f"ALTER TABLE {records} DROP CONSTRAINT IF EXISTS fk_attendance_records_session"))
+    db.execute(text(f"ALTER TABLE attendance_sessions DETACH PARTITION {sessions}"))
+
+    # from here on the term's range belongs to no partition: keep the
+    # default partitions from taking writes dated in it
+    for parent, key in PARTITION_KEYS.items():
+        db.execute(text(f"CREATE TABLE IF NOT EXISTS {parent}_default PARTITION OF {parent} DEFAULT"))
+        db.execute(text(
+            f"ALTER TABLE {parent}_default ADD CONSTRAINT archived_{term.suffix} "
+            f"CHECK (NOT ({_in_term(key, term)}))"
+        ))
+
+    if drop:
+        db.execute(text(f"DROP TABLE {records}"))
+        db.execute(text(f"DROP TABLE {sessions}"))
+
+    db.commit()
+    _ensured.discard(term.code)
+
+    return {"term": term.code, "summaries": summarized, "dropped": drop}
@@ -0,0 +1,409 @@
+# profiling.py
+
+import asyncio
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from urllib.parse import parse_qs
+
+import anyio.to_thread
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from database import engine, SessionLocal
+
+# =====================================================
+# CONFIG
+# =====================================================
+'''On-demand profiling of a single request.
+
+An admin adds "X-Profile: 1" (or ?profile=1) to any request. That request
+is sampled every PROFILE_INTERVAL_MS: the event loop thread while our task
+is the one running, and any threadpool thread currently executing work
+for it (sync endpoints, dependencies and response validation all run
+there; the middleware wraps anyio.to_thread.run_sync so those threads
+record whose work they are doing). Alongside the samples every SQL
+statement is timed.
+
+The result is stored in PROFILE_DIR as <id>.json (SQL timeline, time
+breakdown, folded stacks) plus <id>.folded, which flamegraph.pl and
+speedscope read directly. The response carries X-Profile-Id; fetch it
+from GET /admin/profiles/{id}.
+
+Requests without the flag only pay for a header scan: the SQL hooks are
+attached while at least one profile is running and removed afterwards.'''
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+PROFILE_SQL_CHARS = 1000
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+_active: ContextVar["RequestProfile | None"] = ContextVar("request_profile", default=None)
+
+
+# =====================================================
+# PROFILE
+# =====================================================
+
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.status = None
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.stacks: Counter = Counter()
+        self.sql: list[dict] = []
+        self.task = None
+        self.loop_thread = None
+
+    def sql_started(self, statement: str) -> dict:
+        entry = {
+            "start_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "statement": statement[:PROFILE_SQL_CHARS],
+            "thread": threading.get_ident(),
+        }
+        self.sql.append(entry)
+        return entry
+
+    def to_dict(self) -> dict:
+        samples = sum(self.stacks.values())
+        breakdown = Counter()
+        for stack, count in self.stacks.items():
+            breakdown[_category(stack)] += count
+
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 3),
+            "interval_ms": PROFILE_INTERVAL_MS,
+            "samples": samples,
+            "breakdown": {
+                name: round(count / samples, 3) for name, count in breakdown.most_common()
+            } if samples else {},
+            "sql_count": len(self.sql),
+            "sql_ms": round(sum(q.get("duration_ms", 0) for q in self.sql), 3),
+            "sql": self.sql,
+            "folded": self.folded(),
+        }
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+def _category(stack: str) -> str:
+    """
+    Where the leaf-most interesting frame of a sample lives
+    """
+    for frame in reversed(stack.split(";")):
+        if "psycopg2" in frame or "sqlalchemy/engine" in frame:
+            return "sql"
+        if "sqlalchemy/orm" in frame:
+            return "orm"
+        if "pydantic" in frame or "fastapi/encoders" in frame or "json/" in frame:
+            return "serialization"
+        if "/routers/" in frame:
+            return "app"
+    return "framework"
+
+
+# =====================================================
+# SAMPLER
+# =====================================================
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+# thread ident -> profile of the request whose work the thread is running
+_threads: dict[int, "RequestProfile"] = {}
+_run_sync = anyio.to_thread.run_sync
+
+
+def _on_thread(profile: "RequestProfile", func):
+    @functools.wraps(func)
+    def run(*args):
+        ident = threading.get_ident()
+        _threads[ident] = profile
+        try:
+            return func(*args)
+        finally:
+            _threads.pop(ident, None)
+    return run
+
+
+async def _profiled_run_sync(func, *args, **kwargs):
+    """
+    anyio.to_thread.run_sync, which starlette's run_in_threadpool (sync
+    endpoints, dependencies, response validation) calls at call time:
+    work sent to the threadpool on behalf of a profiled request records
+    its thread for the sampler
+    """
+    profile = _active.get()
+    if profile is not None:
+        func = _on_thread(profile, func)
+    return await _run_sync(func, *args, **kwargs)
+
+
+def _install_threadpool_hook():
+    anyio.to_thread.run_sync = _profiled_run_sync
+
+
+def _stack(frame) -> str:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _Sampler(threading.Thread):
+    def __init__(self):
+        super().__init__(name="request-profiler", daemon=True)
+        self.profiles: set[RequestProfile] = set()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+
+    def run(self):
+        interval = PROFILE_INTERVAL_MS / 1000
+        me = threading.get_ident()
+        while True:
+            with self.lock:
+                profiles = list(self.profiles)
+            if not profiles:
+                self.wake.wait()
+                self.wake.clear()
+                continue
+
+            loop_threads = {p.loop_thread: p for p in profiles}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                if thread_id in loop_threads:
+                    profile = loop_threads[thread_id]
+                    if asyncio.current_task(profile.task.get_loop()) is not profile.task:
+                        continue
+                else:
+                    profile = _threads.get(thread_id)
+                    if profile is None or profile not in profiles:
+                        continue
+                profile.stacks[_stack(frame)] += 1
+            time.sleep(interval)
+
+    def add(self, profile: RequestProfile):
+        with self.lock:
+            self.profiles.add(profile)
+        self.wake.set()
+
+    def remove(self, profile: RequestProfile):
+        with self.lock:
+            self.profiles.discard(profile)
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def _get_sampler() -> _Sampler:
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = _Sampler()
+            _sampler.start()
+    return _sampler
+
+
+# =====================================================
+# SQL TIMELINE
+# =====================================================
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active.get()
+    if profile is not None:
+        conn.info.setdefault("profile_sql", []).append(
+            (profile.sql_started(statement), time.perf_counter())
+        )
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    pending = conn.info.get("profile_sql")
+    if pending:
+        entry, start = pending.pop()
+        entry["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        entry["rows"] = cursor.rowcount
+
+
+_hooks = 0
+_hooks_lock = threading.Lock()
+
+
+def _attach_sql_hooks():
+    global _hooks
+    with _hooks_lock:
+        if _hooks == 0:
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        _hooks += 1
+
+
+def _detach_sql_hooks():
+    global _hooks
+    with _hooks_lock:
+        _hooks -= 1
+        if _hooks == 0:
+            event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+            event.remove(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# =====================================================
+# STORAGE
+# =====================================================
+
+def _save(profile: RequestProfile):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    data = profile.to_dict()
+    with open(os.path.join(PROFILE_DIR, f"{profile.id}.json"), "w") as f:
+        json.dump(data, f)
+    with open(os.path.join(PROFILE_DIR, f"{profile.id}.folded"), "w") as f:
+        f.write(data["folded"])
+
+    stored = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith(".json")),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in stored[:-PROFILE_KEEP]:
+        for suffix in (".json", ".folded"):
+            try:
+                os.remove(entry.path[:-len(".json")] + suffix)
+            except FileNotFoundError:
+                pass
+
+
+def load_profile(profile_id: str, folded: bool = False) -> dict | str | None:
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.{'folded' if folded else 'json'}")
+    try:
+        with open(path) as f:
+            return f.read() if folded else json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def list_profiles(limit: int = 50) -> list[dict]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    stored = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith(".json")),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True
+    )
+    result = []
+    for entry in stored[:limit]:
+        with open(entry.path) as f:
+            data = json.load(f)
+        result.append({
+            key: data[key] for key in
+            ("id", "method", "path", "status", "duration_ms", "samples", "sql_count", "sql_ms", "breakdown")
+        })
+    return result
+
+
+# =====================================================
+# MIDDLEWARE
+# =====================================================
+
+def _requested(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value not in (b"", b"0", b"false")
+    query = scope.get("query_string", b"")
+    if b"profile=" in query:
+        value = parse_qs(query.decode("latin-1")).get("profile", [""])[0]
+        return value not in ("", "0", "false")
+    return False
+
+
+def _bearer_token(scope) -> str:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer":
+                return token
+    return ""
+
+
+def _authorize_admin(token: str):
+    from auth import user_from_token
+
+    db = SessionLocal()
+    try:
+        user = user_from_token(token, db)
+    finally:
+        db.close()
+    if user is None:
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+        _install_threadpool_hook()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            return await self.app(scope, receive, send)
+
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, _authorize_admin, _bearer_token(scope))
+        except HTTPException as e:
+            body = json.dumps({"detail": f"Profiling: {e.detail}"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": e.status_code,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode())],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        profile.task = asyncio.current_task()
+        profile.loop_thread = threading.get_ident()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile.id.encode())
+                ]
+            await send(message)
+
+        sampler = _get_sampler()
+        _attach_sql_hooks()
+        token = _active.set(profile)
+        sampler.add(profile)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.remove(profile)
+            _active.reset(token)
+            _detach_sql_hooks()
+            profile.duration = time.perf_counter() - profile.started
+            await loop.run_in_executor(None, _save, profile)
@@ -13,7 +13,11 @@ from models import Department, Course
 from schemas import DepartmentCreate, CourseCreate
 
 from models import Enrollment, FacultyCourse
-from schemas import EnrollmentCreate, FacultyCourseCreate
+from schemas import EnrollmentCreate, FacultyCourseCreate, CapacityUpdate
+from schemas import BulkEnrollment, BulkEnrollmentResult
+import seats
+from serialization import plain_rows, plain_page, course_list
+from search import student_search, faculty_search, SEARCH_PAGE_SIZE
 
 
 router = APIRouter(
@@ -70,6 +74,22 @@ def create_student(
     return student
 
 
+# =====================================================
+# SEARCH STUDENTS (ADMIN ONLY, ONE PAGE AT A TIME)
+@router.get("/students/search")
+def search_students(
+    q: str | None = None,
+    department_id: int | None = None,
+    sort: str = "name",
+    order: str = "asc",
+    limit: int = SEARCH_PAGE_SIZE,
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+    _: User = Depends(get_current_admin)
+):
+    return plain_page(student_search.run(db, q, department_id, sort, order, limit, cursor))
+
+
 @router.put("/students/{student_id}")
 def update_student(
     student_id: int,
@@ -131,7 +151,7 @@ def get_all_faculty(
         .all()
     )
 
-    return [
+    return plain_rows([
         {
             "id": f.id,
             "name": f.name,
@@ -141,7 +161,21 @@ def get_all_faculty(
             "department_name": f.department.name
         }
         for f in faculty
-    ]
+    ])
+
+
+@router.get("/faculty/search")
+def search_faculty(
+    q: str | None = None,
+    department_id: int | None = None,
+    sort: str = "name",
+    order: str = "asc",
+    limit: int = SEARCH_PAGE_SIZE,
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+    _: User = Depends(get_current_admin)
+):
+    return plain_page(faculty_search.run(db, q, department_id, sort, order, limit, cursor))
 
 
 @router.post("/faculty", status_code=201)
@@ -252,7 +286,7 @@ def get_all_courses(
     db: Session = Depends(get_db),
     _: User = Depends(get_current_admin)
 ):
-    return db.query(Course).all()
+    return course_list.orm(db.query(Course).all())
 
 
 @router.post("/courses", status_code=201)
@@ -267,6 +301,22 @@ def create_course(
     db.refresh(course_obj)
     return course_obj
 
+
+# =====================================================
+# COURSE CAPACITY (ADMIN ONLY)
+@router.put("/courses/{course_id}/capacity")
+def update_course_capacity(
+    course_id: int,
+    data: CapacityUpdate,
+    db: Session = Depends(get_db),
+    _: User = Depends(get_current_admin)
+):
+    if data.capacity is not None and data.capacity < 0:
+        raise HTTPException(status_code=400, detail="Capacity can't be negative")
+
+    promoted = seats.set_capacity(db, course_id, data.capacity)
+    return {"course_id": course_id, "capacity": data.capacity, "promoted": promoted}
+
 from sqlalchemy import func
 
 
@@ -349,20 +399,32 @@ def enroll_student(
     if not student or not course:
         raise HTTPException(status_code=400, detail="Invalid student or course ID")
 
-    existing = db.query(Enrollment).filter(
-        Enrollment.student_id == data.student_id,
-        Enrollment.course_id == data.course_id
-    ).first()
-
-    if existing:
+    # insert-or-nothing under the course lock: no check-then-insert race,
+    # and seats_taken stays in step (admins may exceed capacity)
+    enrollment_id = seats.admin_enroll(db, data.student_id, data.course_id)
+    if enrollment_id is None:
         raise HTTPException(status_code=400, detail="Student already enrolled")
 
-    enrollment = Enrollment(**data.dict())
-    db.add(enrollment)
-    db.commit()
-    db.refresh(enrollment)
+    return {"id": enrollment_id, "student_id": data.student_id, "course_id": data.course_id}
+
+
+@router.post("/enrollments/bulk", response_model=BulkEnrollmentResult)
+def bulk_enroll_students(
+    data: BulkEnrollment,
+    db: Session = Depends(get_db),
+    _: User = Depends(get_current_admin)
+):
+    """
+    Cohort enrollment at semester start: {department_id, semester} or
+    {pairs: [{student_id, course_id}, ...]}. Existing enrollments are
+    skipped; one transaction. For big cohorts, POST /admin/jobs with
+    kind "bulk_enroll" runs it in the background instead.
+    """
+    seats.check_bulk_enroll(data)
 
-    return enrollment
+    if data.pairs is None:
+        return seats.bulk_enroll(db, department_id=data.department_id, semester=data.semester)
+    return seats.bulk_enroll(db, pairs=[(p.student_id, p.course_id) for p in data.pairs])
 
 
 @router.post("/assign-faculty", status_code=201)
@@ -460,13 +522,179 @@ def unenroll_student(
     db: Session = Depends(get_db),
     _: User = Depends(get_current_admin)
 ):
-    enrollment = db.query(Enrollment).filter(
-        Enrollment.student_id == student_id,
-        Enrollment.course_id == course_id
-    ).first()
+    # frees the seat for the head of the waitlist; 404 if not enrolled
+    seats.drop(db, student_id, course_id)
 
-    if not enrollment:
-        raise HTTPException(404, "Enrollment not found")
 
-    db.delete(enrollment)
-    db.commit()
+# =====================================================
+# BACKGROUND JOBS (RUN BY `python jobs.py` WORKERS)
+# =====================================================
+import jobs
+from models import Job
+from schemas import JobCreate, JobResponse
+
+@router.post("/jobs", status_code=202, response_model=JobResponse)
+def create_job(
+    data: JobCreate,
+    db: Session = Depends(get_db),
+    admin: User = Depends(get_current_admin)
+):
+    """
+    Queue a long operation, e.g. {"kind": "bulk_enroll", "params":
+    {"department_id": 1, "semester": 3}}; poll GET /admin/jobs/{id}
+    """
+    return jobs.enqueue(db, data.kind, data.params, created_by=admin.id)
+
+
+@router.get("/jobs", response_model=list[JobResponse])
+def get_jobs(
+    status: str | None = None,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    _: User = Depends(get_current_admin)
+):
+    query = db.query(Job).order_by(Job.id.desc())
+    if status is not None:
+        query = query.filter(Job.status == status)
+    return query.limit(max(1, min(limit, 500))).all()
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    _: User = Depends(get_current_admin)
+):
+    job = db.get(Job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=JobResponse)
+def cancel_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    _: User = Depends(get_current_admin)
+):
+    """
+    Queued jobs are cancelled at once, running ones after their current chunk
+    """
+    return jobs.request_cancel(db, job_id)
+
+
+# =====================================================
+# REQUEST COALESCING METRICS
+# =====================================================
+from coalesce import single_flight
+
+@router.get("/metrics/coalescing")
+def get_coalescing_metrics(
+    _: User = Depends(get_current_admin)
+):
+    """
+    Per-route count of reads that ran vs reads that
+    piggy-backed on an identical in-flight read
+    """
+    return single_flight.stats()
+
+
+# =====================================================
+# IN-PROCESS CACHE STATS
+# =====================================================
+from cache import cache_stats
+
+@router.get("/metrics/caches")
+def get_cache_metrics(
+    _: User = Depends(get_current_admin)
+):
+    return cache_stats()
+
+
+# =====================================================
+# ACADEMIC TERM ARCHIVAL
+# =====================================================
+from partitions import archive_term, term_by_code, TermArchived, TermNotClosed, TermNotPartitioned
+
+@router.post("/terms/{term_code}/archive")
+def archive_attendance_term(
+    term_code: str,
+    drop: bool = False,
+    db: Session = Depends(get_db),
+    _: User = Depends(get_current_admin)
+):
+    """
+    Summarize a closed term's attendance and detach its partitions
+    """
+    try:
+        term = term_by_code(term_code)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    try:
+        return archive_term(db, term, drop=drop)
+    except TermNotClosed as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except TermNotPartitioned as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    except TermArchived as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+# =====================================================
+# REQUEST PROFILES (X-Profile: 1 ON ANY REQUEST)
+# =====================================================
+from fastapi.responses import PlainTextResponse
+from profiling import load_profile, list_profiles
+
+@router.get("/profiles")
+def get_profiles(
+    limit: int = 50,
+    _: User = Depends(get_current_admin)
+):
+    return list_profiles(limit)
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(
+    profile_id: str,
+    format: str = "json",
+    _: User = Depends(get_current_admin)
+):
+    """
+    Stored profile; format=folded returns collapsed stacks
+    for flamegraph.pl / speedscope
+    """
+    profile = load_profile(profile_id, folded=(format == "folded"))
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if format == "folded":
+        return PlainTextResponse(profile)
+    return profile
+
+
+# =====================================================
+# SLOW QUERIES (THIS WORKER)
+# =====================================================
+from slow_queries import slow_query_log
+from batch import outside_transaction
+
+@router.get("/slow-queries")
+def get_slow_queries(
+    limit: int = 20,
+    plans: bool = False,
+    _: User = Depends(get_current_admin)
+):
+    """
+    Top slow-query fingerprints by total time;
+    plans=true includes captured EXPLAIN output
+    """
+    return slow_query_log.top(limit, plans=plans)
+
+
+@router.delete("/slow-queries", status_code=204, dependencies=[Depends(outside_transaction)])
+def reset_slow_queries(
+    _: User = Depends(get_current_admin)
+):
+    slow_query_log.reset()
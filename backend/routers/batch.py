@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, Request
+
+from auth import oauth2_scheme
+from schemas import BatchRequest
+from serialization import plain_page
+import batch
+
+router = APIRouter(
+    tags=["Batch"]
+)
+
+
+# =====================================================
+# SEVERAL OPERATIONS IN ONE REQUEST AND TRANSACTION
+# =====================================================
+
+@router.post("/batch")
+async def run_batch(
+    request: Request,
+    data: BatchRequest,
+    token: str = Depends(oauth2_scheme)
+):
+    """
+    {"mode": "atomic" | "best_effort", "requests": [{"method", "path", "body"}]}
+    -> {"mode", "committed", "results": [{"status", "body"}]}, in order.
+    Atomic batches stop at the first failure; see batch.py.
+    """
+    return plain_page(await batch.run(request, token, data))
@@ -3,21 +3,56 @@ from sqlalchemy.orm import Session
 
 from database import get_db
 from models import Course
+from coalesce import single_flight, coalesce_key
+from cache import catalog_cache
+from serialization import plain_rows
 
 router = APIRouter(
     prefix="/courses",
     tags=["Courses"]
 )
 
+
+def course_to_dict(c: Course) -> dict:
+    return {
+        "id": c.id,
+        "course_code": c.course_code,
+        "course_name": c.course_name,
+        "credits": c.credits,
+        "semester": c.semester,
+        "department_id": c.department_id
+    }
+
+
+# catalog reads are identical for every caller, so they coalesce
+# across users (scope "public")
+
 @router.get("/")
 def get_courses(db: Session = Depends(get_db)):
-    return db.query(Course).all()
+    key = coalesce_key("courses.all", "public")
+    return plain_rows(catalog_cache.get_or_load(
+        key,
+        lambda: single_flight.do(
+            key,
+            lambda: [course_to_dict(c) for c in db.query(Course).all()]
+        )
+    ))
 
 @router.get("/department/{department_id}")
 def get_courses_by_department(
     department_id: int,
     db: Session = Depends(get_db)
 ):
-    return db.query(Course).filter(
-        Course.department_id == department_id
-    ).all()
+    key = coalesce_key("courses.department", "public", department_id=department_id)
+    return plain_rows(catalog_cache.get_or_load(
+        key,
+        lambda: single_flight.do(
+            key,
+            lambda: [
+                course_to_dict(c)
+                for c in db.query(Course).filter(
+                    Course.department_id == department_id
+                ).all()
+            ]
+        )
+    ))
@@ -6,8 +6,9 @@ from models import AssignmentSubmission, Faculty, User, Course, FacultyCourse,As
 from auth import get_current_user,  get_current_faculty
 
 from schemas import FacultyDashboard,FacultyResponse
+from coalesce import single_flight, coalesce_key
+from serialization import plain_page, plain_rows
 
-from datetime import datetime
 from sqlalchemy import and_
 
 
@@ -41,7 +42,7 @@ def get_all_faculty(
         .all()
     )
 
-    return [
+    return plain_rows([
         {
             "id": f.id,
             "name": f.name,
@@ -51,7 +52,7 @@ def get_all_faculty(
             "department_name": f.department.name if f.department else None
         }
         for f in faculty
-    ]
+    ])
 
 
 
@@ -111,6 +112,9 @@ def papers_summary(
         for r in rows
     ]
 
+import dashboards
+from starlette.concurrency import run_in_threadpool
+
 @router.get("/dashboard", response_model=FacultyDashboard)
 def faculty_dashboard(
     db: Session = Depends(get_db),
@@ -120,88 +124,25 @@ def faculty_dashboard(
             Faculty.user_id == current_user.id
         ).first()
 
-        # courses count
-        courses_count = db.query(FacultyCourse).filter(
-            FacultyCourse.faculty_id == faculty.id
-        ).count()
-
-        # students count (DISTINCT students across all courses)
-        students_count = (
-            db.query(func.count(func.distinct(Enrollment.student_id)))
-            .join(FacultyCourse, FacultyCourse.course_id == Enrollment.course_id)
-            .filter(FacultyCourse.faculty_id == faculty.id)
-            .scalar()
-        )
-
-        pending_papers = (
-            db.query(func.count(AssignmentSubmission.id))
-            .join(Assignment, Assignment.id == AssignmentSubmission.assignment_id)
-            .join(FacultyCourse, FacultyCourse.course_id == Assignment.course_id)
-            .filter(
-                FacultyCourse.faculty_id == faculty.id,
-                AssignmentSubmission.marks == None
-            )
-            .scalar()
-        )
-
-
-        # meetings today (stub for now)
-        meetings_today = 2
-
-        now = datetime.now()
-        today = now.strftime("%A")  # e.g. "Monday"
-        current_time = now.time()
-
-        classes_today = (
-        db.query(Timetable)
-        .join(FacultyCourse, FacultyCourse.course_id == Timetable.course_id)
-        .filter(
-                FacultyCourse.faculty_id == faculty.id,
-                Timetable.day_of_week == today
-            ).count()
-        )
-
-        next_class = (
-            db.query(
-                Course.course_name,
-                Timetable.start_time,
-                Timetable.room
-            )
-            .join(FacultyCourse, FacultyCourse.course_id == Course.id)
-            .join(Timetable, Timetable.course_id == Course.id)
-            .filter(
-                FacultyCourse.faculty_id == faculty.id,
-                Timetable.day_of_week == today,
-                Timetable.start_time > current_time
-            )
-            .order_by(Timetable.start_time)
-            .first()
+        # counters are per faculty member: this only folds one member's
+        # overlapping requests (dashboard, bootstrap, stream reconnects)
+        return single_flight.do(
+            coalesce_key("faculty.dashboard", faculty.id),
+            lambda: build_dashboard(db, faculty)
         )
 
-        next_class_info = None
-
-        if next_class:
-            next_class_info = {
-                "course": next_class.course_name,
-                "time": next_class.start_time.strftime("%I:%M %p"),
-                "room": next_class.room
-            }
 
-        
+def build_dashboard(db: Session, faculty: Faculty) -> dict:
+    return dashboards.faculty_counters(db, [faculty.id])[faculty.id]
 
 
-        return {
-            "courses": courses_count or 0,
-            "students": students_count or 0,
-            "pending_papers": pending_papers or 0,
-            "meetings_today": meetings_today or 0,
-            "classes_today": classes_today or 0,
-            "next_class": next_class_info
-        }
-
-
-    
-
+@router.get("/dashboard/stream")
+async def faculty_dashboard_stream(token: str = ""):
+    """
+    Server-sent "counters" events: the dashboard, pushed when it changes
+    """
+    faculty_id, counters = await run_in_threadpool(dashboards.stream_profile, "faculty", token)
+    return dashboards.event_stream("faculty", faculty_id, counters)
 
 
 @router.get("/my-courses")
@@ -213,15 +154,17 @@ def get_my_courses(
         Faculty.user_id == current_user.id
     ).first()
 
-    courses = (
+    return build_courses(db, faculty)
+
+
+def build_courses(db: Session, faculty: Faculty):
+    return (
         db.query(Course)
         .join(FacultyCourse, FacultyCourse.course_id == Course.id)
         .filter(FacultyCourse.faculty_id == faculty.id)
         .all()
     )
 
-    return courses
-
 
 from models import (
     Faculty,
@@ -233,6 +176,8 @@ from models import (
     Student,
 )
 from schemas import AttendanceSessionCreate, AttendanceRecordCreate
+from partitions import ensure_partitions_for, TermArchived
+import attendance_bitmap
 
 
 @router.post("/attendance/session", status_code=201)
@@ -254,12 +199,28 @@ def create_attendance_session(
     if not teaches:
         raise HTTPException(status_code=403, detail="Not assigned to this course")
 
+    try:
+        ensure_partitions_for(db, data.date)
+    except TermArchived as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
     session = AttendanceSession(
         course_id=data.course_id,
         faculty_id=faculty.id,
         date=data.date
     )
 
+    if attendance_bitmap.bitmap_mode():
+        # freeze the roster; one bit per enrolled student from here on
+        roster = [
+            sid for (sid,) in
+            db.query(Enrollment.student_id)
+            .filter(Enrollment.course_id == data.course_id)
+            .order_by(Enrollment.student_id)
+        ]
+        session.roster = roster
+        session.presence = attendance_bitmap.empty(len(roster))
+
     db.add(session)
     db.commit()
     db.refresh(session)
@@ -272,13 +233,83 @@ def mark_attendance(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_faculty)
 ):
-    record = AttendanceRecord(**data.dict())
+    session = db.query(AttendanceSession).filter(
+        AttendanceSession.id == data.session_id
+    ).with_for_update().first()
+
+    if not session:
+        raise HTTPException(status_code=404, detail="Attendance session not found")
+
+    if session.presence is not None:
+        index = attendance_bitmap.position(session.roster, data.student_id)
+        if index is None:
+            raise HTTPException(status_code=400, detail="Student is not on this session's roster")
+
+        session.presence = attendance_bitmap.with_bit(session.presence, index, data.present)
+        db.commit()
+
+        return {
+            "session_id": session.id,
+            "student_id": data.student_id,
+            "present": data.present
+        }
+
+    # records live in the same term partition as their session
+    record = AttendanceRecord(**data.dict(), session_date=session.date)
     db.add(record)
     db.commit()
     db.refresh(record)
     return record
 
 
+# =====================================================
+# LIVE ROLL-CALL (WEBSOCKET)
+# =====================================================
+from fastapi import WebSocket, WebSocketException
+from auth import user_from_token
+from database import SessionLocal
+import live_attendance
+
+
+def live_feed_roster(session_id: int, token: str) -> live_attendance.LiveRoster:
+    """
+    Browsers can't set headers on a WebSocket: the token comes as ?token=.
+    Uses its own short session; the socket holds no connection.
+    """
+    db = SessionLocal()
+    try:
+        user = user_from_token(token, db)
+        if user is None or user.role != "faculty":
+            raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Faculty access required")
+        faculty = db.query(Faculty).filter(Faculty.user_id == user.id).first()
+
+        try:
+            roster = live_attendance.roster_for(db, session_id)
+        except HTTPException as e:
+            raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+
+        teaches = faculty is not None and db.query(FacultyCourse).filter(
+            FacultyCourse.faculty_id == faculty.id,
+            FacultyCourse.course_id == roster.course_id
+        ).first()
+        if not teaches:
+            raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Not assigned to this course")
+        return roster
+    finally:
+        db.close()
+
+
+@router.websocket("/attendance/{session_id}/live")
+async def live_attendance_feed(websocket: WebSocket, session_id: int, token: str = ""):
+    """
+    A snapshot of who's present, then deltas as students check in.
+    Send {"student_id": .., "present": ..} to mark a student.
+    """
+    roster = await run_in_threadpool(live_feed_roster, session_id, token)
+    await websocket.accept()
+    await live_attendance.serve_feed(websocket, roster)
+
+
 from models import (
     Faculty,
     Course,
@@ -290,8 +321,12 @@ from models import (
 )
 from schemas import (
     AssignmentCreate,
-    AssignmentGradeUpdate
+    AssignmentGradeUpdate,
+    GradeSheet,
+    SubmissionGrade
 )
+from auth import get_current_faculty_profile
+import submissions
 
 @router.post("/assignments", status_code=201)
 def create_assignment(
@@ -325,15 +360,64 @@ def create_assignment(
 
     return assignment
 
+def teaching_assignment(db: Session, faculty: Faculty, assignment_id: int) -> Assignment:
+    assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
+    if not assignment:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+
+    teaches = db.query(FacultyCourse).filter(
+        FacultyCourse.faculty_id == faculty.id,
+        FacultyCourse.course_id == assignment.course_id
+    ).first()
+    if not teaches:
+        raise HTTPException(status_code=403, detail="Not assigned to this course")
+    return assignment
+
+
 @router.get("/assignments/{assignment_id}/submissions")
 def get_submissions(
     assignment_id: int,
+    status: str | None = None,
+    limit: int = submissions.SUBMISSION_PAGE_SIZE,
+    cursor: str | None = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_faculty)
+    faculty: Faculty = Depends(get_current_faculty_profile)
 ):
-    return db.query(AssignmentSubmission).filter(
-        AssignmentSubmission.assignment_id == assignment_id
-    ).all()
+    """
+    Pending submissions first, then graded, oldest first within each;
+    metadata only (bodies via GET /faculty/submissions/{id}/body).
+    Pass next_cursor back as cursor for the next page.
+    """
+    teaching_assignment(db, faculty, assignment_id)
+    return plain_page(submissions.submission_page(db, assignment_id, status, limit, cursor))
+
+
+@router.get("/submissions/{submission_id}/body")
+def download_submission(
+    submission_id: int,
+    db: Session = Depends(get_db),
+    faculty: Faculty = Depends(get_current_faculty_profile)
+):
+    """
+    Streams the body; supports Range requests
+    """
+    submission = db.query(AssignmentSubmission).filter(
+        AssignmentSubmission.id == submission_id
+    ).first()
+    if not submission:
+        raise HTTPException(status_code=404, detail="Submission not found")
+
+    teaches = db.query(FacultyCourse).join(
+        Assignment, Assignment.course_id == FacultyCourse.course_id
+    ).filter(
+        Assignment.id == submission.assignment_id,
+        FacultyCourse.faculty_id == faculty.id
+    ).first()
+    if not teaches:
+        raise HTTPException(status_code=403, detail="Not assigned to this course")
+
+    db.close()      # the body streams without the connection
+    return submissions.body_response(submission)
 
 
 @router.put("/submissions/{submission_id}/grade")
@@ -341,8 +425,12 @@ def grade_submission(
     submission_id: int,
     data: AssignmentGradeUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_faculty)
+    faculty: Faculty = Depends(get_current_faculty_profile)
 ):
+    """
+    One grade, at the version it was read at: 409 if another grader
+    changed it since (a one-row grade sheet)
+    """
     submission = db.query(AssignmentSubmission).filter(
         AssignmentSubmission.id == submission_id
     ).first()
@@ -350,13 +438,55 @@ def grade_submission(
     if not submission:
         raise HTTPException(status_code=404, detail="Submission not found")
 
-    submission.marks = data.marks
-    db.commit()
+    teaching_assignment(db, faculty, submission.assignment_id)
+    submissions.grade_sheet(db, submission.assignment_id, [
+        SubmissionGrade(submission_id=submission_id, marks=data.marks, version=data.version)
+    ])
     db.refresh(submission)
 
     return submission
 
 
+@router.put("/assignments/{assignment_id}/grades")
+def grade_assignment_sheet(
+    assignment_id: int,
+    data: GradeSheet,
+    db: Session = Depends(get_db),
+    faculty: Faculty = Depends(get_current_faculty_profile)
+):
+    """
+    Many grades at once, each with the version it was listed at. If any
+    submission changed since, nothing is saved: 409 with the current
+    marks and versions of the conflicting rows.
+    """
+    teaching_assignment(db, faculty, assignment_id)
+    return submissions.grade_sheet(db, assignment_id, data.grades)
+
+
+# =====================================================
+# SIMILAR SUBMISSIONS (NEAR-DUPLICATE DETECTION)
+# =====================================================
+from similarity import similar_pairs, SIMILARITY_THRESHOLD
+
+@router.get("/assignments/{assignment_id}/similar-pairs")
+def get_similar_submission_pairs(
+    assignment_id: int,
+    min_similarity: float = SIMILARITY_THRESHOLD,
+    db: Session = Depends(get_db),
+    faculty: Faculty = Depends(get_current_faculty_profile)
+):
+    """
+    Submission pairs with estimated Jaccard similarity >= min_similarity
+    (over word shingles), most similar first. Below ~0.45 the LSH index
+    starts missing pairs.
+    """
+    if not 0 <= min_similarity <= 1:
+        raise HTTPException(status_code=400, detail="min_similarity must be between 0 and 1")
+
+    teaching_assignment(db, faculty, assignment_id)
+    return plain_rows(similar_pairs(db, assignment_id, min_similarity))
+
+
 from models import Exam, ExamMark, FinalGrade
 from schemas import ExamCreate, ExamMarkCreate, GradeCreate
 
@@ -458,14 +588,14 @@ def get_students_for_course(
         .all()
     )
 
-    return [
+    return plain_rows([
         {
             "id": s.id,
             "name": s.name,
             "reg_no": s.reg_no
         }
         for s in students
-    ]
+    ])
 
 
 @router.get("/students-summary")
@@ -499,3 +629,26 @@ def students_summary(
     ]
 
 
+# =====================================================
+# BOOTSTRAP (EVERYTHING THE DASHBOARD NEEDS ON LOAD)
+# =====================================================
+from auth import get_current_faculty_profile
+from routers.course import course_to_dict
+
+@router.get("/bootstrap")
+def faculty_bootstrap(
+    db: Session = Depends(get_db),
+    faculty: Faculty = Depends(get_current_faculty_profile)
+):
+    """
+    One round-trip for the initial dashboard render.
+    The faculty member is resolved once and reused by every section.
+    """
+    return {
+        "profile": FacultyResponse.model_validate(faculty).model_dump(),
+        "dashboard": single_flight.do(
+            coalesce_key("faculty.dashboard", faculty.id),
+            lambda: build_dashboard(db, faculty)
+        ),
+        "courses": [course_to_dict(c) for c in build_courses(db, faculty)]
+    }
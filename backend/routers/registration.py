@@ -0,0 +1,122 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models import Course, Enrollment, Student, WaitlistEntry
+from schemas import RegistrationResult, RegistrationCourse
+from auth import get_current_student_profile
+from serialization import plain_rows
+import seats
+
+router = APIRouter(
+    prefix="/registration",
+    tags=["Registration"]
+)
+
+
+def require_open_window():
+    if not seats.registration_open():
+        raise HTTPException(status_code=403, detail="Registration is closed")
+
+
+# =====================================================
+# COURSES WITH SEATS
+# =====================================================
+
+@router.get("/courses", response_model=list[RegistrationCourse])
+def get_registration_courses(
+    semester: int | None = None,
+    db: Session = Depends(get_db),
+    _: Student = Depends(get_current_student_profile)
+):
+    waitlisted = (
+        db.query(WaitlistEntry.course_id, func.count().label("waitlisted"))
+        .group_by(WaitlistEntry.course_id)
+        .subquery()
+    )
+
+    query = (
+        db.query(Course, func.coalesce(waitlisted.c.waitlisted, 0))
+        .outerjoin(waitlisted, waitlisted.c.course_id == Course.id)
+        .order_by(Course.course_code)
+    )
+    if semester is not None:
+        query = query.filter(Course.semester == semester)
+
+    return plain_rows([
+        {
+            "id": c.id,
+            "course_code": c.course_code,
+            "course_name": c.course_name,
+            "credits": c.credits,
+            "semester": c.semester,
+            "department_id": c.department_id,
+            "capacity": c.capacity,
+            "seats_taken": c.seats_taken,
+            "seats_left": None if c.capacity is None else max(c.capacity - c.seats_taken, 0),
+            "waitlisted": waiting
+        }
+        for c, waiting in query.all()
+    ])
+
+
+# =====================================================
+# MY REGISTRATIONS
+# =====================================================
+
+@router.get("/me", response_model=list[RegistrationResult])
+def get_my_registrations(
+    db: Session = Depends(get_db),
+    student: Student = Depends(get_current_student_profile)
+):
+    enrolled = [
+        {"course_id": course_id, "status": "enrolled", "position": None}
+        for (course_id,) in db.query(Enrollment.course_id)
+        .filter(Enrollment.student_id == student.id)
+        .order_by(Enrollment.course_id)
+    ]
+
+    # position = entries up to and including mine in the same course
+    mine = db.query(WaitlistEntry).filter(WaitlistEntry.student_id == student.id).all()
+    waitlisted = [
+        {
+            "course_id": entry.course_id,
+            "status": "waitlisted",
+            "position": db.query(func.count(WaitlistEntry.id)).filter(
+                WaitlistEntry.course_id == entry.course_id,
+                WaitlistEntry.id <= entry.id
+            ).scalar()
+        }
+        for entry in mine
+    ]
+
+    return plain_rows(enrolled + waitlisted)
+
+
+# =====================================================
+# REGISTER / DROP (STUDENT, DURING THE WINDOW)
+# =====================================================
+
+@router.post("/courses/{course_id}", response_model=RegistrationResult)
+def register_for_course(
+    course_id: int,
+    response: Response,
+    db: Session = Depends(get_db),
+    student: Student = Depends(get_current_student_profile),
+    _: None = Depends(require_open_window)
+):
+    result = seats.register(db, student.id, course_id)
+    if result.status == "waitlisted":
+        response.status_code = 202
+    return {"course_id": course_id, **result._asdict()}
+
+
+@router.delete("/courses/{course_id}", status_code=204)
+def drop_course(
+    course_id: int,
+    db: Session = Depends(get_db),
+    student: Student = Depends(get_current_student_profile),
+    _: None = Depends(require_open_window)
+):
+    seats.drop(db, student.id, course_id)
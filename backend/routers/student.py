@@ -15,6 +15,9 @@ from models import (
 
 from auth import get_current_user, get_current_student
 from schemas import StudentDashboard
+from coalesce import single_flight, coalesce_key
+from cache import timetable_cache
+from serialization import plain_page, plain_rows
 
 
 
@@ -44,7 +47,7 @@ def get_all_students(
         .all()
     )
 
-    return [
+    return plain_rows([
         {
             "id": s.id,
             "name": s.name,
@@ -54,7 +57,7 @@ def get_all_students(
             "department_name": s.department.name
         }
         for s in students
-    ]
+    ])
 
 
 
@@ -73,7 +76,11 @@ def get_my_profile(
         if not student:
             raise HTTPException(status_code=404, detail="Student profile not found")
 
-        return {
+        return build_profile(student)
+
+
+def build_profile(student: Student) -> dict:
+    return {
         "name": student.name,
         "department": student.department.name if student.department else None
     }
@@ -93,39 +100,35 @@ def student_dashboard(
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
-    total_courses = db.query(Enrollment).filter(
-        Enrollment.student_id == student.id
-    ).count()
+    return build_dashboard(db, student)
 
-    total_attendance = (
-        db.query(AttendanceRecord)
-        .filter(AttendanceRecord.student_id == student.id)
-        .count()
-    )
 
-    present_attendance = (
-        db.query(AttendanceRecord)
-        .filter(
-            AttendanceRecord.student_id == student.id,
-            AttendanceRecord.present == True
-        )
-        .count()
-    )
+from sqlalchemy import func, case
+from models import AttendanceTermSummary
+from starlette.concurrency import run_in_threadpool
+import attendance_bitmap
+import dashboards
 
-    attendance_percentage = (
-        round((present_attendance / total_attendance) * 100)
-        if total_attendance > 0 else 0
-    )
 
-    pending_assignments = 0
-    days_to_exam = 14
+def attendance_totals(db: Session, student: Student) -> tuple[int, int]:
+    """
+    (present, total) over open terms (live partitions, row and bitmap
+    sessions) plus the summaries of archived terms
+    """
+    return dashboards.attendance_totals(db, [student.id])[student.id]
 
-    return {
-        "courses": total_courses,
-        "attendance_percentage": attendance_percentage,
-        "pending_assignments": pending_assignments,
-        "days_to_exam": days_to_exam
-    }
+
+def build_dashboard(db: Session, student: Student) -> dict:
+    return dashboards.student_counters(db, [student.id])[student.id]
+
+
+@router.get("/dashboard/stream")
+async def student_dashboard_stream(token: str = ""):
+    """
+    Server-sent "counters" events: the dashboard, pushed when it changes
+    """
+    student_id, counters = await run_in_threadpool(dashboards.stream_profile, "student", token)
+    return dashboards.event_stream("student", student_id, counters)
 
 
 @router.get("/my-courses")
@@ -137,22 +140,65 @@ def get_my_courses(
         Student.user_id == current_user.id
     ).first()
 
-    courses = (
+    return build_courses(db, student)
+
+
+def build_courses(db: Session, student: Student):
+    return (
         db.query(Course)
         .join(Enrollment, Enrollment.course_id == Course.id)
         .filter(Enrollment.student_id == student.id)
         .all()
     )
 
-    return courses
-
 
 from models import AttendanceSession, AttendanceRecord
 from sqlalchemy import func, case
 
 
+from datetime import date
+from fastapi import Query
+from schemas import AttendanceWeek
+
+
+def attendance_in_range(db: Session, student: Student, date_from: date | None, date_to: date | None):
+    """
+    Sessions of the student's courses inside [date_from, date_to],
+    joined to the student's record for each one.
+    Driven from enrollments so every course is a range scan on
+    (course_id, date) followed by a unique lookup on (session_id, student_id).
+    """
+    query = (
+        db.query(AttendanceSession, AttendanceRecord)
+        .join(Enrollment, Enrollment.course_id == AttendanceSession.course_id)
+        .join(
+            AttendanceRecord,
+            (AttendanceRecord.session_id == AttendanceSession.id) &
+            (AttendanceRecord.session_date == AttendanceSession.date) &
+            (AttendanceRecord.student_id == student.id)
+        )
+        .filter(Enrollment.student_id == student.id)
+    )
+
+    # bounds go on both partition keys so both tables get pruned
+    if date_from is not None:
+        query = query.filter(
+            AttendanceSession.date >= date_from,
+            AttendanceRecord.session_date >= date_from
+        )
+    if date_to is not None:
+        query = query.filter(
+            AttendanceSession.date <= date_to,
+            AttendanceRecord.session_date <= date_to
+        )
+
+    return query
+
+
 @router.get("/attendance")
 def get_total_attendance_percentage(
+    date_from: date | None = Query(None, alias="from"),
+    date_to: date | None = Query(None, alias="to"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_student)
 ):
@@ -160,20 +206,34 @@ def get_total_attendance_percentage(
         Student.user_id == current_user.id
     ).first()
 
-    total = (
-        db.query(AttendanceRecord)
-        .filter(AttendanceRecord.student_id == student.id)
-        .count()
-    )
-
-    present = (
-        db.query(AttendanceRecord)
-        .filter(
-            AttendanceRecord.student_id == student.id,
-            AttendanceRecord.present == True
+    if date_from is not None or date_to is not None:
+        if date_from and date_to and date_from > date_to:
+            raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+
+        total, present = (
+            attendance_in_range(db, student, date_from, date_to)
+            .with_entities(
+                func.count(AttendanceRecord.id),
+                func.coalesce(func.sum(case((AttendanceRecord.present == True, 1), else_=0)), 0)
+            )
+            .one()
         )
-        .count()
-    )
+
+        bitmap = attendance_bitmap.student_presence(db, student.id, date_from, date_to)
+        present += sum(1 for _, _, p in bitmap if p)
+        total += len(bitmap)
+
+        percentage = (present / total * 100) if total > 0 else 0
+
+        return {
+            "from": date_from,
+            "to": date_to,
+            "attended": present,
+            "total": total,
+            "attendance_percentage": round(percentage, 2)
+        }
+
+    present, total = attendance_totals(db, student)
 
     percentage = (present / total * 100) if total > 0 else 0
 
@@ -182,8 +242,66 @@ def get_total_attendance_percentage(
     }
 
 
+@router.get("/attendance/timeline", response_model=list[AttendanceWeek])
+def get_attendance_timeline(
+    date_from: date | None = Query(None, alias="from"),
+    date_to: date | None = Query(None, alias="to"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_student)
+):
+    """
+    Attendance per calendar week (weeks start on Monday)
+    """
+    student = db.query(Student).filter(
+        Student.user_id == current_user.id
+    ).first()
+
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+
+    week = func.date_trunc("week", AttendanceSession.date).label("week_start")
+
+    rows = (
+        attendance_in_range(db, student, date_from, date_to)
+        .with_entities(
+            week,
+            func.sum(case((AttendanceRecord.present == True, 1), else_=0)).label("attended"),
+            func.count(AttendanceRecord.id).label("total")
+        )
+        .group_by(week)
+        .order_by(week)
+        .all()
+    )
+
+    weeks: dict[date, list[int]] = {
+        r.week_start.date(): [r.attended, r.total] for r in rows
+    }
+
+    for _, day, present in attendance_bitmap.student_presence(db, student.id, date_from, date_to):
+        monday = date.fromordinal(day.toordinal() - day.weekday())
+        entry = weeks.setdefault(monday, [0, 0])
+        entry[0] += int(present)
+        entry[1] += 1
+
+    return plain_rows([
+        {
+            "week_start": week_start,
+            "attended": attended,
+            "total": total,
+            "percentage": round((attended / total) * 100) if total else 0
+        }
+        for week_start, (attended, total) in sorted(weeks.items())
+    ])
+
+
 from models import Assignment, AssignmentSubmission, Enrollment
 from schemas import AssignmentSubmissionCreate
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+from auth import get_current_student_profile
+from blobstore import receive_upload
+from batch import outside_transaction
+import submissions
 
 
 @router.get("/assignments/{course_id}")
@@ -206,22 +324,91 @@ def submit_assignment(
         Student.user_id == current_user.id
     ).first()
 
-    submission = AssignmentSubmission(
-        assignment_id=data.assignment_id,
-        student_id=student.id,
-        submission_text=data.submission_text,
-        submitted_at=data.submitted_at
+    # the text is stored as a blob, like an uploaded file
+    return submissions.submit_text(
+        db, data.assignment_id, student.id, data.submission_text, data.submitted_at
     )
 
-    db.add(submission)
-    db.commit()
-    db.refresh(submission)
 
-    return submission
+# streamed to the blob store: not batchable
+@router.post(
+    "/assignments/{assignment_id}/submission", status_code=201,
+    dependencies=[Depends(outside_transaction)]
+)
+async def upload_submission(
+    assignment_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    student: Student = Depends(get_current_student_profile)
+):
+    """
+    multipart/form-data with a "file" field, streamed to the blob store
+    """
+    student_id = student.id
+    await run_in_threadpool(submissions.check_can_submit, db, assignment_id, student_id)
+    # don't sit idle in a transaction on a pooled connection while the
+    # body streams in; saving checks out a connection again
+    await run_in_threadpool(db.close)
+    blob = await receive_upload(request)
+    return await run_in_threadpool(
+        submissions.save_submission, db, assignment_id, student_id, blob
+    )
+
+
+@router.get("/assignments/{assignment_id}/submission/body")
+def download_my_submission(
+    assignment_id: int,
+    db: Session = Depends(get_db),
+    student: Student = Depends(get_current_student_profile)
+):
+    submission = db.query(AssignmentSubmission).filter(
+        AssignmentSubmission.assignment_id == assignment_id,
+        AssignmentSubmission.student_id == student.id
+    ).first()
+    if not submission:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    db.close()      # the body streams without the connection
+    return submissions.body_response(submission)
 
 
 from models import Exam, ExamMark, FinalGrade
 
+from auth import get_token_claims
+import live_attendance
+
+# buffered in memory and flushed on its own: not batchable
+@router.post(
+    "/attendance/{session_id}/check-in", status_code=202,
+    dependencies=[Depends(outside_transaction)]
+)
+async def check_in(
+    session_id: int,
+    claims: dict = Depends(get_token_claims)
+):
+    """
+    Live roll-call, on the day of the session. Buffered: written to the
+    session within LIVE_FLUSH_SECONDS (see live_attendance.py).
+    """
+    return await live_attendance.student_check_in(session_id, claims)
+
+
+import upcoming
+
+@router.get("/upcoming")
+def get_upcoming(
+    limit: int = upcoming.UPCOMING_PAGE_SIZE,
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+    student: Student = Depends(get_current_student_profile)
+):
+    """
+    Unsubmitted assignment deadlines and exams across all enrolled
+    courses, soonest first from today. Pass next_cursor back as cursor
+    to page further ahead.
+    """
+    return plain_page(upcoming.upcoming_page(db, student.id, limit, cursor))
+
+
 @router.get("/exam-marks/{course_id}")
 def get_exam_marks(
     course_id: int,
@@ -274,6 +461,31 @@ def get_my_timetable(
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
+    return plain_rows(cached_timetable(db, student))
+
+
+def cached_timetable(db: Session, student: Student) -> list[dict]:
+    course_ids = [
+        course_id for (course_id,) in
+        db.query(Enrollment.course_id).filter(Enrollment.student_id == student.id)
+    ]
+    slots = [slot for course_id in course_ids for slot in cached_course_timetable(db, course_id)]
+    return sorted(slots, key=lambda slot: (slot["day_of_week"], slot["start_time"]))
+
+
+def cached_course_timetable(db: Session, course_id: int) -> list[dict]:
+    # the whole class asks at the start of the hour: one load per course
+    return timetable_cache.get_or_load(
+        course_id,
+        lambda: single_flight.do(
+            coalesce_key("courses.timetable", "public", course_id=course_id),
+            lambda: build_course_timetable(db, course_id)
+        ),
+        tags=[("courses", course_id)]
+    )
+
+
+def build_course_timetable(db: Session, course_id: int) -> list[dict]:
     rows = (
         db.query(
             Timetable.day_of_week,
@@ -284,11 +496,9 @@ def get_my_timetable(
             Faculty.name.label("faculty")
         )
         .join(Course, Course.id == Timetable.course_id)
-        .join(Enrollment, Enrollment.course_id == Course.id)
         .outerjoin(FacultyCourse, FacultyCourse.course_id == Course.id)
         .outerjoin(Faculty, Faculty.id == FacultyCourse.faculty_id)
-        .filter(Enrollment.student_id == student.id)
-        .order_by(Timetable.day_of_week, Timetable.start_time)
+        .filter(Timetable.course_id == course_id)
         .all()
     )
 
@@ -322,6 +532,10 @@ def get_my_attendance_summary(
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
+    return plain_rows(build_attendance_summary(db, student))
+
+
+def build_attendance_summary(db: Session, student: Student) -> list[dict]:
     rows = (
         db.query(
             Course.course_name.label("subject"),
@@ -334,20 +548,53 @@ def get_my_attendance_summary(
             func.count(AttendanceRecord.id).label("total")
         )
         .join(AttendanceSession, AttendanceSession.course_id == Course.id)
-        .join(AttendanceRecord, AttendanceRecord.session_id == AttendanceSession.id)
+        .join(
+            AttendanceRecord,
+            (AttendanceRecord.session_id == AttendanceSession.id) &
+            (AttendanceRecord.session_date == AttendanceSession.date)
+        )
         .filter(AttendanceRecord.student_id == student.id)
         .group_by(Course.course_name)
         .all()
     )
 
+    archived = (
+        db.query(
+            Course.course_name.label("subject"),
+            func.sum(AttendanceTermSummary.attended).label("attended"),
+            func.sum(AttendanceTermSummary.total).label("total")
+        )
+        .join(AttendanceTermSummary, AttendanceTermSummary.course_id == Course.id)
+        .filter(AttendanceTermSummary.student_id == student.id)
+        .group_by(Course.course_name)
+        .all()
+    )
+
+    totals: dict[str, list[int]] = {}
+    for r in list(rows) + list(archived):
+        entry = totals.setdefault(r.subject, [0, 0])
+        entry[0] += r.attended or 0
+        entry[1] += r.total or 0
+
+    bitmap = attendance_bitmap.student_presence(db, student.id)
+    if bitmap:
+        names = dict(
+            db.query(Course.id, Course.course_name)
+            .filter(Course.id.in_({course_id for course_id, _, _ in bitmap}))
+        )
+        for course_id, _, present in bitmap:
+            entry = totals.setdefault(names[course_id], [0, 0])
+            entry[0] += int(present)
+            entry[1] += 1
+
     return [
         {
-            "subject": r.subject,
-            "attended": r.attended,
-            "total": r.total,
-            "percentage": round((r.attended / r.total) * 100) if r.total else 0
+            "subject": subject,
+            "attended": attended,
+            "total": total,
+            "percentage": round((attended / total) * 100) if total else 0
         }
-        for r in rows
+        for subject, (attended, total) in totals.items()
     ]
 
 
@@ -378,6 +625,10 @@ def get_my_results(
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
+    return build_results(db, student)
+
+
+def build_results(db: Session, student: Student) -> list[dict]:
     rows = (
         db.query(
             Course.course_name.label("subject"),
@@ -428,9 +679,13 @@ def get_student_settings(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_student)
 ):
+    return build_settings(current_user)
+
+
+def build_settings(user: User) -> dict:
     return {
-        "username": current_user.email.split("@")[0],
-        "email": current_user.email
+        "username": user.email.split("@")[0],
+        "email": user.email
     }
 
 
@@ -452,6 +707,27 @@ def update_student_settings(
     return {"message": "Settings updated successfully"}
 
 
+# =====================================================
+# BOOTSTRAP (EVERYTHING THE DASHBOARD NEEDS ON LOAD)
+# =====================================================
+from auth import get_current_student_profile
+from routers.course import course_to_dict
 
-
-
+@router.get("/bootstrap")
+def student_bootstrap(
+    db: Session = Depends(get_db),
+    student: Student = Depends(get_current_student_profile)
+):
+    """
+    One round-trip for the initial dashboard render.
+    The student is resolved once and reused by every section.
+    """
+    return {
+        "profile": build_profile(student),
+        "dashboard": build_dashboard(db, student),
+        "courses": [course_to_dict(c) for c in build_courses(db, student)],
+        "timetable": cached_timetable(db, student),
+        "attendance_summary": build_attendance_summary(db, student),
+        "results": build_results(db, student),
+        "settings": build_settings(student.user)
+    }
@@ -72,7 +72,7 @@ class StudentDashboard(BaseModel):
     courses: int
     attendance_percentage: int
     pending_assignments: int
-    days_to_exam: int
+    days_to_exam: int | None        # None: no exam scheduled
 
 
 # =====================================================
@@ -149,6 +149,7 @@ class CourseBase(BaseModel):
     credits: int
     semester: int
     department_id: int
+    capacity: int | None = None     # None = unlimited
 
 class CourseCreate(CourseBase):
     pass
@@ -164,6 +165,38 @@ class EnrollmentCreate(BaseModel):
     student_id: int
     course_id: int
 
+class BulkEnrollment(BaseModel):
+    # either a cohort (every student of the department into the
+    # department's courses for the semester) or explicit pairs
+    department_id: int | None = None
+    semester: int | None = None
+    pairs: list[EnrollmentCreate] | None = None
+
+class BulkEnrollmentResult(BaseModel):
+    requested: int
+    enrolled: int
+    already_enrolled: int
+    invalid: int                    # unknown student or course ids
+    courses: int
+
+
+# =====================================================
+# REGISTRATION SCHEMAS
+# =====================================================
+
+class RegistrationResult(BaseModel):
+    course_id: int
+    status: str                     # "enrolled" | "waitlisted"
+    position: int | None = None     # place on the waitlist, 1 = next
+
+class RegistrationCourse(CourseResponse):
+    seats_taken: int
+    seats_left: int | None          # None = unlimited
+    waitlisted: int
+
+class CapacityUpdate(BaseModel):
+    capacity: int | None = None
+
 
 # =====================================================
 # FACULTY COURSE SCHEMAS
@@ -178,9 +211,11 @@ class FacultyCourseCreate(BaseModel):
 # ATTENDANCE SCHEMAS
 # =====================================================
 
+from datetime import date, datetime
+
 class AttendanceSessionCreate(BaseModel):
     course_id: int
-    date: str  # YYYY-MM-DD
+    date: date  # YYYY-MM-DD
 
 
 class AttendanceRecordCreate(BaseModel):
@@ -194,6 +229,12 @@ class AttendanceSummary(BaseModel):
     total: int
     percentage: int
 
+class AttendanceWeek(BaseModel):
+    week_start: date
+    attended: int
+    total: int
+    percentage: int
+
 
 # =====================================================
 # ASSIGNMENT SCHEMAS
@@ -203,15 +244,24 @@ class AssignmentCreate(BaseModel):
     course_id: int
     title: str
     description: str | None = None
-    due_date: str  # YYYY-MM-DD
+    due_date: date  # YYYY-MM-DD
 
 class AssignmentSubmissionCreate(BaseModel):
     assignment_id: int
     submission_text: str
-    submitted_at: str
+    submitted_at: datetime
 
 class AssignmentGradeUpdate(BaseModel):
     marks: int
+    version: int                    # as read; a stale one is a conflict
+
+class SubmissionGrade(BaseModel):
+    submission_id: int
+    marks: int
+    version: int                    # as listed; a stale one is a conflict
+
+class GradeSheet(BaseModel):
+    grades: list[SubmissionGrade]
 
 
 
@@ -223,7 +273,7 @@ class ExamCreate(BaseModel):
     course_id: int
     name: str
     max_marks: int
-    exam_date: str
+    exam_date: date
 
 class ExamMarkCreate(BaseModel):
     exam_id: int
@@ -287,3 +337,47 @@ from pydantic import BaseModel, EmailStr
 
 class FacultyUserCreate(BaseModel):
     email: EmailStr
+
+
+# =====================================================
+# BACKGROUND JOB SCHEMAS
+# =====================================================
+
+class JobCreate(BaseModel):
+    kind: str
+    params: dict = {}
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    done: int
+    total: int | None
+    checkpoint: dict                # running counts; the result once done
+    error: str | None
+    cancel_requested: bool
+    attempts: int
+    created_at: datetime
+    started_at: datetime | None
+    finished_at: datetime | None
+
+class StudentProvisioning(BaseModel):
+    students: list[AdminStudentCreate]
+
+class SubmissionBodyMove(BaseModel):
+    assignment_id: int | None = None    # None: every assignment
+
+
+# =====================================================
+# BATCH SCHEMAS
+# =====================================================
+from typing import Any, Literal
+
+class BatchOperation(BaseModel):
+    method: str
+    path: str                       # may carry a query string
+    body: Any = None                # sent as the JSON body
+
+class BatchRequest(BaseModel):
+    mode: Literal["atomic", "best_effort"] = "atomic"
+    requests: list[BatchOperation]
@@ -0,0 +1,217 @@
+# search.py
+
+import base64
+import binascii
+import logging
+import os
+
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import func, select, text, tuple_, union
+from sqlalchemy.orm import Session
+
+from models import Department, Faculty, Student, User
+
+logger = logging.getLogger("cms.search")
+
+# =====================================================
+# ADMIN TABLE SEARCH
+# =====================================================
+'''Search, filter, sort and keyset pagination for the admin student and
+faculty tables, so the browser only ever holds one page.
+
+q matches name, code (reg_no / employee_id) and email, case-insensitively:
+  - shorter than TRIGRAM_MIN_LENGTH: prefix match on lower(column),
+    served by the text_pattern_ops indexes declared in models.py
+  - otherwise: substring match (ILIKE '%q%'), served by pg_trgm GIN
+    indexes (TRIGRAM_INDEXES; created by migration a91c3e7b52d4 and, when
+    the extension is available, by ensure_search_indexes() on startup)
+
+Each column is matched in its own subquery and the ids are unioned, so
+every branch can use its index instead of one OR across the join. The
+page is picked from (id, sort key) pairs first; users and departments are
+joined for the returned rows only, not for every match.
+
+Pages are keyset-paginated on (sort column, id): next_cursor is an opaque
+token holding the last row's key, and the next page starts strictly after
+it. Unlike OFFSET, page 500 costs the same as page 1, and rows inserted
+meanwhile don't shift pages.'''
+
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "50"))
+SEARCH_MAX_PAGE_SIZE = 200
+TRIGRAM_MIN_LENGTH = 3          # pg_trgm can't narrow down shorter strings
+
+TRIGRAM_INDEXES = {
+    "ix_students_name_trgm": ("students", "name"),
+    "ix_students_reg_no_trgm": ("students", "reg_no"),
+    "ix_faculty_name_trgm": ("faculty", "name"),
+    "ix_faculty_employee_id_trgm": ("faculty", "employee_id"),
+    "ix_users_email_trgm": ("users", "email"),
+}
+
+
+def ensure_search_indexes(db: Session) -> bool:
+    """
+    Best effort: without pg_trgm, substring search still works, just unindexed
+    """
+    try:
+        db.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for name, (table, column) in TRIGRAM_INDEXES.items():
+            db.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)"
+            ))
+        db.commit()
+        return True
+    except Exception:
+        db.rollback()
+        logger.warning("pg_trgm unavailable; substring search runs without trigram indexes")
+        return False
+
+
+# =====================================================
+# CURSORS
+# =====================================================
+
+def encode_cursor(key: list) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps(key)).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int = 2) -> list:
+    try:
+        key = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(key, list) or len(key) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+
+def like_escape(q: str) -> str:
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# =====================================================
+# SEARCH
+# =====================================================
+
+class PeopleSearch:
+    def __init__(self, model, code_field: str):
+        self.model = model
+        self.code_field = code_field
+        self.code = getattr(model, code_field)
+        self.sorts = {
+            "name": model.name,
+            code_field: self.code,
+            "email": User.email,
+            "id": model.id,
+        }
+
+    def keys(self, sort: str, department_id: int | None):
+        """
+        (id, sort_key) of every listable row: linked to a user and a department
+        """
+        M = self.model
+        stmt = select(M.id.label("id"), self.sorts[sort].label("sort_key"))
+        if sort == "email":
+            stmt = stmt.join(User, User.id == M.user_id)
+        else:
+            stmt = stmt.where(M.user_id.is_not(None))
+        stmt = stmt.where(M.department_id.is_not(None))
+        if department_id is not None:
+            stmt = stmt.where(M.department_id == department_id)
+        return stmt
+
+    def matching(self, keys, sort: str, q: str):
+        M = self.model
+        if len(q) < TRIGRAM_MIN_LENGTH:
+            pattern = like_escape(q.lower()) + "%"
+            match = lambda col: func.lower(col).like(pattern, escape="\\")
+        else:
+            pattern = "%" + like_escape(q) + "%"
+            match = lambda col: col.ilike(pattern, escape="\\")
+
+        by_email = keys.where(match(User.email))
+        if sort != "email":     # keys() already joined users otherwise
+            by_email = by_email.join(User, User.id == M.user_id)
+
+        return union(
+            keys.where(match(M.name)),
+            keys.where(match(self.code)),
+            by_email,
+        ).subquery()
+
+    def run(
+        self,
+        db: Session,
+        q: str | None = None,
+        department_id: int | None = None,
+        sort: str = "name",
+        order: str = "asc",
+        limit: int = SEARCH_PAGE_SIZE,
+        cursor: str | None = None,
+    ) -> dict:
+        if sort not in self.sorts:
+            raise HTTPException(
+                status_code=400,
+                detail=f"sort must be one of: {', '.join(self.sorts)}"
+            )
+        if order not in ("asc", "desc"):
+            raise HTTPException(status_code=400, detail="order must be asc or desc")
+
+        M = self.model
+        limit = max(1, min(limit, SEARCH_MAX_PAGE_SIZE))
+
+        # 1. pick the page's ids from the indexes alone ...
+        keys = self.keys(sort, department_id)
+        q = (q or "").strip()
+        candidates = self.matching(keys, sort, q) if q else keys.subquery()
+
+        page = select(candidates.c.id, candidates.c.sort_key)
+        if cursor:
+            key = tuple_(candidates.c.sort_key, candidates.c.id)
+            after = tuple_(*decode_cursor(cursor))
+            page = page.where(key > after if order == "asc" else key < after)
+        if order == "asc":
+            page = page.order_by(candidates.c.sort_key.asc(), candidates.c.id.asc())
+        else:
+            page = page.order_by(candidates.c.sort_key.desc(), candidates.c.id.desc())
+        page = page.limit(limit + 1).subquery()
+
+        # 2. ... then join users and departments for those rows only
+        stmt = (
+            select(
+                M.id,
+                M.name,
+                self.code.label(self.code_field),
+                User.email,
+                M.department_id,
+                Department.name.label("department_name"),
+                page.c.sort_key,
+            )
+            .join(page, page.c.id == M.id)
+            .join(User, User.id == M.user_id)
+            .join(Department, Department.id == M.department_id)
+        )
+        if order == "asc":
+            stmt = stmt.order_by(page.c.sort_key.asc(), page.c.id.asc())
+        else:
+            stmt = stmt.order_by(page.c.sort_key.desc(), page.c.id.desc())
+
+        rows = db.execute(stmt).mappings().all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1]["sort_key"], rows[-1]["id"]])
+
+        return {
+            "items": [
+                {k: v for k, v in row.items() if k != "sort_key"}
+                for row in rows
+            ],
+            "next_cursor": next_cursor,
+        }
+
+
+student_search = PeopleSearch(Student, "reg_no")
+faculty_search = PeopleSearch(Faculty, "employee_id")
@@ -0,0 +1,493 @@
+# seats.py
+
+import os
+from datetime import datetime
+from typing import NamedTuple
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from invalidation import mark_changed
+
+# =====================================================
+# CONFIG
+# =====================================================
+'''Seat allocation for course registration.
+
+Courses have an optional capacity; courses.seats_taken counts their
+enrollments and is only ever changed in the same transaction as the
+enrollment itself.
+
+Taking a seat is one statement: a conditional UPDATE of seats_taken
+(capacity not reached) chained to the enrollment INSERT. Concurrent
+registrations for the same course queue on that row lock for no longer
+than one statement and a commit, and a seat can't be sold twice: the
+condition is rechecked against the latest row once the lock is granted.
+
+Everything else runs under a per-course advisory lock (lock_course):
+joining the waitlist takes it shared; dropping, admin enrollment and
+capacity changes take it exclusive (bulk enrollment takes it on every
+course it touches, in id order). The waitlist is FIFO by id. Seats
+freed by a drop or a capacity increase go to the head of the waitlist
+before the transaction commits, and the hot path is blocked on the
+course row until then, so a newcomer can't jump the queue. Positions
+reported on joining count the entries committed at that moment; under
+concurrent joins they are approximate, the queue order is not.
+
+Registration is open between REGISTRATION_OPENS_AT and
+REGISTRATION_CLOSES_AT (ISO datetimes, server local time; either may be
+unset). Values with a UTC offset are converted to server local time;
+both are parsed at import, so a malformed one fails startup. Admin
+enrollment, single or bulk, ignores the window and the capacity.
+
+Only enrollment changes are published to invalidation.py (timetables
+depend on them); nothing caches the waitlist.'''
+
+
+def _local_datetime(name: str) -> datetime | None:
+    value = os.getenv(name)
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        # compared with the naive datetime.now()
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+REGISTRATION_OPENS_AT = _local_datetime("REGISTRATION_OPENS_AT")
+REGISTRATION_CLOSES_AT = _local_datetime("REGISTRATION_CLOSES_AT")
+
+# first key of the two-key advisory locks, so course ids don't collide
+# with other users of pg_advisory_xact_lock
+ADVISORY_NAMESPACE = 0x5EA7
+
+# explicit pairs accepted by one bulk enrollment request
+BULK_ENROLL_MAX_PAIRS = int(os.getenv("BULK_ENROLL_MAX_PAIRS", "50000"))
+
+
+class SeatResult(NamedTuple):
+    status: str                     # "enrolled" | "waitlisted"
+    position: int | None = None     # 1 = next in line
+
+
+def registration_open(now: datetime | None = None) -> bool:
+    now = now or datetime.now()
+    if REGISTRATION_OPENS_AT and now < REGISTRATION_OPENS_AT:
+        return False
+    if REGISTRATION_CLOSES_AT and now >= REGISTRATION_CLOSES_AT:
+        return False
+    return True
+
+
+# =====================================================
+# STATEMENTS
+# =====================================================
+
+TAKE_SEAT = text("""
+    WITH seat AS (
+        UPDATE courses SET seats_taken = seats_taken + 1
+        WHERE id = :course_id AND (capacity IS NULL OR seats_taken < capacity)
+        RETURNING id
+    ), enrolled AS (
+        INSERT INTO enrollments (student_id, course_id)
+        SELECT :student_id, id FROM seat
+        ON CONFLICT ON CONSTRAINT uq_student_course DO NOTHING
+        RETURNING id
+    )
+    SELECT EXISTS (SELECT 1 FROM seat) AS seated, (SELECT id FROM enrolled) AS enrollment_id
+""")
+
+POP_WAITLIST = text("""
+    DELETE FROM waitlist_entries
+    WHERE id = (
+        SELECT id FROM waitlist_entries
+        WHERE course_id = :course_id
+        ORDER BY id
+        LIMIT 1
+    )
+    RETURNING student_id
+""")
+
+WAITLIST_POSITION = text("""
+    SELECT count(*) FROM waitlist_entries
+    WHERE course_id = :course_id
+      AND id <= (SELECT id FROM waitlist_entries WHERE course_id = :course_id AND student_id = :student_id)
+""")
+
+
+def lock_course(db: Session, course_id: int, shared: bool = False):
+    """
+    Transaction-scoped. Waitlist joins take it shared, so they only
+    queue behind drops and capacity changes, not behind each other.
+    """
+    lock = "pg_advisory_xact_lock_shared" if shared else "pg_advisory_xact_lock"
+    db.execute(
+        text(f"SELECT {lock}(:ns, :course_id)"),
+        {"ns": ADVISORY_NAMESPACE, "course_id": course_id}
+    )
+
+
+def _enrolled(db: Session, student_id: int, course_id: int) -> bool:
+    return db.execute(
+        text("SELECT 1 FROM enrollments WHERE student_id = :student_id AND course_id = :course_id"),
+        {"student_id": student_id, "course_id": course_id}
+    ).first() is not None
+
+
+def _position(db: Session, student_id: int, course_id: int) -> int | None:
+    position = db.execute(
+        WAITLIST_POSITION, {"student_id": student_id, "course_id": course_id}
+    ).scalar()
+    return position or None
+
+
+# =====================================================
+# REGISTRATION
+# =====================================================
+
+def register(db: Session, student_id: int, course_id: int) -> SeatResult:
+    """
+    Enroll if a seat is free, otherwise join the waitlist.
+    Idempotent: registering again reports the current state.
+    """
+    params = {"student_id": student_id, "course_id": course_id}
+
+    full = db.execute(
+        text("SELECT capacity IS NOT NULL AND seats_taken >= capacity FROM courses WHERE id = :course_id"),
+        params
+    ).first()
+    if full is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Course not found")
+
+    # fast path: no advisory lock, just the conditional UPDATE.
+    # Skipped once the course is full so the overflow doesn't queue on its row.
+    if not full[0]:
+        row = db.execute(TAKE_SEAT, params).one()
+        if row.enrollment_id is not None:
+            mark_changed(db, "enrollments", row.enrollment_id)
+            db.commit()
+            return SeatResult("enrolled")
+        if row.seated:
+            # already enrolled: give the seat back
+            db.rollback()
+            return SeatResult("enrolled")
+
+    # course full: join the waitlist. A seat can only be freed under the
+    # exclusive lock, so while we hold the shared one, "full" stays true
+    # unless we see the seat here.
+    lock_course(db, course_id, shared=True)
+
+    if _enrolled(db, student_id, course_id):
+        db.rollback()
+        return SeatResult("enrolled")
+
+    row = db.execute(TAKE_SEAT, params).one()
+    if row.enrollment_id is not None:
+        mark_changed(db, "enrollments", row.enrollment_id)
+        db.commit()
+        return SeatResult("enrolled")
+    if row.seated:
+        db.rollback()
+        return SeatResult("enrolled")
+
+    db.execute(
+        text("""
+            INSERT INTO waitlist_entries (course_id, student_id)
+            VALUES (:course_id, :student_id)
+            ON CONFLICT ON CONSTRAINT uq_waitlist_course_student DO NOTHING
+        """),
+        params
+    )
+    position = _position(db, student_id, course_id)
+    db.commit()
+    return SeatResult("waitlisted", position)
+
+
+def fill_from_waitlist(db: Session, course_id: int) -> list[int]:
+    """
+    Move students from the head of the waitlist into free seats.
+    Caller holds lock_course and commits.
+    """
+    promoted = []
+    while True:
+        free = db.execute(
+            text("""
+                SELECT capacity IS NULL OR seats_taken < capacity
+                FROM courses WHERE id = :course_id
+                FOR UPDATE
+            """),
+            {"course_id": course_id}
+        ).scalar()
+        if not free:
+            break
+
+        student_id = db.execute(POP_WAITLIST, {"course_id": course_id}).scalar()
+        if student_id is None:
+            break
+
+        row = db.execute(TAKE_SEAT, {"student_id": student_id, "course_id": course_id}).one()
+        if row.enrollment_id is not None:
+            mark_changed(db, "enrollments", row.enrollment_id)
+            promoted.append(student_id)
+        elif row.seated:
+            # was enrolled meanwhile (admin): undo the increment, try the next one
+            db.execute(
+                text("UPDATE courses SET seats_taken = seats_taken - 1 WHERE id = :course_id"),
+                {"course_id": course_id}
+            )
+
+    return promoted
+
+
+def drop(db: Session, student_id: int, course_id: int) -> list[int]:
+    """
+    Leave the course or its waitlist. A freed seat goes to the head of
+    the waitlist in the same transaction. Returns the promoted student ids.
+    """
+    params = {"student_id": student_id, "course_id": course_id}
+    lock_course(db, course_id)
+
+    enrollment_id = db.execute(
+        text("""
+            DELETE FROM enrollments
+            WHERE student_id = :student_id AND course_id = :course_id
+            RETURNING id
+        """),
+        params
+    ).scalar()
+
+    if enrollment_id is None:
+        left = db.execute(
+            text("""
+                DELETE FROM waitlist_entries
+                WHERE student_id = :student_id AND course_id = :course_id
+                RETURNING id
+            """),
+            params
+        ).scalar()
+        if left is None:
+            db.rollback()
+            raise HTTPException(status_code=404, detail="Enrollment not found")
+        db.commit()
+        return []
+
+    mark_changed(db, "enrollments", enrollment_id)
+    db.execute(
+        text("UPDATE courses SET seats_taken = seats_taken - 1 WHERE id = :course_id"),
+        params
+    )
+    promoted = fill_from_waitlist(db, course_id)
+    db.commit()
+    return promoted
+
+
+def admin_enroll(db: Session, student_id: int, course_id: int) -> int | None:
+    """
+    Enroll regardless of capacity and window (and take the student off
+    the waitlist). Returns the enrollment id, None if already enrolled.
+    """
+    params = {"student_id": student_id, "course_id": course_id}
+    lock_course(db, course_id)
+
+    enrollment_id = db.execute(
+        text("""
+            INSERT INTO enrollments (student_id, course_id)
+            VALUES (:student_id, :course_id)
+            ON CONFLICT ON CONSTRAINT uq_student_course DO NOTHING
+            RETURNING id
+        """),
+        params
+    ).scalar()
+    if enrollment_id is None:
+        db.rollback()
+        return None
+
+    db.execute(
+        text("UPDATE courses SET seats_taken = seats_taken + 1 WHERE id = :course_id"),
+        params
+    )
+    db.execute(
+        text("DELETE FROM waitlist_entries WHERE student_id = :student_id AND course_id = :course_id"),
+        params
+    )
+    mark_changed(db, "enrollments", enrollment_id)
+    db.commit()
+    return enrollment_id
+
+
+def set_capacity(db: Session, course_id: int, capacity: int | None) -> list[int]:
+    """
+    Change a course's capacity; new seats go to the waitlist.
+    Lowering it below seats_taken keeps existing enrollments.
+    """
+    lock_course(db, course_id)
+    updated = db.execute(
+        text("UPDATE courses SET capacity = :capacity WHERE id = :course_id RETURNING id"),
+        {"capacity": capacity, "course_id": course_id}
+    ).scalar()
+    if updated is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Course not found")
+
+    mark_changed(db, "courses", course_id)
+    promoted = fill_from_waitlist(db, course_id)
+    db.commit()
+    return promoted
+
+
+# =====================================================
+# BULK ENROLLMENT (ADMIN)
+# =====================================================
+
+# one statement per course: the set difference against existing
+# enrollments, the insert, seats_taken and the waitlist cleanup
+BULK_ENROLL = """
+    WITH wanted AS (
+        {wanted}
+    ), added AS (
+        INSERT INTO enrollments (student_id, course_id)
+        SELECT w.student_id, :course_id FROM wanted w
+        WHERE NOT EXISTS (
+            SELECT 1 FROM enrollments e
+            WHERE e.student_id = w.student_id AND e.course_id = :course_id
+        )
+        ON CONFLICT ON CONSTRAINT uq_student_course DO NOTHING
+        RETURNING student_id
+    ), seat AS (
+        UPDATE courses SET seats_taken = seats_taken + (SELECT count(*) FROM added)
+        WHERE id = :course_id
+    ), unlisted AS (
+        DELETE FROM waitlist_entries
+        WHERE course_id = :course_id AND student_id IN (SELECT student_id FROM added)
+    )
+    SELECT (SELECT count(*) FROM wanted) AS valid, (SELECT count(*) FROM added) AS added
+"""
+
+ENROLL_LISTED = text(BULK_ENROLL.format(wanted="""
+        SELECT DISTINCT s.id AS student_id
+        FROM unnest(CAST(:student_ids AS integer[])) AS w(student_id)
+        JOIN students s ON s.id = w.student_id
+"""))
+
+ENROLL_DEPARTMENT = text(BULK_ENROLL.format(wanted="""
+        SELECT id AS student_id FROM students WHERE department_id = :department_id
+"""))
+
+
+def check_bulk_enroll(data) -> None:
+    """
+    data: schemas.BulkEnrollment. Either a cohort or pairs, not both.
+    """
+    cohort = data.department_id is not None and data.semester is not None
+    if cohort == (data.pairs is not None):
+        raise HTTPException(
+            status_code=400,
+            detail="Give either department_id and semester, or pairs"
+        )
+    if data.pairs is not None and len(data.pairs) > BULK_ENROLL_MAX_PAIRS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BULK_ENROLL_MAX_PAIRS} pairs per request"
+        )
+
+
+class BulkPlan(NamedTuple):
+    course_ids: list[int]               # existing courses, in lock order
+    by_course: dict[int, list[int]] | None  # explicit pairs; None = cohort
+    requested: int
+
+
+def plan_bulk_enroll(
+    db: Session,
+    department_id: int | None = None,
+    semester: int | None = None,
+    pairs: list[tuple[int, int]] | None = None,
+) -> BulkPlan:
+    """
+    The courses a bulk enrollment touches, in the order to process them
+    """
+    if pairs is not None:
+        pairs = set(pairs)
+        by_course: dict[int, list[int]] = {}
+        for student_id, course_id in pairs:
+            by_course.setdefault(course_id, []).append(student_id)
+        course_ids = db.execute(
+            text("SELECT id FROM courses WHERE id = ANY(:ids) ORDER BY id"),
+            {"ids": list(by_course)}
+        ).scalars().all()
+        return BulkPlan(course_ids, by_course, len(pairs))
+
+    course_ids = db.execute(
+        text("""
+            SELECT id FROM courses
+            WHERE department_id = :department_id AND semester = :semester
+            ORDER BY id
+        """),
+        {"department_id": department_id, "semester": semester}
+    ).scalars().all()
+    students = db.execute(
+        text("SELECT count(*) FROM students WHERE department_id = :department_id"),
+        {"department_id": department_id}
+    ).scalar()
+    return BulkPlan(course_ids, None, students * len(course_ids))
+
+
+def enroll_course_chunk(
+    db: Session,
+    plan: BulkPlan,
+    course_id: int,
+    department_id: int | None = None,
+) -> tuple[int, int]:
+    """
+    One course of a bulk enrollment, under its exclusive lock.
+    Returns (valid pairs, enrollments added). Caller commits.
+    """
+    lock_course(db, course_id)
+    if plan.by_course is not None:
+        row = db.execute(
+            ENROLL_LISTED, {"course_id": course_id, "student_ids": plan.by_course[course_id]}
+        ).one()
+    else:
+        row = db.execute(
+            ENROLL_DEPARTMENT, {"course_id": course_id, "department_id": department_id}
+        ).one()
+    if row.added:
+        mark_changed(db, "enrollments")     # table-wide: too many rows to list
+    return row.valid, row.added
+
+
+def bulk_enroll(
+    db: Session,
+    department_id: int | None = None,
+    semester: int | None = None,
+    pairs: list[tuple[int, int]] | None = None,
+) -> dict:
+    """
+    Enroll every student of a department into its courses for a semester,
+    or an explicit list of (student_id, course_id) pairs. One transaction;
+    pairs already enrolled and unknown ids are counted, not errors.
+    (jobs.py runs the same chunks one transaction per course.)
+    """
+    plan = plan_bulk_enroll(db, department_id, semester, pairs)
+
+    valid = added = 0
+    for course_id in plan.course_ids:
+        v, a = enroll_course_chunk(db, plan, course_id, department_id)
+        valid += v
+        added += a
+    db.commit()
+
+    return bulk_result(plan, valid, added)
+
+
+def bulk_result(plan: BulkPlan, valid: int, added: int) -> dict:
+    return {
+        "requested": plan.requested,
+        "enrolled": added,
+        "already_enrolled": valid - added,
+        "invalid": plan.requested - valid,
+        "courses": len(plan.course_ids),
+    }
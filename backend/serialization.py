@@ -0,0 +1,58 @@
+# serialization.py
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+from schemas import CourseResponse
+
+# =====================================================
+# FAST JSON FOR HOT LIST RESPONSES
+# =====================================================
+'''When a route returns data, FastAPI validates it against response_model
+(or walks it with jsonable_encoder when there is none) before rendering.
+For lists of hundreds of rows that's most of the request's CPU.
+
+Returning a Response skips both steps (response_model still documents the
+route):
+  - plain_rows(): dicts we built ourselves in the schema's shape, so
+                  nothing to re-validate; orjson encodes them as is
+                  (dates and times included). Validating them first
+                  would be the cost this module exists to avoid, so the
+                  builder is what keeps them in shape.
+  - ListSerializer.orm(): ORM objects, read through a pre-built
+                  TypeAdapter with from_attributes, all inside
+                  pydantic-core; only the schema's fields are written.
+
+plain_page() is plain_rows() for a keyset page
+({"items": [...], "next_cursor": ...}).
+
+The app keeps FastAPI's default response class on purpose: a custom
+default_response_class turns off FastAPI's own Pydantic dump_json path
+for every other response_model route.'''
+
+
+def json_bytes(content: bytes) -> Response:
+    return Response(content, media_type="application/json")
+
+
+class ListSerializer:
+    def __init__(self, model: type[BaseModel]):
+        self.model = model
+        self.adapter = TypeAdapter(list[model])
+
+    def orm(self, objects) -> Response:
+        return json_bytes(
+            self.adapter.dump_json(self.adapter.validate_python(objects, from_attributes=True))
+        )
+
+
+def plain_rows(rows: list[dict]) -> Response:
+    return json_bytes(orjson.dumps(rows))
+
+
+def plain_page(page: dict) -> Response:
+    return json_bytes(orjson.dumps(page))
+
+
+course_list = ListSerializer(CourseResponse)
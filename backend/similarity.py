@@ -0,0 +1,296 @@
+# similarity.py
+
+import hashlib
+import os
+import random
+import re
+import struct
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from blobstore import StoredBlob, blob_store
+
+try:
+    import numpy as np
+except ImportError:     # numpy only speeds up signing long submissions
+    np = None
+
+# =====================================================
+# CONFIG
+# =====================================================
+'''Near-duplicate detection for assignment submissions (MinHash + LSH).
+
+A submission is reduced to its set of SHINGLE_WORDS-word shingles
+(lowercased, punctuation dropped) and signed with NUM_PERM MinHash
+values: the fraction of positions where two signatures agree estimates
+the Jaccard similarity of the two shingle sets.
+
+The signature is cut into LSH_BANDS bands of LSH_ROWS values; each band
+hashes to a bucket row in submission_lsh_buckets. Two submissions become
+a candidate pair when they share a bucket in any band, which happens
+with probability 1 - (1 - s^LSH_ROWS)^LSH_BANDS for similarity s: about
+0.87 at s = 0.5, 0.99 at 0.6 and 0.05 at 0.2 with the defaults. Only
+candidates are compared, so finding the pairs of an assignment costs
+about one index lookup per bucket instead of n^2 / 2 comparisons.
+
+Submissions are signed when they are submitted (index_submission).
+Rows that predate this, or were bulk-loaded, are signed the first time
+their assignment is checked (similar_pairs). Bodies are read from the
+blob store when they are text and at most SIMILARITY_MAX_BYTES; anything
+else is signed as empty and never matches.
+
+Changing SHINGLE_WORDS, NUM_PERM, the bands or PERMUTATION_SEED
+invalidates stored signatures: delete submission_signatures and
+submission_lsh_buckets and they are rebuilt on demand.'''
+
+SHINGLE_WORDS = int(os.getenv("SHINGLE_WORDS", "5"))
+LSH_BANDS = 32
+LSH_ROWS = 4
+NUM_PERM = LSH_BANDS * LSH_ROWS
+PERMUTATION_SEED = 0x5151
+
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.6"))
+SIMILARITY_MAX_BYTES = 1024 * 1024
+
+# first key of the two-key advisory lock that serializes backfills of an
+# assignment (see seats.ADVISORY_NAMESPACE)
+ADVISORY_NAMESPACE = 0x51A1
+
+# h(x) = (a * x + b) mod MERSENNE_PRIME over 32-bit shingle hashes.
+# a < 2^31 keeps a * x + b below 2^64, so numpy's uint64 can't overflow.
+MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(PERMUTATION_SEED)
+PERM_A = [_rng.randrange(1, 1 << 31) for _ in range(NUM_PERM)]
+PERM_B = [_rng.randrange(0, 1 << 32) for _ in range(NUM_PERM)]
+EMPTY = MERSENNE_PRIME      # signature value of a position no shingle hit
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+# =====================================================
+# SIGNATURES
+# =====================================================
+
+def shingles(text_: str | None) -> set[int]:
+    """
+    32-bit hashes of the text's word shingles; texts shorter than a
+    shingle are one shingle
+    """
+    words = _WORD.findall((text_ or "").lower())
+    if not words:
+        return set()
+    width = min(SHINGLE_WORDS, len(words))
+    return {
+        int.from_bytes(
+            hashlib.blake2b(" ".join(words[i:i + width]).encode(), digest_size=4).digest(),
+            "little"
+        )
+        for i in range(len(words) - width + 1)
+    }
+
+
+def body_text(blob: StoredBlob) -> str | None:
+    """
+    A stored body as text, None for non-text or huge bodies
+    """
+    if not blob.content_type.startswith("text/") or blob.size > SIMILARITY_MAX_BYTES:
+        return None
+    return blob_store.read(blob.sha256).decode("utf-8", "replace")
+
+
+def signature(hashes: set[int]) -> list[int]:
+    if not hashes:
+        return [EMPTY] * NUM_PERM
+
+    if np is not None:
+        x = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+        a = np.array(PERM_A, dtype=np.uint64)[:, None]
+        b = np.array(PERM_B, dtype=np.uint64)[:, None]
+        return ((a * x + b) % np.uint64(MERSENNE_PRIME)).min(axis=1).tolist()
+
+    return [
+        min((a * x + b) % MERSENNE_PRIME for x in hashes)
+        for a, b in zip(PERM_A, PERM_B)
+    ]
+
+
+def pack(sig: list[int]) -> bytes:
+    return struct.pack(f"<{NUM_PERM}Q", *sig)
+
+
+def unpack(data: bytes) -> tuple[int, ...]:
+    return struct.unpack(f"<{NUM_PERM}Q", data)
+
+
+def pack_band(values: list[int]) -> bytes:
+    return struct.pack(f"<{len(values)}Q", *values)
+
+
+def band_buckets(sig: list[int]) -> list[int]:
+    """
+    One signed 64-bit bucket key per band (fits a BIGINT)
+    """
+    return [
+        int.from_bytes(
+            hashlib.blake2b(pack_band(sig[band * LSH_ROWS:(band + 1) * LSH_ROWS]), digest_size=8).digest(),
+            "little",
+            signed=True
+        )
+        for band in range(LSH_BANDS)
+    ]
+
+
+def estimate(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+# =====================================================
+# INDEX
+# =====================================================
+
+def index_submission(db: Session, submission_id: int, assignment_id: int, submission_text: str | None):
+    """
+    Sign a submission and file it in its LSH buckets. Caller commits.
+    """
+    index_submissions(db, [(submission_id, assignment_id, submission_text)])
+
+
+def index_submissions(db: Session, rows: list[tuple[int, int, str | None]]):
+    """
+    (submission_id, assignment_id, submission_text) rows, in batched
+    statements. Empty submissions are signed but not bucketed (they'd
+    all collide).
+    """
+    if not rows:
+        return
+
+    signatures, buckets = [], []
+    for submission_id, assignment_id, submission_text in rows:
+        hashes = shingles(submission_text)
+        sig = signature(hashes)
+        signatures.append({
+            "submission_id": submission_id, "assignment_id": assignment_id, "signature": pack(sig)
+        })
+        if hashes:
+            buckets.extend(
+                {"assignment_id": assignment_id, "band": band, "bucket": bucket, "submission_id": submission_id}
+                for band, bucket in enumerate(band_buckets(sig))
+            )
+
+    db.execute(
+        text("""
+            INSERT INTO submission_signatures (submission_id, assignment_id, signature)
+            VALUES (:submission_id, :assignment_id, :signature)
+            ON CONFLICT (submission_id) DO UPDATE SET signature = EXCLUDED.signature
+        """),
+        signatures
+    )
+    db.execute(
+        text("DELETE FROM submission_lsh_buckets WHERE submission_id = ANY(:ids)"),
+        {"ids": [r[0] for r in rows]}
+    )
+    if buckets:
+        db.execute(
+            text("""
+                INSERT INTO submission_lsh_buckets (assignment_id, band, bucket, submission_id)
+                VALUES (:assignment_id, :band, :bucket, :submission_id)
+                ON CONFLICT DO NOTHING
+            """),
+            buckets
+        )
+
+
+MISSING = text("""
+    SELECT s.id, s.submission_text, s.blob_sha256, s.content_type, s.size
+    FROM assignment_submissions s
+    LEFT JOIN submission_signatures g ON g.submission_id = s.id
+    WHERE s.assignment_id = :assignment_id AND g.submission_id IS NULL
+""")
+
+
+def index_missing(db: Session, assignment_id: int) -> int:
+    """
+    Sign the assignment's submissions that have no signature yet.
+    Concurrent first loads of an assignment queue on a transaction-scoped
+    advisory lock and the later ones find nothing left to sign.
+    """
+    params = {"assignment_id": assignment_id}
+    if db.execute(MISSING, params).first() is None:
+        return 0
+
+    db.execute(
+        text("SELECT pg_advisory_xact_lock(:ns, :assignment_id)"),
+        {"ns": ADVISORY_NAMESPACE, "assignment_id": assignment_id}
+    )
+    missing = db.execute(MISSING, params).all()
+    index_submissions(db, [
+        (
+            r.id,
+            assignment_id,
+            r.submission_text if r.blob_sha256 is None
+            else body_text(StoredBlob(r.blob_sha256, r.size, r.content_type or ""))
+        )
+        for r in missing
+    ])
+    return len(missing)
+
+
+# =====================================================
+# QUERY
+# =====================================================
+
+CANDIDATES = text("""
+    SELECT DISTINCT a.submission_id AS a, b.submission_id AS b
+    FROM submission_lsh_buckets a
+    JOIN submission_lsh_buckets b
+      ON b.assignment_id = a.assignment_id
+     AND b.band = a.band
+     AND b.bucket = a.bucket
+     AND b.submission_id > a.submission_id
+    WHERE a.assignment_id = :assignment_id
+""")
+
+
+def similar_pairs(db: Session, assignment_id: int, threshold: float = SIMILARITY_THRESHOLD) -> list[dict]:
+    """
+    Pairs of the assignment's submissions whose estimated Jaccard
+    similarity is at least threshold, most similar first
+    """
+    if index_missing(db, assignment_id):
+        db.commit()
+
+    candidates = db.execute(CANDIDATES, {"assignment_id": assignment_id}).all()
+    if not candidates:
+        return []
+
+    ids = {i for pair in candidates for i in pair}
+    rows = db.execute(
+        text("""
+            SELECT g.submission_id, g.signature, s.student_id, st.name
+            FROM submission_signatures g
+            JOIN assignment_submissions s ON s.id = g.submission_id
+            JOIN students st ON st.id = s.student_id
+            WHERE g.submission_id = ANY(:ids)
+        """),
+        {"ids": list(ids)}
+    ).all()
+    signatures = {r.submission_id: unpack(r.signature) for r in rows}
+    students = {r.submission_id: (r.student_id, r.name) for r in rows}
+
+    pairs = []
+    for a, b in candidates:
+        similarity = estimate(signatures[a], signatures[b])
+        if similarity >= threshold:
+            pairs.append({
+                "submission_a": a,
+                "student_a": students[a][0],
+                "student_a_name": students[a][1],
+                "submission_b": b,
+                "student_b": students[b][0],
+                "student_b_name": students[b][1],
+                "similarity": round(similarity, 3),
+            })
+
+    pairs.sort(key=lambda p: (-p["similarity"], p["submission_a"], p["submission_b"]))
+    return pairs
@@ -0,0 +1,308 @@
+# slow_queries.py
+
+import hashlib
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import date, datetime
+
+from sqlalchemy import event
+
+logger = logging.getLogger("slow_queries")
+
+# =====================================================
+# CONFIG
+# =====================================================
+'''Slow-query recorder.
+
+Every statement slower than SLOW_QUERY_MS is logged with its normalized
+fingerprint, redacted bind parameters and the route that issued it, and
+folded into per-fingerprint totals (GET /admin/slow-queries).
+
+With SLOW_QUERY_EXPLAIN=1 a background thread explains slow statements
+on its own connection, inside a transaction it rolls back, at most once
+per fingerprint per SLOW_QUERY_EXPLAIN_EVERY seconds. Only read-only
+SELECTs are re-run under EXPLAIN (ANALYZE, BUFFERS); anything that would
+take locks or write when executed (FOR UPDATE/SHARE, advisory lock
+functions, nextval, data-modifying CTEs, INSERT/UPDATE/DELETE) gets a
+plain EXPLAIN, since re-running it would contend on the same rows and
+consume sequence values a rollback doesn't return. Requests never wait
+for it; when its queue is full plans are simply skipped.
+
+Totals are per worker process and reset on restart.'''
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "0") == "1"
+SLOW_QUERY_EXPLAIN_EVERY = float(os.getenv("SLOW_QUERY_EXPLAIN_EVERY", "300"))
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "30000"))
+SLOW_QUERY_MAX_FINGERPRINTS = 500
+
+_request_scope: ContextVar[dict | None] = ContextVar("slow_query_request_scope", default=None)
+
+
+# =====================================================
+# FINGERPRINTS
+# =====================================================
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"%\([^)]+\)s|%s|\$\d+|(?<!:):\w+")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES = re.compile(r"(\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(statement: str) -> str:
+    """
+    Statement with literals and placeholders replaced by ?,
+    IN-lists / VALUES rows collapsed and whitespace squeezed
+    """
+    sql = _STRING.sub("?", statement)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _LIST.sub("(...)", sql)
+    sql = _VALUES.sub(r"\1", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def redact(parameters):
+    """
+    Keep numbers, booleans, dates and NULLs (useful to reproduce a plan),
+    hide anything textual or binary
+    """
+    if isinstance(parameters, dict):
+        return {k: redact(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact(v) for v in parameters]
+    if isinstance(parameters, (date, datetime)):
+        return parameters.isoformat()
+    if parameters is None or isinstance(parameters, (bool, int, float)):
+        return parameters
+    if isinstance(parameters, str):
+        return f"<str:{len(parameters)}>"
+    if isinstance(parameters, (bytes, bytearray, memoryview)):
+        return f"<bytes:{len(parameters)}>"
+    return f"<{type(parameters).__name__}>"
+
+
+def current_route() -> str | None:
+    scope = _request_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return f"{scope['method']} {route.path if route is not None else scope['path']}"
+
+
+# =====================================================
+# AGGREGATES
+# =====================================================
+
+class SlowQueryLog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = {}
+
+    def record(self, fp: str, normalized: str, duration_ms: float, route: str | None, params) -> bool:
+        """
+        Fold one slow execution in. True when the fingerprint is due
+        for a (new) plan.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(fp)
+            if entry is None:
+                if len(self._entries) >= SLOW_QUERY_MAX_FINGERPRINTS:
+                    smallest = min(self._entries, key=lambda k: self._entries[k]["total_ms"])
+                    del self._entries[smallest]
+                entry = self._entries[fp] = {
+                    "fingerprint": fp,
+                    "statement": normalized,
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "routes": Counter(),
+                    "last_params": None,
+                    "last_seen": None,
+                    "plan": None,
+                    "plan_captured_at": None,
+                    "plan_requested_at": 0.0,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["routes"][route or "-"] += 1
+            entry["last_params"] = params
+            entry["last_seen"] = now
+
+            due = now - entry["plan_requested_at"] >= SLOW_QUERY_EXPLAIN_EVERY
+            if due:
+                entry["plan_requested_at"] = now
+            return due
+
+    def set_plan(self, fp: str, plan):
+        with self._lock:
+            entry = self._entries.get(fp)
+            if entry is not None:
+                entry["plan"] = plan
+                entry["plan_captured_at"] = time.time()
+
+    def top(self, limit: int = 20, plans: bool = False) -> list[dict]:
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda e: e["total_ms"], reverse=True)[:limit]
+            result = []
+            for e in entries:
+                item = {
+                    "fingerprint": e["fingerprint"],
+                    "statement": e["statement"],
+                    "count": e["count"],
+                    "total_ms": round(e["total_ms"], 3),
+                    "mean_ms": round(e["total_ms"] / e["count"], 3),
+                    "max_ms": round(e["max_ms"], 3),
+                    "routes": dict(e["routes"].most_common()),
+                    "last_params": e["last_params"],
+                    "last_seen": datetime.fromtimestamp(e["last_seen"]).isoformat(),
+                    "has_plan": e["plan"] is not None,
+                }
+                if plans:
+                    item["plan"] = e["plan"]
+                result.append(item)
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+
+slow_query_log = SlowQueryLog()
+
+
+# =====================================================
+# OUT-OF-BAND EXPLAIN
+# =====================================================
+
+class _Explainer(threading.Thread):
+    def __init__(self, engine):
+        super().__init__(name="slow-query-explain", daemon=True)
+        self.engine = engine
+        self.jobs: queue.Queue = queue.Queue(maxsize=100)
+
+    def submit(self, fp: str, statement: str, parameters):
+        try:
+            self.jobs.put_nowait((fp, statement, parameters))
+        except queue.Full:
+            pass
+
+    def run(self):
+        while True:
+            fp, statement, parameters = self.jobs.get()
+            try:
+                with self.engine.connect() as conn:
+                    conn.info["slow_query_explain"] = True
+                    trans = conn.begin()
+                    try:
+                        conn.exec_driver_sql(
+                            f"SET LOCAL statement_timeout = {SLOW_QUERY_EXPLAIN_TIMEOUT_MS}"
+                        )
+                        if _read_only(statement):
+                            explain = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement
+                        else:
+                            explain = "EXPLAIN (FORMAT JSON) " + statement
+                        if parameters:
+                            plan = conn.exec_driver_sql(explain, parameters).scalar()
+                        else:
+                            plan = conn.exec_driver_sql(explain).scalar()
+                    finally:
+                        trans.rollback()
+                        conn.info.pop("slow_query_explain", None)
+                slow_query_log.set_plan(fp, plan)
+            except Exception:
+                logger.warning("EXPLAIN failed for slow query %s", fp, exc_info=True)
+
+
+_EXPLAINABLE = re.compile(r"^\s*(select|with|insert|update|delete)\b", re.IGNORECASE)
+_QUERY = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_NOT_READ_ONLY = re.compile(
+    r"\b(insert|update|delete|merge)\b"
+    r"|\bfor\s+(no\s+key\s+update|key\s+share|share)\b"
+    r"|\bpg_\w*advisory\w*\s*\("
+    r"|\b(nextval|setval)\s*\(",
+    re.IGNORECASE
+)
+
+
+def _read_only(statement: str) -> bool:
+    """
+    True when executing the statement only reads: safe to EXPLAIN ANALYZE
+    (FOR UPDATE is caught by the "update" keyword)
+    """
+    body = _STRING.sub("''", _COMMENT.sub(" ", statement))
+    return _QUERY.match(statement) is not None and not _NOT_READ_ONLY.search(body)
+
+
+# =====================================================
+# ENGINE HOOKS
+# =====================================================
+
+def install_slow_query_log(engine):
+    explainer = None
+    if SLOW_QUERY_EXPLAIN:
+        explainer = _Explainer(engine)
+        explainer.start()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _finish(conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() - conn.info["slow_query_start"].pop()) * 1000
+        if duration_ms < SLOW_QUERY_MS or conn.info.get("slow_query_explain"):
+            return
+
+        normalized = normalize(statement)
+        fp = fingerprint(normalized)
+        route = current_route()
+        params = redact(parameters)
+        logger.warning(
+            "slow query %.1fms fp=%s route=%s params=%s sql=%s",
+            duration_ms, fp, route, params, normalized
+        )
+
+        due = slow_query_log.record(fp, normalized, duration_ms, route, params)
+        if due and explainer is not None and not executemany and _EXPLAINABLE.match(statement):
+            explainer.submit(fp, statement, parameters)
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("slow_query_start"):
+            conn.info["slow_query_start"].pop()
+
+
+class RouteTagMiddleware:
+    """
+    Remembers the request scope so slow queries can name their route
+    (scope["route"] is filled in by the router once it matches)
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
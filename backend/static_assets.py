@@ -0,0 +1,75 @@
+# static_assets.py
+
+import os
+import re
+from mimetypes import guess_type
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from compression import accepted_encodings
+
+# =====================================================
+# CONFIG
+# =====================================================
+'''Serves the frontend from the backend.
+
+FRONTEND_DIR defaults to frontend/dist (output of build_frontend.py) and
+falls back to the raw frontend/ directory when no build exists.
+
+For every file the build also wrote <file>.br / <file>.gz; those are sent
+as-is (Content-Encoding set, nothing compressed per request) when the
+client accepts them. Files with a content hash in their name
+(admin.3f9a1c2b7d.js) never change, so they are cached for a year as
+immutable; everything else (the HTML entry points) is revalidated on
+each load.'''
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_DIST = os.path.join(_ROOT, "frontend", "dist")
+
+FRONTEND_DIR = os.getenv(
+    "FRONTEND_DIR",
+    _DIST if os.path.isdir(_DIST) else os.path.join(_ROOT, "frontend")
+)
+
+HASHED_NAME = re.compile(r"\.[0-9a-f]{10}\.[a-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        request_headers = Headers(scope=scope)
+        path = str(full_path)
+        media_type = guess_type(path)[0] or "application/octet-stream"
+
+        response = None
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        for encoding, suffix in PRECOMPRESSED:
+            if encoding not in accepted:
+                continue
+            try:
+                compressed_stat = os.stat(path + suffix)
+            except OSError:
+                continue
+            response = FileResponse(
+                path + suffix,
+                status_code=status_code,
+                stat_result=compressed_stat,
+                media_type=media_type,
+                headers={"Content-Encoding": encoding}
+            )
+            break
+
+        if response is None:
+            response = FileResponse(path, status_code=status_code, stat_result=stat_result, media_type=media_type)
+
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = IMMUTABLE if HASHED_NAME.search(path) else REVALIDATE
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,307 @@
+# submissions.py
+
+import os
+from datetime import datetime
+
+from fastapi import HTTPException
+from fastapi.responses import PlainTextResponse, Response
+from sqlalchemy import case, func, text, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from blobstore import StoredBlob, blob_store, store_bytes
+from invalidation import mark_changed
+from models import Assignment, AssignmentSubmission, Student
+from schemas import SubmissionGrade
+from search import decode_cursor, encode_cursor
+from similarity import body_text, index_submission
+
+# =====================================================
+# CONFIG
+# =====================================================
+'''Assignment submission bodies.
+
+Bodies live in the blob store (blobstore.py); assignment_submissions
+keeps the hash plus content type, file name and size, so listing and
+grading never read a body. A JSON submission is stored as a text/plain
+blob, a multipart upload as whatever was uploaded.
+
+Rows from before the blob store still have the body inline in
+submission_text; they are served as they are until the
+"move_submission_bodies" job (jobs.py) moves them out.
+
+Faculty list an assignment's submissions a page at a time, pending
+(ungraded) ones first, each status oldest first. Each status is read
+from its own partial index on (assignment_id, submitted_at, id), so a
+page is an index range scan of `limit` rows whatever the assignment's
+size; the cursor holds the last row's (status, submitted_at, id).
+
+Grades are saved a sheet at a time with optimistic concurrency: every
+grade change bumps the row's version, and a sheet only applies if every
+row still has the version the grader listed. Otherwise nothing is
+applied and the 409 carries the rows' current marks and versions.'''
+
+TEXT_PLAIN = "text/plain; charset=utf-8"
+
+SUBMISSION_PAGE_SIZE = int(os.getenv("SUBMISSION_PAGE_SIZE", "50"))
+SUBMISSION_MAX_PAGE_SIZE = 200
+
+# grades accepted by one grade sheet request
+GRADE_SHEET_MAX = int(os.getenv("GRADE_SHEET_MAX", "2000"))
+
+# listing order
+STATUSES = {
+    "pending": AssignmentSubmission.marks.is_(None),
+    "graded": AssignmentSubmission.marks.is_not(None),
+}
+
+
+def record_blob(db: Session, blob: StoredBlob):
+    db.execute(
+        text("INSERT INTO blobs (sha256, size) VALUES (:sha256, :size) ON CONFLICT DO NOTHING"),
+        {"sha256": blob.sha256, "size": blob.size}
+    )
+
+
+# =====================================================
+# SUBMIT
+# =====================================================
+
+def check_can_submit(db: Session, assignment_id: int, student_id: int):
+    """
+    Before accepting an upload, so a doomed one isn't streamed to disk
+    """
+    if db.query(Assignment.id).filter(Assignment.id == assignment_id).first() is None:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    if db.query(AssignmentSubmission.id).filter(
+        AssignmentSubmission.assignment_id == assignment_id,
+        AssignmentSubmission.student_id == student_id
+    ).first() is not None:
+        raise HTTPException(status_code=400, detail="Assignment already submitted")
+
+
+def save_submission(
+    db: Session,
+    assignment_id: int,
+    student_id: int,
+    blob: StoredBlob | None,
+    submitted_at: datetime | None = None,
+    text_body: str | None = None,
+) -> AssignmentSubmission:
+    submission = AssignmentSubmission(
+        assignment_id=assignment_id,
+        student_id=student_id,
+        submitted_at=submitted_at or datetime.now(),
+    )
+    if blob is not None:
+        record_blob(db, blob)
+        submission.blob_sha256 = blob.sha256
+        submission.content_type = blob.content_type
+        submission.filename = blob.filename
+        submission.size = blob.size
+        if text_body is None:
+            text_body = body_text(blob)
+
+    db.add(submission)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Assignment already submitted")
+
+    # MinHash signature + LSH buckets for GET /faculty/assignments/{id}/similar-pairs
+    index_submission(db, submission.id, assignment_id, text_body)
+
+    db.commit()
+    db.refresh(submission)
+    return submission
+
+
+def submit_text(
+    db: Session, assignment_id: int, student_id: int, body: str, submitted_at: datetime
+) -> AssignmentSubmission:
+    blob = store_bytes(body.encode(), TEXT_PLAIN)
+    return save_submission(db, assignment_id, student_id, blob, submitted_at, text_body=body)
+
+
+# =====================================================
+# READ
+# =====================================================
+
+def metadata_query(db: Session):
+    """
+    Everything but the body; legacy inline bodies report their size too
+    """
+    legacy = AssignmentSubmission.submission_text.is_not(None)
+    return db.query(
+        AssignmentSubmission.id,
+        AssignmentSubmission.assignment_id,
+        AssignmentSubmission.student_id,
+        AssignmentSubmission.submitted_at,
+        AssignmentSubmission.marks,
+        AssignmentSubmission.version,
+        AssignmentSubmission.blob_sha256.label("sha256"),
+        func.coalesce(
+            AssignmentSubmission.content_type, case((legacy, TEXT_PLAIN))
+        ).label("content_type"),
+        AssignmentSubmission.filename,
+        func.coalesce(
+            AssignmentSubmission.size, func.octet_length(AssignmentSubmission.submission_text)
+        ).label("size"),
+    )
+
+
+def body_response(submission: AssignmentSubmission) -> Response:
+    """
+    Streamed, range-capable download of the body
+    """
+    if submission.blob_sha256 is not None:
+        return blob_store.response(
+            submission.blob_sha256,
+            submission.content_type or "application/octet-stream",
+            submission.filename
+        )
+    if submission.submission_text is not None:
+        return PlainTextResponse(submission.submission_text)
+    raise HTTPException(status_code=404, detail="Submission has no body")
+
+
+# =====================================================
+# LISTING
+# =====================================================
+
+def status_counts(db: Session, assignment_id: int) -> dict:
+    pending, total = db.query(
+        func.count().filter(AssignmentSubmission.marks.is_(None)),
+        func.count(),
+    ).filter(AssignmentSubmission.assignment_id == assignment_id).one()
+    return {"pending": pending, "graded": total - pending, "total": total}
+
+
+def submission_page(
+    db: Session,
+    assignment_id: int,
+    status: str | None = None,
+    limit: int = SUBMISSION_PAGE_SIZE,
+    cursor: str | None = None,
+) -> dict:
+    """
+    One page of the assignment's submissions, metadata and student only
+    """
+    if status is not None and status not in STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of: {', '.join(STATUSES)}")
+    statuses = [status] if status else list(STATUSES)
+    limit = max(1, min(limit, SUBMISSION_MAX_PAGE_SIZE))
+
+    after = None
+    if cursor:
+        after_status, submitted_at, after_id = decode_cursor(cursor, 3)
+        if after_status not in statuses or not isinstance(after_id, int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        try:
+            after = (datetime.fromisoformat(submitted_at), after_id)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        statuses = statuses[statuses.index(after_status):]
+
+    # fill the page from each status in turn, one extra row to know
+    # whether there's a next page
+    items = []
+    for name in statuses:
+        query = metadata_query(db).add_columns(
+            Student.name.label("student_name"), Student.reg_no
+        ).join(
+            Student, Student.id == AssignmentSubmission.student_id
+        ).filter(
+            AssignmentSubmission.assignment_id == assignment_id, STATUSES[name]
+        )
+        if after is not None:
+            query = query.filter(
+                tuple_(AssignmentSubmission.submitted_at, AssignmentSubmission.id) > tuple_(*after)
+            )
+            after = None
+        rows = query.order_by(
+            AssignmentSubmission.submitted_at, AssignmentSubmission.id
+        ).limit(limit + 1 - len(items)).all()
+        items.extend({**row._asdict(), "status": name} for row in rows)
+        if len(items) > limit:
+            break
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor([last["status"], last["submitted_at"].isoformat(), last["id"]])
+
+    return {
+        "counts": status_counts(db, assignment_id),
+        "items": items,
+        "next_cursor": next_cursor,
+    }
+
+
+# =====================================================
+# GRADING
+# =====================================================
+
+GRADE_SHEET = text("""
+    UPDATE assignment_submissions s
+    SET marks = g.marks, version = s.version + 1
+    FROM unnest(
+        CAST(:ids AS integer[]), CAST(:marks AS integer[]), CAST(:versions AS integer[])
+    ) AS g(id, marks, version)
+    WHERE s.id = g.id
+      AND s.assignment_id = :assignment_id
+      AND s.version = g.version
+    RETURNING s.id, s.version
+""")
+
+
+def grade_sheet(db: Session, assignment_id: int, grades: list[SubmissionGrade]) -> dict:
+    """
+    All of the grades or none of them, in one UPDATE. Caller checks
+    the faculty teaches the assignment.
+    """
+    if len(grades) > GRADE_SHEET_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {GRADE_SHEET_MAX} grades per request")
+    ids = [g.submission_id for g in grades]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="A submission appears more than once")
+    if not grades:
+        return {"updated": 0, "versions": {}}
+
+    # a row whose version moved on since it was listed fails the
+    # version match (checked again after waiting on a concurrent writer)
+    updated = db.execute(GRADE_SHEET, {
+        "ids": ids,
+        "marks": [g.marks for g in grades],
+        "versions": [g.version for g in grades],
+        "assignment_id": assignment_id,
+    }).all()
+
+    if len(updated) < len(grades):
+        db.rollback()
+        current = {
+            r.id: r for r in db.query(
+                AssignmentSubmission.id, AssignmentSubmission.marks, AssignmentSubmission.version
+            ).filter(
+                AssignmentSubmission.id.in_(ids),
+                AssignmentSubmission.assignment_id == assignment_id
+            )
+        }
+        missing = [i for i in ids if i not in current]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Not submissions of this assignment: {missing}")
+        raise HTTPException(status_code=409, detail={
+            "message": "Changed since listed; nothing was saved",
+            "conflicts": [
+                {"submission_id": g.submission_id, "marks": current[g.submission_id].marks,
+                 "version": current[g.submission_id].version}
+                for g in grades if current[g.submission_id].version != g.version
+            ],
+        })
+
+    for row in updated:
+        mark_changed(db, "assignment_submissions", row.id)
+    db.commit()
+    return {"updated": len(updated), "versions": {row.id: row.version for row in updated}}
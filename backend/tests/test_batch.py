@@ -0,0 +1,102 @@
+# tests/test_batch.py
+'''An atomic POST /batch that rolls back must leave nothing behind outside
+the database either: no buffered live check-in, no cached or coalesced
+read of its uncommitted rows. Needs the database in DATABASE_URL; the
+batch's inserts are rolled back.'''
+
+from datetime import date
+from types import SimpleNamespace
+from uuid import uuid4
+
+import httpx
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import batch
+import live_attendance
+from auth import create_access_token
+from cache import catalog_cache
+from coalesce import coalesce_key, single_flight
+from database import SessionLocal, get_db
+from routers import batch as batch_router
+from routers import student
+
+SESSION_ID = 2_000_000_000      # no such session; its roster is seeded in the cache
+EMAIL = "batch-test-student@college.edu"
+
+router = APIRouter()
+
+
+@router.post("/departments/{code}", status_code=201)
+def add_department(code: str, db: Session = Depends(get_db)):
+    db.execute(text("INSERT INTO departments (code, name) VALUES (:code, :code)"), {"code": code})
+    db.commit()
+
+    # read back the way listings are served: coalesced and cached
+    def load():
+        return db.execute(text("SELECT name FROM departments WHERE code = :code"), {"code": code}).scalar()
+    return single_flight.do(
+        coalesce_key("test.department", "public", code=code),
+        lambda: catalog_cache.get_or_load(("test.department", code), load)
+    )
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(batch, "principal_from_token", lambda token, db: SimpleNamespace(id=0))
+    live_attendance.live_roster_cache.set(SESSION_ID, live_attendance.LiveRoster(
+        SESSION_ID, date.today(), 0, None, {EMAIL: 1}, frozenset({1})
+    ))
+
+    app = FastAPI()
+    app.include_router(batch_router.router)
+    app.include_router(student.router)
+    app.include_router(router)
+    yield httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+    live_attendance.live_roster_cache.clear()
+    live_attendance.hub._pending.pop(SESSION_ID, None)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def token() -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': EMAIL, 'role': 'student'})}"}
+
+
+@pytest.mark.anyio
+async def test_check_in_is_buffered_on_its_own(client):
+    async with client:
+        res = await client.post(f"/students/attendance/{SESSION_ID}/check-in", headers=token())
+    assert res.status_code == 202
+    assert SESSION_ID in live_attendance.hub._pending
+
+
+@pytest.mark.anyio
+async def test_atomic_rollback_leaves_no_check_in_and_no_cached_row(client):
+    code = f"T-{uuid4().hex[:8]}"
+    async with client:
+        res = await client.post("/batch", headers=token(), json={"mode": "atomic", "requests": [
+            {"method": "POST", "path": f"/departments/{code}"},
+            {"method": "POST", "path": f"/students/attendance/{SESSION_ID}/check-in"},
+        ]})
+
+    assert res.status_code == 200
+    body = res.json()
+    assert body["committed"] is False
+    assert body["results"][0] == {"status": 201, "body": code}    # it saw its own insert
+    assert body["results"][1]["status"] == 400, body
+
+    assert SESSION_ID not in live_attendance.hub._pending
+    assert catalog_cache.get(("test.department", code)) is None
+
+    db = SessionLocal()
+    try:
+        assert db.execute(text("SELECT 1 FROM departments WHERE code = :code"), {"code": code}).first() is None
+    finally:
+        db.close()
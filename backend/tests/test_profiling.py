@@ -0,0 +1,103 @@
+# tests/test_profiling.py
+'''X-Profile is for admins only: the middleware resolves the token itself,
+before the route runs. The user lookup is stubbed, so no database is
+needed.'''
+
+from types import SimpleNamespace
+
+import json
+import time
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+import auth
+import profiling
+
+USERS = {
+    "admin-token": SimpleNamespace(role="admin"),
+    "faculty-token": SimpleNamespace(role="faculty"),
+}
+
+
+async def ping(request):
+    return PlainTextResponse("pong")
+
+
+def busy_in_threadpool():
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def work(request):
+    await run_in_threadpool(busy_in_threadpool)
+    return PlainTextResponse("done")
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(auth, "user_from_token", lambda token, db: USERS.get(token))
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    app = profiling.ProfilingMiddleware(Starlette(routes=[Route("/ping", ping), Route("/work", work)]))
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def profiled(token: str | None) -> dict:
+    headers = {"X-Profile": "1"}
+    if token is not None:
+        headers["Authorization"] = f"Bearer {token}"
+    return headers
+
+
+@pytest.mark.anyio
+async def test_admin_gets_a_profile(client, tmp_path):
+    async with client:
+        res = await client.get("/ping", headers=profiled("admin-token"))
+    assert res.status_code == 200
+    assert res.text == "pong"
+    profile_id = res.headers["x-profile-id"]
+    assert (tmp_path / f"{profile_id}.json").exists()
+
+
+@pytest.mark.anyio
+async def test_threadpool_work_is_sampled(client, tmp_path):
+    async with client:
+        res = await client.get("/work", headers=profiled("admin-token"))
+    assert res.status_code == 200
+    profile = json.loads((tmp_path / f"{res.headers['x-profile-id']}.json").read_text())
+    assert "busy_in_threadpool" in profile["folded"]
+    assert not profiling._threads
+
+
+@pytest.mark.anyio
+async def test_non_admin_is_forbidden(client):
+    async with client:
+        res = await client.get("/ping", headers=profiled("faculty-token"))
+    assert res.status_code == 403
+    assert "x-profile-id" not in res.headers
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("token", [None, "junk"])
+async def test_unknown_token_is_unauthorized(client, token):
+    async with client:
+        res = await client.get("/ping", headers=profiled(token))
+    assert res.status_code == 401
+
+
+@pytest.mark.anyio
+async def test_unprofiled_requests_skip_the_check(client):
+    async with client:
+        res = await client.get("/ping")
+    assert res.status_code == 200
+    assert "x-profile-id" not in res.headers
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
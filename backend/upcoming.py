@@ -0,0 +1,107 @@
+# upcoming.py
+
+import os
+from datetime import date
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from search import decode_cursor, encode_cursor
+
+# =====================================================
+# CONFIG
+# =====================================================
+'''What's coming up for a student: assignment deadlines and exams across
+every enrolled course, in one list ordered by (date, kind, id).
+
+One statement. For each enrolled course a LATERAL subquery reads the
+next `limit` assignments from ix_assignments_course_due_date and the next
+`limit` exams from ix_exams_course_exam_date, both starting at the
+cursor; the outer query merges them and keeps the first `limit`. The
+work is bounded by courses * limit index entries, however far ahead the
+calendar goes. Assignments the student has already submitted are
+skipped (a uq_assignment_student probe per row).
+
+The cursor is the last item's (date, kind, id); without one the feed
+starts today.'''
+
+UPCOMING_PAGE_SIZE = int(os.getenv("UPCOMING_PAGE_SIZE", "20"))
+UPCOMING_MAX_PAGE_SIZE = 100
+
+KINDS = ("assignment", "exam")     # tie-break order on the same date
+
+# (date, kind, id) > (:after_date, :after_kind, :after_id); the date bound
+# alone is what the index scans on
+UPCOMING = text("""
+    WITH enrolled AS (
+        SELECT course_id FROM enrollments WHERE student_id = :student_id
+    ), items AS (
+        SELECT a.* FROM enrolled e
+        CROSS JOIN LATERAL (
+            SELECT 'assignment' AS kind, a.id, a.course_id, a.title, a.due_date AS date
+            FROM assignments a
+            WHERE a.course_id = e.course_id
+              AND a.due_date >= :after_date
+              AND (a.due_date, 'assignment', a.id) > (:after_date, :after_kind, :after_id)
+              AND NOT EXISTS (
+                  SELECT 1 FROM assignment_submissions s
+                  WHERE s.assignment_id = a.id AND s.student_id = :student_id
+              )
+            ORDER BY a.due_date, a.id
+            LIMIT :limit
+        ) a
+        UNION ALL
+        SELECT x.* FROM enrolled e
+        CROSS JOIN LATERAL (
+            SELECT 'exam' AS kind, x.id, x.course_id, x.name AS title, x.exam_date AS date
+            FROM exams x
+            WHERE x.course_id = e.course_id
+              AND x.exam_date >= :after_date
+              AND (x.exam_date, 'exam', x.id) > (:after_date, :after_kind, :after_id)
+            ORDER BY x.exam_date, x.id
+            LIMIT :limit
+        ) x
+    )
+    SELECT i.kind, i.id, i.course_id, c.course_code, c.course_name, i.title, i.date
+    FROM (SELECT * FROM items ORDER BY date, kind, id LIMIT :limit) i
+    JOIN courses c ON c.id = i.course_id
+    ORDER BY i.date, i.kind, i.id
+""")
+
+def upcoming_page(
+    db: Session,
+    student_id: int,
+    limit: int = UPCOMING_PAGE_SIZE,
+    cursor: str | None = None,
+    today: date | None = None,
+) -> dict:
+    limit = max(1, min(limit, UPCOMING_MAX_PAGE_SIZE))
+
+    # "" sorts before every kind: the whole of the start date is included
+    after = [(today or date.today()).isoformat(), "", 0]
+    if cursor:
+        after = decode_cursor(cursor, 3)
+        try:
+            date.fromisoformat(after[0])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if after[1] not in KINDS or not isinstance(after[2], int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    rows = db.execute(UPCOMING, {
+        "student_id": student_id,
+        "after_date": date.fromisoformat(after[0]),
+        "after_kind": after[1],
+        "after_id": after[2],
+        "limit": limit + 1,
+    }).mappings().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last["date"].isoformat(), last["kind"], last["id"]])
+
+    return {"items": [dict(row) for row in rows], "next_cursor": next_cursor}
+
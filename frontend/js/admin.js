@@ -1,5 +1,5 @@
 import { requireRole, logout } from "./auth.js";
-import { apiGet } from "./api.js";
+import { apiGet, apiSend, keysetPager } from "./api.js";
 
 document.addEventListener("DOMContentLoaded", () => {
     requireRole("admin");
@@ -11,9 +11,6 @@ const token = localStorage.getItem("token");
 console.log("TOKEN:", localStorage.getItem("token"));
 
 let editingStudentId = null;
-let allStudents = [];
-let filteredStudents = [];
-let studentPage = 1;
 const STUDENTS_PER_PAGE = 5;
 
 let selectedStudentId = null;
@@ -39,21 +36,21 @@ let editingCourseId = null;
 
 
 
+// searched, sorted and paged by the server (GET /admin/students/search)
+const studentPager = keysetPager(`${BASE}/admin/students/search`, {
+  limit: STUDENTS_PER_PAGE,
+  onPage: renderStudents
+});
+
 async function loadStudents() {
-  allStudents = await apiGet(`${BASE}/students`);
-  filteredStudents = allStudents;
-  studentPage = 1;
-  renderStudents();
+  await studentPager.search();
 }
 
-function renderStudents() {
+function renderStudents(rows, { page }) {
   const tbody = document.getElementById("studentsTable");
   tbody.innerHTML = "";
 
-  const start = (studentPage - 1) * STUDENTS_PER_PAGE;
-  const pageData = filteredStudents.slice(start, start + STUDENTS_PER_PAGE);
-
-  pageData.forEach(s => {
+  rows.forEach(s => {
     tbody.innerHTML += `
       <tr>
         <td>${s.id}</td>
@@ -69,44 +66,27 @@ function renderStudents() {
     `;
   });
 
-  document.getElementById("studentPageInfo").innerText =
-    `Page ${studentPage} of ${Math.ceil(filteredStudents.length / STUDENTS_PER_PAGE)}`;
+  document.getElementById("studentPageInfo").innerText = `Page ${page}`;
 }
 
-function nextStudentPage() {
-  if (studentPage * STUDENTS_PER_PAGE < filteredStudents.length) {
-    studentPage++;
-    renderStudents();
-  }
-}
+window.nextStudentPage = () => studentPager.next();
+window.prevStudentPage = () => studentPager.prev();
 
-function prevStudentPage() {
-  if (studentPage > 1) {
-    studentPage--;
-    renderStudents();
-  }
+// one request per pause in typing, not per keystroke
+function debounce(fn, ms = 250) {
+  let timer;
+  return (...args) => {
+    clearTimeout(timer);
+    timer = setTimeout(() => fn(...args), ms);
+  };
 }
 
-
 document.getElementById("studentSearchInput")
-  .addEventListener("input", e => {
-    const q = e.target.value.toLowerCase();
+  .addEventListener("input", debounce(e => {
+    studentPager.search({ q: e.target.value.trim() });
+  }));
 
-    filteredStudents = allStudents.filter(s =>
-      s.name.toLowerCase().includes(q) ||
-      s.reg_no.toLowerCase().includes(q) ||
-      s.email.toLowerCase().includes(q) ||
-      s.department_name.toLowerCase().includes(q)
-    );
-
-    studentPage = 1;
-    renderStudents();
-  });
-
-  let allFaculty = [];
-let filteredFaculty = [];
-let facultyPage = 1;
-const FACULTY_PER_PAGE = 5;
+  const FACULTY_PER_PAGE = 5;
 
 
 
@@ -114,11 +94,9 @@ const FACULTY_PER_PAGE = 5;
 window.deleteStudent = async function (id) {
     if (!confirm("Delete student?")) return;
 
-    await fetch(`${BASE}/admin/students/${id}`, {
+    await apiSend(`${BASE}/admin/students/${id}`, {
         method: "DELETE",
-        headers: {
-            "Authorization": `Bearer ${localStorage.getItem("token")}`
-        }
+        invalidates: [`${BASE}/students`]
     });
 
     loadStudents();
@@ -127,13 +105,7 @@ window.deleteStudent = async function (id) {
 window.logout = logout;
 
 async function loadDepartments() {
-  const res = await fetch(`${BASE}/admin/departments`, {
-    headers: {
-      "Authorization": `Bearer ${localStorage.getItem("token")}`
-    }
-  });
-
-  const departments = await res.json();
+  const departments = await apiGet(`${BASE}/admin/departments`);
   const select = document.getElementById("department_id");
 
   select.innerHTML = `<option value="">Select Department</option>`;
@@ -203,13 +175,10 @@ window.submitStudent = async function () {
       department_id: parseInt(deptIdVal)
     };
 
-    const res = await fetch(`${BASE}/admin/students`, {
+    const res = await apiSend(`${BASE}/admin/students`, {
       method: "POST",
-      headers: {
-        "Authorization": `Bearer ${localStorage.getItem("token")}`,
-        "Content-Type": "application/json"
-      },
-      body: JSON.stringify(payload)
+      body: payload,
+      invalidates: [`${BASE}/students`]
     });
 
     if (!res.ok) {
@@ -224,11 +193,9 @@ window.submitStudent = async function () {
       `${BASE}/admin/students/${editingStudentId}` +
       `?name=${nameVal}&reg_no=${regNoVal}&department_id=${deptIdVal}`;
 
-    const res = await fetch(url, {
+    const res = await apiSend(url, {
       method: "PUT",
-      headers: {
-        "Authorization": `Bearer ${localStorage.getItem("token")}`
-      }
+      invalidates: [`${BASE}/students`]
     });
 
     if (!res.ok) {
@@ -248,8 +215,8 @@ window.submitStudent = async function () {
 };
 
 document.getElementById("studentSearchAssignInput")
-  .addEventListener("input", e => {
-    const q = e.target.value.toLowerCase();
+  .addEventListener("input", debounce(async e => {
+    const q = e.target.value.trim();
     const box = document.getElementById("studentAssignResults");
 
     if (!q) {
@@ -257,12 +224,8 @@ document.getElementById("studentSearchAssignInput")
       return;
     }
 
-    const matches = allStudents
-      .filter(s =>
-        s.name.toLowerCase().includes(q) ||
-        s.reg_no.toLowerCase().includes(q)
-      )
-      .slice(0, 3);
+    const params = new URLSearchParams({ q, limit: 3 });
+    const { items: matches } = await apiGet(`${BASE}/admin/students/search?${params}`);
 
     box.innerHTML = "";
 
@@ -273,7 +236,7 @@ document.getElementById("studentSearchAssignInput")
       div.onclick = () => selectStudentForAssign(s);
       box.appendChild(div);
     });
-});
+}));
 
 function selectStudentForAssign(student) {
   selectedStudentId = student.id;
@@ -372,16 +335,13 @@ window.assignCourseToStudent = async function () {
     return;
   }
 
-  const res = await fetch(`${BASE}/admin/enroll-student`, {
+  const res = await apiSend(`${BASE}/admin/enroll-student`, {
     method: "POST",
-    headers: {
-      "Authorization": `Bearer ${localStorage.getItem("token")}`,
-      "Content-Type": "application/json"
-    },
-    body: JSON.stringify({
+    body: {
       student_id: selectedStudentId,
       course_id: selectedStudentCourseId
-    })
+    },
+    invalidates: [`${BASE}/admin/student-courses`]
   });
 
   const data = await res.json();
@@ -421,15 +381,10 @@ async function loadStudentCourseMapping(studentId) {
 window.unassignStudentCourse = async function (studentId, courseId) {
   if (!confirm("Unassign this course from student?")) return;
 
-  await fetch(
-    `${BASE}/admin/enroll-student?student_id=${studentId}&course_id=${courseId}`,
-    {
-      method: "DELETE",
-      headers: {
-        "Authorization": `Bearer ${localStorage.getItem("token")}`
-      }
-    }
-  );
+  await apiSend(`${BASE}/admin/enroll-student?student_id=${studentId}&course_id=${courseId}`, {
+    method: "DELETE",
+    invalidates: [`${BASE}/admin/student-courses`]
+  });
 
   loadStudentCourseMapping(studentId);
 };
@@ -437,21 +392,21 @@ window.unassignStudentCourse = async function (studentId, courseId) {
 
 let editingFacultyId = null;
 
+// searched, sorted and paged by the server (GET /admin/faculty/search)
+const facultyPager = keysetPager(`${BASE}/admin/faculty/search`, {
+  limit: FACULTY_PER_PAGE,
+  onPage: renderFaculty
+});
+
 async function loadFaculty() {
-  allFaculty = await apiGet(`${BASE}/admin/faculty`);
-  filteredFaculty = allFaculty;
-  facultyPage = 1;
-  renderFaculty();
+  await facultyPager.search();
 }
 
-function renderFaculty() {
+function renderFaculty(rows, { page }) {
   const tbody = document.getElementById("facultyTable");
   tbody.innerHTML = "";
 
-  const start = (facultyPage - 1) * FACULTY_PER_PAGE;
-  const pageData = filteredFaculty.slice(start, start + FACULTY_PER_PAGE);
-
-  pageData.forEach(f => {
+  rows.forEach(f => {
     tbody.innerHTML += `
       <tr>
         <td>${f.id}</td>
@@ -467,56 +422,28 @@ function renderFaculty() {
     `;
   });
 
-  document.getElementById("facultyPageInfo").innerText =
-    `Page ${facultyPage} of ${Math.ceil(filteredFaculty.length / FACULTY_PER_PAGE)}`;
+  document.getElementById("facultyPageInfo").innerText = `Page ${page}`;
 }
 
-function nextFacultyPage() {
-  if (facultyPage * FACULTY_PER_PAGE < filteredFaculty.length) {
-    facultyPage++;
-    renderFaculty();
-  }
-}
-
-function prevFacultyPage() {
-  if (facultyPage > 1) {
-    facultyPage--;
-    renderFaculty();
-  }
-}
+window.nextFacultyPage = () => facultyPager.next();
+window.prevFacultyPage = () => facultyPager.prev();
 
 
 document.getElementById("facultyTableSearch")
-  .addEventListener("input", e => {
-    const q = e.target.value.toLowerCase();
-
-    filteredFaculty = allFaculty.filter(f =>
-      f.name.toLowerCase().includes(q) ||
-      f.employee_id.toLowerCase().includes(q) ||
-      (f.email || "").toLowerCase().includes(q) ||
-      f.department_name.toLowerCase().includes(q)
-    );
-
-    facultyPage = 1;
-    renderFaculty();
-  });
+  .addEventListener("input", debounce(e => {
+    facultyPager.search({ q: e.target.value.trim() });
+  }));
 
 
 window.addFacultyEmail = async function (facultyId) {
   const email = prompt("Enter faculty email:");
   if (!email) return;
 
-  const res = await fetch(
-    `${BASE}/admin/faculty/${facultyId}/create-user`,
-    {
-      method: "POST",
-      headers: {
-        "Authorization": `Bearer ${localStorage.getItem("token")}`,
-        "Content-Type": "application/json"
-      },
-      body: JSON.stringify({ email })
-    }
-  );
+  const res = await apiSend(`${BASE}/admin/faculty/${facultyId}/create-user`, {
+    method: "POST",
+    body: { email },
+    invalidates: [`${BASE}/admin/faculty-courses`]
+  });
 
   const data = await res.json();
 
@@ -533,15 +460,11 @@ let selectedFacultyId = null;
 let selectedFacultyName = "";
 
 window.searchFaculty = async function () {
-  const q = document.getElementById("facultySearchInput").value.trim().toLowerCase();
+  const q = document.getElementById("facultySearchInput").value.trim();
   if (!q) return alert("Enter search term");
 
-  const faculty = await apiGet(`${BASE}/admin/faculty`);
-
-  const found = faculty.find(f =>
-    f.name.toLowerCase().includes(q) ||
-    f.employee_id.toLowerCase().includes(q)
-  );
+  const params = new URLSearchParams({ q, limit: 1 });
+  const [found] = (await apiGet(`${BASE}/admin/faculty/search?${params}`)).items;
 
   if (!found) {
     alert("Faculty not found");
@@ -574,27 +497,21 @@ window.submitFaculty = async function () {
   let res;
 
   if (!editingFacultyId) {
-    res = await fetch(`${BASE}/admin/faculty`, {
+    res = await apiSend(`${BASE}/admin/faculty`, {
       method: "POST",
-      headers: {
-        "Authorization": `Bearer ${token}`,
-        "Content-Type": "application/json"
-      },
-      body: JSON.stringify({
+      body: {
         name,
         employee_id: emp,
         email,
         department_id: parseInt(dept)
-      })
+      },
+      invalidates: [`${BASE}/admin/faculty-courses`]
     });
   } else {
-    res = await fetch(
-      `${BASE}/admin/faculty/${editingFacultyId}?name=${name}&employee_id=${emp}&department_id=${dept}`,
-      {
-        method: "PUT",
-        headers: { "Authorization": `Bearer ${token}` }
-      }
-    );
+    res = await apiSend(`${BASE}/admin/faculty/${editingFacultyId}?name=${name}&employee_id=${emp}&department_id=${dept}`, {
+      method: "PUT",
+      invalidates: [`${BASE}/admin/faculty-courses`]
+    });
   }
 
   if (!res.ok) {
@@ -626,15 +543,15 @@ window.editFaculty = function (id, name, emp, email, dept) {
 
 window.deleteFaculty = async function (id) {
   if (!confirm("Delete faculty?")) return;
-  await fetch(`${BASE}/admin/faculty/${id}`, {
+  await apiSend(`${BASE}/admin/faculty/${id}`, {
     method: "DELETE",
-    headers: { "Authorization": `Bearer ${localStorage.getItem("token")}` }
+    invalidates: [`${BASE}/admin/faculty-courses`]
   });
   loadFaculty();
 };
 
 async function loadFacultyDepartments() {
-  const depts = await apiGet(`${BASE}admin/departments`);
+  const depts = await apiGet(`${BASE}/admin/departments`);
   f_department.innerHTML = `<option value="">Select Department</option>`;
   depts.forEach(d => {
     f_department.innerHTML += `<option value="${d.id}">${d.code} - ${d.name}</option>`;
@@ -643,7 +560,7 @@ async function loadFacultyDepartments() {
 
 
 document.getElementById("facultySearchInput")
-  .addEventListener("input", async (e) => {
+  .addEventListener("input", debounce(async (e) => {
     const q = e.target.value.trim();
     const resultsBox = document.getElementById("facultySearchResults");
 
@@ -652,12 +569,8 @@ document.getElementById("facultySearchInput")
       return;
     }
 
-    const regex = new RegExp(q, "i");
-    const faculty = await apiGet(`${BASE}/admin/faculty`);
-
-    const matches = faculty
-      .filter(f => regex.test(f.name) || regex.test(f.employee_id))
-      .slice(0, 3);
+    const params = new URLSearchParams({ q, limit: 3 });
+    const { items: matches } = await apiGet(`${BASE}/admin/faculty/search?${params}`);
 
     resultsBox.innerHTML = "";
 
@@ -668,7 +581,7 @@ document.getElementById("facultySearchInput")
       div.onclick = () => selectFaculty(f);
       resultsBox.appendChild(div);
     });
-});
+}));
 
 function selectFaculty(faculty) {
   selectedFacultyId = faculty.id;
@@ -810,20 +723,14 @@ window.assignCourse = async function () {
     return;
   }
 
-  const res = await fetch(
-    `${BASE}/admin/assign-faculty`,
-    {
-      method: "POST",
-      headers: {
-        "Authorization": `Bearer ${localStorage.getItem("token")}`,
-        "Content-Type": "application/json"
-      },
-      body: JSON.stringify({
-        faculty_id: selectedFacultyId,
-        course_id: selectedCourseId
-      })
-    }
-  );
+  const res = await apiSend(`${BASE}/admin/assign-faculty`, {
+    method: "POST",
+    body: {
+      faculty_id: selectedFacultyId,
+      course_id: selectedCourseId
+    },
+    invalidates: [`${BASE}/admin/faculty-courses`]
+  });
 
   if (!res.ok) {
     const err = await res.json();
@@ -871,15 +778,9 @@ async function loadFacultyCourseMapping(facultyId = null) {
 window.unassignCourse = async function (facultyId, courseId) {
   if (!confirm("Unassign this course from faculty?")) return;
 
-  const res = await fetch(
-    `${BASE}/admin/faculty-courses?faculty_id=${facultyId}&course_id=${courseId}`,
-    {
-      method: "DELETE",
-      headers: {
-        "Authorization": `Bearer ${localStorage.getItem("token")}`
-      }
-    }
-  );
+  const res = await apiSend(`${BASE}/admin/faculty-courses?faculty_id=${facultyId}&course_id=${courseId}`, {
+    method: "DELETE"
+  });
 
   if (!res.ok) {
     const err = await res.text();
@@ -895,7 +796,9 @@ window.unassignCourse = async function (facultyId, courseId) {
 
 
 async function loadDepartmentsAdmin() {
-  allDepartments = await apiGet(`${BASE}/admin/departments`);
+  allDepartments = await apiGet(`${BASE}/admin/departments`, {
+    onUpdate: rows => { allDepartments = filteredDepartments = rows; renderDepartments(); }
+  });
   filteredDepartments = allDepartments;
   deptPage = 1;
   renderDepartments();
@@ -968,22 +871,16 @@ window.submitDepartment = async function () {
   let res;
 
   if (!editingDeptId) {
-    res = await fetch(`${BASE}/admin/departments`, {
+    res = await apiSend(`${BASE}/admin/departments`, {
       method: "POST",
-      headers: {
-        "Authorization": `Bearer ${token}`,
-        "Content-Type": "application/json"
-      },
-      body: JSON.stringify({ code, name })
+      body: { code, name },
+      invalidates: [`${BASE}/admin/faculty`, `${BASE}/admin/students`, `${BASE}/admin/courses`, `${BASE}/students`, `${BASE}/courses`]
     });
   } else {
-    res = await fetch(
-      `${BASE}/admin/departments/${editingDeptId}?code=${code}&name=${name}`,
-      {
-        method: "PUT",
-        headers: { "Authorization": `Bearer ${token}` }
-      }
-    );
+    res = await apiSend(`${BASE}/admin/departments/${editingDeptId}?code=${code}&name=${name}`, {
+      method: "PUT",
+      invalidates: [`${BASE}/admin/faculty`, `${BASE}/admin/students`, `${BASE}/admin/courses`, `${BASE}/students`, `${BASE}/courses`]
+    });
   }
 
   if (!res.ok) {
@@ -1010,9 +907,9 @@ window.editDepartment = function (id, code, name) {
 window.deleteDepartment = async function (id) {
   if (!confirm("Delete department?")) return;
 
-  const res = await fetch(`${BASE}/admin/departments/${id}`, {
+  const res = await apiSend(`${BASE}/admin/departments/${id}`, {
     method: "DELETE",
-    headers: { "Authorization": `Bearer ${token}` }
+    invalidates: [`${BASE}/admin/faculty`, `${BASE}/admin/students`, `${BASE}/admin/courses`, `${BASE}/students`, `${BASE}/courses`]
   });
 
   if (!res.ok) {
@@ -1025,7 +922,9 @@ window.deleteDepartment = async function (id) {
 
 
 async function loadCoursesAdmin() {
-  allAdminCourses = await apiGet(`${BASE}/admin/courses`);
+  allAdminCourses = await apiGet(`${BASE}/admin/courses`, {
+    onUpdate: rows => { allAdminCourses = filteredAdminCourses = rows; renderCoursesAdmin(); }
+  });
   filteredAdminCourses = allAdminCourses;
   courseAdminPage = 1;
   renderCoursesAdmin();
@@ -1098,26 +997,17 @@ document.getElementById("courseSearchAdmin")
   let res;
 
   if (!editingCourseId) {
-    res = await fetch(`${BASE}/admin/courses`, {
+    res = await apiSend(`${BASE}/admin/courses`, {
       method: "POST",
-      headers: {
-        "Authorization": `Bearer ${token}`,
-        "Content-Type": "application/json"
-      },
-      body: JSON.stringify(payload)
+      body: payload,
+      invalidates: [`${BASE}/admin/faculty-courses`, `${BASE}/courses`]
     });
   } else {
-    res = await fetch(
-      `${BASE}/admin/courses/${editingCourseId}`,
-      {
-        method: "PUT",
-        headers: {
-          "Authorization": `Bearer ${token}`,
-          "Content-Type": "application/json"
-        },
-        body: JSON.stringify(payload)
-      }
-    );
+    res = await apiSend(`${BASE}/admin/courses/${editingCourseId}`, {
+      method: "PUT",
+      body: payload,
+      invalidates: [`${BASE}/admin/faculty-courses`, `${BASE}/courses`]
+    });
   }
 
   if (!res.ok) {
@@ -1137,9 +1027,9 @@ document.getElementById("courseSearchAdmin")
 window.deleteCourse = async function (id) {
   if (!confirm("Delete course?")) return;
 
-  const res = await fetch(`${BASE}/admin/courses/${id}`, {
+  const res = await apiSend(`${BASE}/admin/courses/${id}`, {
     method: "DELETE",
-    headers: { "Authorization": `Bearer ${token}` }
+    invalidates: [`${BASE}/admin/faculty-courses`, `${BASE}/courses`]
   });
 
   if (!res.ok) {
@@ -1,21 +1,238 @@
-export async function apiGet(url) {
+// =====================================================
+// API CLIENT WITH STALE-WHILE-REVALIDATE CACHE
+// =====================================================
+// GET responses are cached in memory and in IndexedDB, keyed by the
+// signed-in user and the URL, together with the server's ETag.
+//   - cached: returned at once, then revalidated in the background with
+//     If-None-Match (a 304 costs no body); onUpdate(data) is called if
+//     the data changed
+//   - not cached: fetched; concurrent identical requests share one fetch
+// apiSend() performs mutations and, when they succeed, drops cached GETs
+// under the same resource path (PUT /admin/faculty/3 -> /admin/faculty...)
+// plus any extra prefixes listed in `invalidates`.
+
+const DB_NAME = "cms-api-cache";
+const STORE = "responses";
+
+const memory = new Map();      // key -> { etag, data }
+const inFlight = new Map();    // key -> Promise<{ etag, data, changed }>
+
+// ---------------- scope ----------------
+
+function currentScope() {
     const token = localStorage.getItem("token");
+    if (!token) return null;
+    try {
+        const payload = JSON.parse(atob(token.split(".")[1].replace(/-/g, "+").replace(/_/g, "/")));
+        return payload.sub || token;
+    } catch {
+        return token;
+    }
+}
+
+function keyFor(scope, url) {
+    return `${scope}|${url}`;
+}
 
+function pathOf(url) {
+    return new URL(url, window.location.href).pathname.replace(/\/+$/, "");
+}
+
+// ---------------- IndexedDB (best effort) ----------------
+
+let dbPromise = null;
+
+function openDb() {
+    if (!("indexedDB" in window)) return Promise.resolve(null);
+    if (!dbPromise) {
+        dbPromise = new Promise(resolve => {
+            const req = indexedDB.open(DB_NAME, 1);
+            req.onupgradeneeded = () => req.result.createObjectStore(STORE);
+            req.onsuccess = () => resolve(req.result);
+            req.onerror = () => resolve(null);   // private mode etc.: memory only
+        });
+    }
+    return dbPromise;
+}
+
+async function idb(mode, fn) {
+    const db = await openDb();
+    if (!db) return undefined;
+    return new Promise(resolve => {
+        const tx = db.transaction(STORE, mode);
+        const req = fn(tx.objectStore(STORE));
+        tx.oncomplete = () => resolve(req ? req.result : undefined);
+        tx.onerror = tx.onabort = () => resolve(undefined);
+    });
+}
+
+async function readCached(key) {
+    if (memory.has(key)) return memory.get(key);
+    const entry = await idb("readonly", store => store.get(key));
+    if (entry) memory.set(key, entry);
+    return entry;
+}
+
+function writeCached(key, entry) {
+    memory.set(key, entry);
+    idb("readwrite", store => store.put(entry, key));
+}
+
+// ---------------- network ----------------
+
+function authHeaders() {
+    const token = localStorage.getItem("token");
     if (!token) {
         throw new Error("No token found");
     }
+    return { "Authorization": `Bearer ${token}` };
+}
 
-    const res = await fetch(url, {
-        method: "GET",
-        headers: {
-            "Authorization": `Bearer ${token}`,
-            "Content-Type": "application/json"
+function revalidate(key, url, cached) {
+    if (inFlight.has(key)) return inFlight.get(key);
+
+    const headers = { ...authHeaders(), "Content-Type": "application/json" };
+    if (cached && cached.etag) headers["If-None-Match"] = cached.etag;
+
+    const request = (async () => {
+        const res = await fetch(url, { method: "GET", headers, cache: "no-store" });
+
+        if (res.status === 304 && cached) {
+            return { ...cached, changed: false };
+        }
+        if (!res.ok) {
+            throw new Error("API error");
         }
+
+        const entry = { etag: res.headers.get("ETag"), data: await res.json(), url };
+        writeCached(key, entry);
+        return { ...entry, changed: true };
+    })();
+
+    inFlight.set(key, request);
+    request.finally(() => inFlight.delete(key)).catch(() => {});
+    return request;
+}
+
+// ---------------- public API ----------------
+
+export async function apiGet(url, { onUpdate } = {}) {
+    const scope = currentScope();
+    if (!scope) {
+        throw new Error("No token found");
+    }
+
+    const key = keyFor(scope, url);
+    const cached = await readCached(key);
+
+    if (cached) {
+        revalidate(key, url, cached)
+            .then(fresh => {
+                if (fresh.changed && onUpdate) onUpdate(fresh.data);
+            })
+            .catch(() => {});    // keep showing what we have
+        return cached.data;
+    }
+
+    return (await revalidate(key, url, null)).data;
+}
+
+export async function apiSend(url, { method = "POST", body, invalidates = [] } = {}) {
+    const headers = authHeaders();
+    if (body !== undefined) headers["Content-Type"] = "application/json";
+
+    const res = await fetch(url, {
+        method,
+        headers,
+        body: body === undefined ? undefined : JSON.stringify(body)
     });
 
-    if (!res.ok) {
-        throw new Error("API error");
+    if (res.ok) {
+        await invalidate([resourceOf(url), ...invalidates]);
+    }
+    return res;
+}
+
+export async function invalidate(prefixes) {
+    const scope = currentScope();
+    const paths = prefixes.map(p => pathOf(p));
+
+    const stale = key => {
+        if (!key.startsWith(`${scope}|`)) return false;
+        const path = pathOf(key.slice(scope.length + 1));
+        return paths.some(p => path === p || path.startsWith(`${p}/`));
+    };
+
+    for (const key of [...memory.keys()]) {
+        if (stale(key)) memory.delete(key);
+    }
+    const keys = (await idb("readonly", store => store.getAllKeys())) || [];
+    const doomed = keys.filter(stale);
+    if (doomed.length) {
+        await idb("readwrite", store => {
+            doomed.forEach(k => store.delete(k));
+            return null;
+        });
+    }
+}
+
+export async function clearApiCache() {
+    memory.clear();
+    await idb("readwrite", store => store.clear());
+}
+
+function resourceOf(url) {
+    // collection path: stop at the first numeric id segment
+    const parts = pathOf(url).split("/");
+    const idAt = parts.findIndex((p, i) => i > 0 && /^\d+$/.test(p));
+    return (idAt === -1 ? parts : parts.slice(0, idAt)).join("/") || "/";
+}
+
+// ---------------- keyset pages ----------------
+// For endpoints returning { items, next_cursor } (e.g. /admin/students/search).
+// Cursors of the pages seen so far are kept so prev() can go back;
+// responses to superseded searches are dropped.
+
+export function keysetPager(url, { limit, onPage }) {
+    let params = {};
+    let cursors = [null];          // cursors[n] starts page n + 1
+    let next = null;
+    let page = 1;
+    let latest = 0;
+
+    async function fetchPage() {
+        const query = new URLSearchParams({ ...params, limit });
+        if (cursors[page - 1]) query.set("cursor", cursors[page - 1]);
+
+        const ticket = ++latest;
+        const show = data => {
+            if (ticket !== latest) return;
+            next = data.next_cursor;
+            onPage(data.items, { page, hasNext: next !== null });
+        };
+        show(await apiGet(`${url}?${query}`, { onUpdate: show }));
     }
 
-    return res.json();
+    return {
+        search(newParams = params) {
+            params = Object.fromEntries(
+                Object.entries(newParams).filter(([, v]) => v !== "" && v != null)
+            );
+            cursors = [null];
+            page = 1;
+            return fetchPage();
+        },
+        next() {
+            if (next === null) return;
+            cursors[page] = next;
+            page++;
+            return fetchPage();
+        },
+        prev() {
+            if (page === 1) return;
+            page--;
+            return fetchPage();
+        },
+        reload: () => fetchPage()
+    };
 }
@@ -1,3 +1,5 @@
+import { clearApiCache } from "./api.js";
+
 export function getToken() {
     return localStorage.getItem("token");
 }
@@ -15,7 +17,8 @@ export function requireRole(role) {
     }
 }
 
-export function logout() {
+export async function logout() {
     localStorage.clear();
+    await clearApiCache();
     window.location.href = "login.html";
 }
@@ -1,5 +1,5 @@
     import { requireRole } from "./auth.js";
-    import { apiGet } from "./api.js";
+    import { apiGet, apiSend } from "./api.js";
 
     document.addEventListener("DOMContentLoaded", () => {
     requireRole("faculty");
@@ -8,8 +8,8 @@
     const token = localStorage.getItem("token");
     const BASE = "https://collegemanagementsystem-q7g8.onrender.com";
 
-    async function loadFacultyProfile() {
-        const faculty = await apiGet(`${BASE}/faculty/me`);
+    async function loadFacultyProfile(faculty) {
+        faculty = faculty ?? await apiGet(`${BASE}/faculty/me`);
 
         document.querySelector(".profile-name").innerText = faculty.name;
 
@@ -44,8 +44,8 @@
         
     }
 
-    async function loadFacultyDashboard() {
-        const data = await apiGet(`${BASE}/faculty/dashboard`);
+    async function loadFacultyDashboard(data) {
+        data = data ?? await apiGet(`${BASE}/faculty/dashboard`);
 
         document.getElementById("coursesCount").innerText = data.courses;
         document.getElementById("studentsCount").innerText = data.students;
@@ -75,8 +75,8 @@
     /* ===============================
     COURSES TAUGHT BY FACULTY
     ================================ */
-    async function loadFacultyCourses() {
-        const courses = await apiGet(`${BASE}/faculty/my-courses`);
+    async function loadFacultyCourses(courses) {
+        courses = courses ?? await apiGet(`${BASE}/faculty/my-courses`);
 
         /* ===============================
         1️⃣ UPDATE STAT CARD COUNT
@@ -201,39 +201,26 @@
         const date = new Date().toISOString().split("T")[0];
 
         // Create attendance session
-        const sessionRes = await fetch(
-            `${BASE}/faculty/attendance/session`,
-            {
-                method: "POST",
-                headers: {
-                    "Content-Type": "application/json",
-                    "Authorization": "Bearer " + localStorage.getItem("token")
-
-                },
-                body: JSON.stringify({ course_id: courseId, date })
-            }
-        );
+        const sessionRes = await apiSend(`${BASE}/faculty/attendance/session`, {
+            method: "POST",
+            body: { course_id: courseId, date },
+            invalidates: [`${BASE}/faculty/students-summary`, `${BASE}/faculty/dashboard`, `${BASE}/faculty/bootstrap`]
+        });
 
         const session = await sessionRes.json();
 
         // Mark attendance
         const selects = document.querySelectorAll("select[data-student]");
         for (const sel of selects) {
-            await fetch(
-                `${BASE}/faculty/attendance/mark`,
-                {
-                    method: "POST",
-                    headers: {
-                        "Content-Type": "application/json",
-                        "Authorization": "Bearer " + localStorage.getItem("token")
-                    },
-                    body: JSON.stringify({
-                        session_id: session.id,
-                        student_id: sel.dataset.student,
-                        present: sel.value === "true"
-                    })
-                }
-            );
+            await apiSend(`${BASE}/faculty/attendance/mark`, {
+                method: "POST",
+                body: {
+                    session_id: session.id,
+                    student_id: sel.dataset.student,
+                    present: sel.value === "true"
+                },
+                invalidates: [`${BASE}/faculty/students-summary`, `${BASE}/faculty/dashboard`, `${BASE}/faculty/bootstrap`]
+            });
         }
 
         alert("Attendance saved successfully");
@@ -246,18 +233,14 @@
         const courseId = document.getElementById("resultCourseSelect").value;
         const grade = document.getElementById(`grade-${studentId}`).value;
 
-        await fetch(`${BASE}/faculty/final-grade`, {
+        await apiSend(`${BASE}/faculty/final-grade`, {
             method: "POST",
-            headers: {
-                "Content-Type": "application/json",
-                "Authorization": "Bearer " + localStorage.getItem("token")
-
-            },
-            body: JSON.stringify({
+            body: {
                 course_id: courseId,
                 student_id: studentId,
                 grade: grade
-            })
+            },
+            invalidates: [`${BASE}/faculty/students-summary`, `${BASE}/faculty/dashboard`, `${BASE}/faculty/bootstrap`]
         });
 
         alert("Grade saved");
@@ -707,15 +690,22 @@
 
 
     document.addEventListener("DOMContentLoaded", async () => {
-        loadFacultyProfile();
-        loadFacultyDashboard();
-        loadFacultyCourses();
+        // one round-trip for everything the first render needs
+        const boot = await apiGet(`${BASE}/faculty/bootstrap`);
+
+        loadFacultyProfile(boot.profile);
+        loadFacultyDashboard(boot.dashboard);
+        loadFacultyCourses(boot.courses);
 
         updateTimetable();
         updateAttendance();
         updateResults();
         createParticles();
 
+        // counters pushed as they change (server-sent events, no polling)
+        const counters = new EventSource(`${BASE}/faculty/dashboard/stream?token=${encodeURIComponent(token)}`);
+        counters.addEventListener("counters", e => loadFacultyDashboard(JSON.parse(e.data)));
+
         document.querySelectorAll('.menu-item').forEach(item => {
             item.addEventListener('click', function() {
                 document.querySelectorAll('.menu-item').forEach(i => i.classList.remove('active'));
@@ -1,5 +1,5 @@
 import { requireRole } from "./auth.js";
-import { apiGet } from "./api.js";
+import { apiGet, apiSend } from "./api.js";
 
 document.addEventListener("DOMContentLoaded", () => {
     requireRole("student");
@@ -7,8 +7,8 @@ document.addEventListener("DOMContentLoaded", () => {
 const token = localStorage.getItem("token");
 const BASE = "https://collegemanagementsystem-q7g8.onrender.com";
 
-    async function loadStudentProfile() {
-    const student = await apiGet(`${BASE}/students/me`);
+    async function loadStudentProfile(student) {
+    student = student ?? await apiGet(`${BASE}/students/me`);
 
     // Name
     document.querySelector(".profile-name").innerText = student.name;
@@ -52,8 +52,8 @@ const BASE = "https://collegemanagementsystem-q7g8.onrender.com";
 }
 
 
-    async function loadStudentCourses() {
-        const courses = await apiGet(`${BASE}/students/my-courses`);
+    async function loadStudentCourses(courses) {
+        courses = courses ?? await apiGet(`${BASE}/students/my-courses`);
 
         const select = document.getElementById("courseSelect");
         select.innerHTML = "";
@@ -78,13 +78,13 @@ const BASE = "https://collegemanagementsystem-q7g8.onrender.com";
             grade ? grade.grade : "Not Released";
     }
 
-    async function loadTimetable() {
+    async function loadTimetable(data) {
         const container = document.getElementById("timetableContent");
         const daySelect = document.getElementById("daySelect");
 
         if (!container || !daySelect) return; // page guard
 
-        const data = await apiGet(`${BASE}/students/my-timetable`);
+        data = data ?? await apiGet(`${BASE}/students/my-timetable`);
 
         function render(day) {
             const rows = data.filter(d => d.day_of_week === day);
@@ -128,16 +128,14 @@ const BASE = "https://collegemanagementsystem-q7g8.onrender.com";
         });
     }
 
-    async function loadStudentDashboard() {
-        alert("dashboard function called");
-        const data = await apiGet(`${BASE}/students/dashboard`);
-        console.log("Dashboard data:", data);
+    async function loadStudentDashboard(data) {
+        data = data ?? await apiGet(`${BASE}/students/dashboard`);
 
         const map = {
             coursesCount: data.courses,
             attendancePercent: data.attendance_percentage + "%",
             pendingAssignments: data.pending_assignments,
-            daysToExam: data.days_to_exam
+            daysToExam: data.days_to_exam ?? "-"
         };
 
         Object.entries(map).forEach(([id, value]) => {
@@ -160,12 +158,12 @@ const BASE = "https://collegemanagementsystem-q7g8.onrender.com";
 
 
     
-    async function loadAttendanceTable() {
+    async function loadAttendanceTable(data) {
     const tbody = document.querySelector(".attendance-table tbody");
     if (!tbody) return;
 
     try {
-        const data = await apiGet(
+        data = data ?? await apiGet(
             `${BASE}/students/my-attendance-summary`
         );
 
@@ -203,12 +201,12 @@ const BASE = "https://collegemanagementsystem-q7g8.onrender.com";
     }
 }
 
-async function loadResults() {
+async function loadResults(data) {
     const tbody = document.querySelector(".results-table tbody");
     if (!tbody) return;
 
     try {
-        const data = await apiGet(`${BASE}/students/my-results`);
+        data = data ?? await apiGet(`${BASE}/students/my-results`);
 
         tbody.innerHTML = "";
 
@@ -267,9 +265,9 @@ async function loadResults() {
 }
 
 
-async function loadSettings() {
+async function loadSettings(data) {
     try {
-        const data = await apiGet(`${BASE}/students/settings`);
+        data = data ?? await apiGet(`${BASE}/students/settings`);
 
         document.getElementById("username").value = data.username;
         document.getElementById("email").value = data.email;
@@ -303,13 +301,10 @@ document.querySelector(".settings-form").addEventListener("submit", async (e) =>
     };
 
     try {
-        await fetch(`${BASE}/students/settings`, {
+        await apiSend(`${BASE}/students/settings`, {
             method: "PUT",
-            headers: {
-                "Content-Type": "application/json",
-                "Authorization": `Bearer ${localStorage.getItem("token")}`
-            },
-            body: JSON.stringify(payload)
+            body: payload,
+            invalidates: [`${BASE}/students/me`, `${BASE}/students/bootstrap`]
         });
 
         localStorage.setItem("theme", theme);
@@ -327,14 +322,22 @@ document.querySelector(".settings-form").addEventListener("submit", async (e) =>
 
 
 
-    document.addEventListener("DOMContentLoaded", () => {
-        loadStudentProfile();
-        loadStudentDashboard();
-        loadStudentCourses();
-        loadTimetable();
-        loadAttendanceTable();
-        loadResults();
-        loadSettings();
+    document.addEventListener("DOMContentLoaded", async () => {
+        // one round-trip for everything the first render needs
+        const boot = await apiGet(`${BASE}/students/bootstrap`);
+
+        loadStudentProfile(boot.profile);
+        loadStudentDashboard(boot.dashboard);
+        loadStudentCourses(boot.courses);
+        loadTimetable(boot.timetable);
+        loadAttendanceTable(boot.attendance_summary);
+        loadResults(boot.results);
+        loadSettings(boot.settings);
+
+        // counters pushed as they change (server-sent events, no polling)
+        const counters = new EventSource(`${BASE}/students/dashboard/stream?token=${encodeURIComponent(token)}`);
+        counters.addEventListener("counters", e => loadStudentDashboard(JSON.parse(e.data)));
+
         const courseSelect = document.getElementById("courseSelect");
 
             if (courseSelect) {